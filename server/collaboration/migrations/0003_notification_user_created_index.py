@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collaboration', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectnotification',
+            index=models.Index(fields=['user', 'created_at'], name='collaborati_user_id_25f735_idx'),
+        ),
+    ]
@@ -226,6 +226,7 @@ class ProjectNotification(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_read', 'created_at']),
             models.Index(fields=['project', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
         ]
     
     def __str__(self):
@@ -17,6 +17,7 @@ from .serializers import (
     InvitationResponseSerializer
 )
 from projects.models import Project, ProjectCollaborator
+from toplorgical.pagination import KeysetPagination
 import uuid
 import logging
 
@@ -158,6 +159,8 @@ class ActivityLogListView(generics.ListAPIView):
     """List project activity logs"""
     serializer_class = ActivityLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-created_at', '-id']
     
     def get_queryset(self):
         project_id = self.kwargs['project_id']
@@ -168,7 +171,7 @@ class ActivityLogListView(generics.ListAPIView):
         if not (project.owner == user or project.collaborators.filter(id=user.id).exists()):
             return ActivityLog.objects.none()
         
-        return ActivityLog.objects.filter(project=project).select_related('user')
+        return ActivityLog.objects.filter(project=project).select_related('user', 'project')
 
 
 class ProjectCommentListCreateView(generics.ListCreateAPIView):
@@ -307,6 +310,8 @@ class ProjectNotificationListView(generics.ListAPIView):
     """List user's project notifications"""
     serializer_class = ProjectNotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-created_at', '-id']
     
     def get_queryset(self):
         return ProjectNotification.objects.filter(
@@ -0,0 +1,166 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from estimates.models import Estimate, EstimateMaterialItem, EstimateMachineryItem
+from estimates.utils import build_estimate_items
+from projects.models import Project
+from materials.models import Material, MaterialCategory
+from machinery.models import Machinery, MachineryCategory
+from pricing.models import CurrentPrice, PriceData, Supplier
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark estimate generation and report how the query count scales with the "
+        "number of line items. Every other item has no unit price, so its current price "
+        "is looked up. All data is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10,100,500',
+            help='Comma separated line item counts to benchmark (default: 10,100,500)',
+        )
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Also benchmark the per-item create() path for comparison',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+
+        with transaction.atomic():
+            project, materials, machinery = self.create_fixtures(max(sizes))
+
+            self.stdout.write(f"{'mode':<8} {'items':>7} {'queries':>8} {'seconds':>9}")
+            for size in sizes:
+                self.report('bulk', size, *self.run_bulk(project, materials[:size], machinery[:size]))
+                if options['legacy']:
+                    self.report('legacy', size, *self.run_legacy(project, materials[:size], machinery[:size]))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete (fixtures rolled back)'))
+
+    def report(self, mode, size, queries, seconds):
+        self.stdout.write(f"{mode:<8} {size * 2:>7} {queries:>8} {seconds:>9.3f}")
+
+    def create_fixtures(self, count):
+        user = User.objects.create(
+            email='benchmark@toplorgical.local',
+            username='benchmark-estimates',
+            first_name='Benchmark',
+            last_name='User',
+        )
+        project = Project.objects.create(
+            name='Benchmark Project',
+            project_type='residential',
+            address='1 Benchmark Street',
+            city='London',
+            postcode='EC1A 1BB',
+            total_area=100,
+            owner=user,
+        )
+        material_category = MaterialCategory.objects.create(name='Benchmark Materials')
+        machinery_category = MachineryCategory.objects.create(name='Benchmark Machinery')
+
+        materials = Material.objects.bulk_create([
+            Material(
+                name=f'Benchmark Material {i}',
+                category=material_category,
+                sku=f'BENCH-MAT-{i}',
+                unit='piece',
+            )
+            for i in range(count)
+        ])
+        machinery = Machinery.objects.bulk_create([
+            Machinery(
+                name=f'Benchmark Machine {i}',
+                category=machinery_category,
+                sku=f'BENCH-MACH-{i}',
+            )
+            for i in range(count)
+        ])
+
+        # SQLite does not return primary keys from bulk_create on older versions
+        materials = list(Material.objects.filter(category=material_category).order_by('id'))
+        machinery = list(Machinery.objects.filter(category=machinery_category).order_by('id'))
+        self.create_prices(materials, machinery)
+        return project, materials, machinery
+
+    def create_prices(self, materials, machinery):
+        """A current price for every fixture item, for the lines without a unit price"""
+        supplier = Supplier.objects.create(name='Benchmark Supplier')
+        PriceData.objects.bulk_create(
+            [
+                PriceData(material=material, supplier=supplier, price=2.5, unit='piece', location='London')
+                for material in materials
+            ] + [
+                PriceData(
+                    machinery=machine, supplier=supplier, price=25000,
+                    rental_price_daily=45, rental_price_weekly=250, unit='day', location='London'
+                )
+                for machine in machinery
+            ],
+            batch_size=1000
+        )
+        CurrentPrice.objects.upsert_from_price_data(PriceData.objects.filter(supplier=supplier))
+
+    def unit_price(self, index, price):
+        """Explicit unit price for even lines, none for odd lines so their price is looked up"""
+        return price if index % 2 == 0 else None
+
+    def create_estimate(self, project):
+        return Estimate.objects.create(
+            project=project,
+            name='Benchmark Estimate',
+            created_by=project.owner,
+        )
+
+    def run_bulk(self, project, materials, machinery):
+        estimate = self.create_estimate(project)
+        materials_data = [
+            {'material_id': material.id, 'quantity': '10', 'unit_price': self.unit_price(i, '2.50')}
+            for i, material in enumerate(materials)
+        ]
+        machinery_data = [
+            {'machinery_id': machine.id, 'rental_type': 'daily', 'duration': '3', 'unit_price': self.unit_price(i, '45.00')}
+            for i, machine in enumerate(machinery)
+        ]
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            build_estimate_items(estimate, materials=materials_data, machinery=machinery_data)
+        return len(queries), time.perf_counter() - start
+
+    def run_legacy(self, project, materials, machinery):
+        estimate = self.create_estimate(project)
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for i, material in enumerate(materials):
+                material = Material.objects.get(id=material.id)
+                EstimateMaterialItem.objects.create(
+                    estimate=estimate,
+                    material=material,
+                    quantity=10,
+                    unit_price=self.unit_price(i, Decimal('2.50')) or material.get_current_price() or 0,
+                    waste_factor=Decimal('0.1'),
+                )
+            for i, machine in enumerate(machinery):
+                machine = Machinery.objects.get(id=machine.id)
+                EstimateMachineryItem.objects.create(
+                    estimate=estimate,
+                    machinery=machine,
+                    rental_type='daily',
+                    duration=3,
+                    unit_price=self.unit_price(i, Decimal('45')) or machine.get_current_rental_price() or 0,
+                )
+        return len(queries), time.perf_counter() - start
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estimates', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='estimate',
+            index=models.Index(fields=['project', '-created_at'], name='estimate_project_latest_idx'),
+        ),
+    ]
@@ -1,12 +1,42 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
 from django.db import models
+from django.db.models import OuterRef, Sum
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from projects.models import Project
 from materials.models import Material
 from machinery.models import Machinery
+from toplorgical.expressions import SubqueryCount
 
 User = get_user_model()
 
+# Estimates whose total recalculation is deferred, keyed by primary key
+_deferred_totals = threading.local()
+
+
+def _deferred_scopes():
+    if not hasattr(_deferred_totals, 'scopes'):
+        _deferred_totals.scopes = {}
+    return _deferred_totals.scopes
+
+
+class EstimateManager(models.Manager):
+    """Estimate queries with list summaries computed in SQL"""
+    
+    def with_item_counts(self):
+        """Annotate material_items_count and machinery_items_count as correlated subqueries"""
+        return self.annotate(
+            material_items_count=SubqueryCount(
+                EstimateMaterialItem.objects.filter(estimate=OuterRef('pk')).values('pk')
+            ),
+            machinery_items_count=SubqueryCount(
+                EstimateMachineryItem.objects.filter(estimate=OuterRef('pk')).values('pk')
+            ),
+        )
+
 
 class Estimate(models.Model):
     """Main estimate model for project cost calculations"""
@@ -85,42 +115,98 @@ class Estimate(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = EstimateManager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['project', 'status']),
             models.Index(fields=['created_by', 'status']),
+            models.Index(fields=['project', '-created_at'], name='estimate_project_latest_idx'),
         ]
     
     def __str__(self):
         return f"{self.name} - {self.project.name}"
     
-    def calculate_totals(self):
-        """Calculate estimate totals"""
+    def _apply_totals(self):
+        """Derive subtotal, VAT and total from the cost breakdown"""
         self.subtotal = (
             self.materials_cost +
             self.labor_cost +
             self.machinery_cost +
             self.overhead_cost
         )
-        self.vat_amount = self.subtotal * self.vat_rate
+        # vat_rate is a float until the instance is reloaded from the database
+        self.vat_amount = self.subtotal * Decimal(str(self.vat_rate))
         self.total_cost = self.subtotal + self.vat_amount
+    
+    def calculate_totals(self):
+        """Calculate estimate totals"""
+        self._apply_totals()
         self.save()
     
+    @property
+    def totals_deferred(self):
+        """Whether total recalculation is suspended for this estimate"""
+        return self.pk in _deferred_scopes()
+    
+    @contextmanager
+    def deferred_totals(self):
+        """
+        Suspend per-item total recalculation for this estimate.
+        
+        Line items saved inside the scope skip updating the estimate; totals
+        are recomputed once with aggregate queries and written with a single
+        UPDATE when the outermost scope exits without an error.
+        """
+        scopes = _deferred_scopes()
+        scopes[self.pk] = scopes.get(self.pk, 0) + 1
+        try:
+            yield self
+        finally:
+            scopes[self.pk] -= 1
+            if not scopes[self.pk]:
+                del scopes[self.pk]
+        
+        if not self.totals_deferred:
+            self.recalculate_totals()
+    
+    def recalculate_totals(self):
+        """Recompute all totals from the line items and save them with one UPDATE"""
+        self.materials_cost = self.material_items.aggregate(
+            total=Sum('total_cost')
+        )['total'] or Decimal('0')
+        self.machinery_cost = self.machinery_items.aggregate(
+            total=Sum('total_cost')
+        )['total'] or Decimal('0')
+        self._apply_totals()
+        self.updated_at = timezone.now()
+        
+        Estimate.objects.filter(pk=self.pk).update(
+            materials_cost=self.materials_cost,
+            machinery_cost=self.machinery_cost,
+            subtotal=self.subtotal,
+            vat_amount=self.vat_amount,
+            total_cost=self.total_cost,
+            updated_at=self.updated_at
+        )
+    
     def update_material_costs(self):
         """Update material costs based on current items"""
-        total = sum(
-            item.total_cost for item in self.material_items.all()
-        )
-        self.materials_cost = total
+        if self.totals_deferred:
+            return
+        self.materials_cost = self.material_items.aggregate(
+            total=Sum('total_cost')
+        )['total'] or Decimal('0')
         self.calculate_totals()
     
     def update_machinery_costs(self):
         """Update machinery costs based on current items"""
-        total = sum(
-            item.total_cost for item in self.machinery_items.all()
-        )
-        self.machinery_cost = total
+        if self.totals_deferred:
+            return
+        self.machinery_cost = self.machinery_items.aggregate(
+            total=Sum('total_cost')
+        )['total'] or Decimal('0')
         self.calculate_totals()
 
 
@@ -179,10 +265,14 @@ class EstimateMaterialItem(models.Model):
     def __str__(self):
         return f"{self.material.name} - {self.quantity} {self.material.unit}"
     
-    def save(self, *args, **kwargs):
-        # Calculate total cost including waste
+    def calculate_total_cost(self):
+        """Calculate total cost including waste"""
         adjusted_quantity = self.quantity * (1 + self.waste_factor)
         self.total_cost = adjusted_quantity * self.unit_price
+        return self.total_cost
+    
+    def save(self, *args, **kwargs):
+        self.calculate_total_cost()
         super().save(*args, **kwargs)
         
         # Update estimate totals
@@ -260,10 +350,14 @@ class EstimateMachineryItem(models.Model):
     def __str__(self):
         return f"{self.machinery.name} - {self.duration} {self.rental_type}"
     
-    def save(self, *args, **kwargs):
-        # Calculate total cost
+    def calculate_total_cost(self):
+        """Calculate total cost including transport and setup"""
         rental_cost = self.duration * self.unit_price
         self.total_cost = rental_cost + self.transport_cost + self.setup_cost
+        return self.total_cost
+    
+    def save(self, *args, **kwargs):
+        self.calculate_total_cost()
         super().save(*args, **kwargs)
         
         # Update estimate totals
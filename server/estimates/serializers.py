@@ -83,15 +83,23 @@ class EstimateSerializer(serializers.ModelSerializer):
             'created_by', 'created_at', 'updated_at'
         )
     
+    # Querysets from Estimate.objects.with_item_counts() carry the counts already
     def get_material_items_count(self, obj):
-        return obj.material_items.count()
+        count = getattr(obj, 'material_items_count', None)
+        return obj.material_items.count() if count is None else count
     
     def get_machinery_items_count(self, obj):
-        return obj.machinery_items.count()
+        count = getattr(obj, 'machinery_items_count', None)
+        return obj.machinery_items.count() if count is None else count
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        # Recalculate totals once so cost and VAT changes are reflected
+        with instance.deferred_totals():
+            return super().update(instance, validated_data)
 
 
 class EstimateDetailSerializer(EstimateSerializer):
@@ -159,12 +167,16 @@ class GenerateEstimateSerializer(serializers.Serializer):
             for field in required_fields:
                 if field not in item:
                     raise serializers.ValidationError(f"Material item missing required field: {field}")
-            
-            # Validate material exists
-            try:
-                Material.objects.get(id=item['material_id'], is_active=True)
-            except Material.DoesNotExist:
-                raise serializers.ValidationError(f"Material {item['material_id']} not found")
+        
+        # Validate materials exist with a single query
+        material_ids = [item['material_id'] for item in value]
+        found = {
+            str(pk) for pk in
+            Material.objects.filter(id__in=material_ids, is_active=True).values_list('id', flat=True)
+        }
+        for material_id in material_ids:
+            if str(material_id) not in found:
+                raise serializers.ValidationError(f"Material {material_id} not found")
         
         return value
     
@@ -174,12 +186,16 @@ class GenerateEstimateSerializer(serializers.Serializer):
             for field in required_fields:
                 if field not in item:
                     raise serializers.ValidationError(f"Machinery item missing required field: {field}")
-            
-            # Validate machinery exists
-            try:
-                Machinery.objects.get(id=item['machinery_id'], is_active=True)
-            except Machinery.DoesNotExist:
-                raise serializers.ValidationError(f"Machinery {item['machinery_id']} not found")
+        
+        # Validate machinery exists with a single query
+        machinery_ids = [item['machinery_id'] for item in value]
+        found = {
+            str(pk) for pk in
+            Machinery.objects.filter(id__in=machinery_ids, is_active=True).values_list('id', flat=True)
+        }
+        for machinery_id in machinery_ids:
+            if str(machinery_id) not in found:
+                raise serializers.ValidationError(f"Machinery {machinery_id} not found")
         
         return value
 
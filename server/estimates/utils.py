@@ -0,0 +1,105 @@
+from decimal import Decimal
+from materials.models import Material
+from machinery.models import Machinery
+from pricing.resolver import PriceResolver
+from .models import EstimateMaterialItem, EstimateMachineryItem
+
+TWO_PLACES = Decimal('0.01')
+
+
+def to_decimal(value, default=0):
+    """Convert request values (int, float or str) to Decimal"""
+    if value is None or value == '':
+        value = default
+    return Decimal(str(value))
+
+
+def load_items(model, ids):
+    """Load catalog items by ID in a single query, failing on unknown IDs"""
+    items = model.objects.in_bulk(set(ids))
+    for item_id in ids:
+        if item_id not in items:
+            raise model.DoesNotExist(f"{model.__name__} {item_id} not found")
+    return items
+
+
+def build_estimate_items(estimate, materials=None, machinery=None, location=None):
+    """
+    Create estimate line items in bulk and recompute estimate totals once.
+
+    Catalog items and missing prices are resolved with one query per item
+    type, line totals are calculated in memory and the items are written
+    with bulk_create, so the number of queries does not grow with the number
+    of lines.
+    """
+    materials = materials or []
+    machinery = machinery or []
+
+    material_map = load_items(Material, [int(m['material_id']) for m in materials])
+    machinery_map = load_items(Machinery, [int(m['machinery_id']) for m in machinery])
+
+    # Load current prices for every item without an explicit unit price at once
+    resolver = PriceResolver(location)
+    resolver.load_materials([int(m['material_id']) for m in materials if not m.get('unit_price')])
+    resolver.load_machinery([int(m['machinery_id']) for m in machinery if not m.get('unit_price')])
+
+    # Build material items
+    material_items = []
+    for material_data in materials:
+        material = material_map[int(material_data['material_id'])]
+
+        # Get current price if not provided
+        unit_price = material_data.get('unit_price')
+        if not unit_price:
+            unit_price = resolver.material_price(material) or 0
+
+        item = EstimateMaterialItem(
+            estimate=estimate,
+            material=material,
+            quantity=to_decimal(material_data['quantity']),
+            unit_price=to_decimal(unit_price),
+            waste_factor=to_decimal(material_data.get('waste_factor'), '0.10'),
+            supplier=material_data.get('supplier', ''),
+            supplier_location=material_data.get('supplier_location', ''),
+            notes=material_data.get('notes', '')
+        )
+        item.total_cost = item.calculate_total_cost().quantize(TWO_PLACES)
+        material_items.append(item)
+
+    # Build machinery items
+    machinery_items = []
+    for machinery_data in machinery:
+        machine = machinery_map[int(machinery_data['machinery_id'])]
+
+        # Get current price if not provided
+        unit_price = machinery_data.get('unit_price')
+        if not unit_price:
+            unit_price = resolver.machinery_rental_price(
+                machine, machinery_data['rental_type']
+            ) or 0
+
+        item = EstimateMachineryItem(
+            estimate=estimate,
+            machinery=machine,
+            rental_type=machinery_data['rental_type'],
+            duration=to_decimal(machinery_data['duration']),
+            unit_price=to_decimal(unit_price),
+            transport_cost=to_decimal(machinery_data.get('transport_cost')),
+            setup_cost=to_decimal(machinery_data.get('setup_cost')),
+            supplier=machinery_data.get('supplier', ''),
+            supplier_location=machinery_data.get('supplier_location', ''),
+            notes=machinery_data.get('notes', '')
+        )
+        item.total_cost = item.calculate_total_cost().quantize(TWO_PLACES)
+        machinery_items.append(item)
+
+    # bulk_create bypasses save(), so the per-item estimate recalculation is skipped
+    EstimateMaterialItem.objects.bulk_create(material_items)
+    EstimateMachineryItem.objects.bulk_create(machinery_items)
+
+    # Update estimate totals once
+    estimate.materials_cost = sum((item.total_cost for item in material_items), Decimal('0'))
+    estimate.machinery_cost = sum((item.total_cost for item in machinery_items), Decimal('0'))
+    estimate.calculate_totals()
+
+    return material_items, machinery_items
@@ -4,22 +4,22 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.db import transaction
+from django.utils import timezone
 from .models import (
     Estimate, EstimateMaterialItem, EstimateMachineryItem, EstimateSubstitution
 )
 from .serializers import (
     EstimateSerializer,
     EstimateDetailSerializer,
-    EstimateMaterialItemSerializer,
-    EstimateMachineryItemSerializer,
     EstimateSubstitutionSerializer,
     GenerateEstimateSerializer,
     OptimizeEstimateSerializer
 )
+from .utils import build_estimate_items
 from projects.models import Project
 from materials.models import Material
 from machinery.models import Machinery
-from pricing.models import PriceData
+from pricing.resolver import PriceResolver
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,7 +32,7 @@ class EstimateListCreateView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        return Estimate.objects.filter(
+        return Estimate.objects.with_item_counts().filter(
             Q(project__owner=user) | Q(project__collaborators=user)
         ).distinct().select_related('project', 'created_by')
 
@@ -44,9 +44,9 @@ class EstimateDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        return Estimate.objects.filter(
+        return Estimate.objects.with_item_counts().filter(
             Q(project__owner=user) | Q(project__collaborators=user)
-        ).select_related('project', 'created_by').prefetch_related(
+        ).distinct().select_related('project', 'created_by').prefetch_related(
             'material_items__material',
             'machinery_items__machinery',
             'substitutions'
@@ -79,61 +79,13 @@ def generate_estimate(request):
                 created_by=request.user
             )
             
-            # Add material items
-            materials_total = 0
-            for material_data in data.get('materials', []):
-                material = Material.objects.get(id=material_data['material_id'])
-                
-                # Get current price if not provided
-                unit_price = material_data.get('unit_price')
-                if not unit_price:
-                    current_price = material.get_current_price(data.get('location'))
-                    unit_price = current_price or 0
-                
-                material_item = EstimateMaterialItem.objects.create(
-                    estimate=estimate,
-                    material=material,
-                    quantity=material_data['quantity'],
-                    unit_price=unit_price,
-                    waste_factor=material_data.get('waste_factor', 0.10),
-                    supplier=material_data.get('supplier', ''),
-                    supplier_location=material_data.get('supplier_location', ''),
-                    notes=material_data.get('notes', '')
-                )
-                materials_total += material_item.total_cost
-            
-            # Add machinery items
-            machinery_total = 0
-            for machinery_data in data.get('machinery', []):
-                machinery = Machinery.objects.get(id=machinery_data['machinery_id'])
-                
-                # Get current price if not provided
-                unit_price = machinery_data.get('unit_price')
-                if not unit_price:
-                    rental_type = machinery_data['rental_type']
-                    current_price = machinery.get_current_rental_price(
-                        data.get('location'), rental_type
-                    )
-                    unit_price = current_price or 0
-                
-                machinery_item = EstimateMachineryItem.objects.create(
-                    estimate=estimate,
-                    machinery=machinery,
-                    rental_type=machinery_data['rental_type'],
-                    duration=machinery_data['duration'],
-                    unit_price=unit_price,
-                    transport_cost=machinery_data.get('transport_cost', 0),
-                    setup_cost=machinery_data.get('setup_cost', 0),
-                    supplier=machinery_data.get('supplier', ''),
-                    supplier_location=machinery_data.get('supplier_location', ''),
-                    notes=machinery_data.get('notes', '')
-                )
-                machinery_total += machinery_item.total_cost
-            
-            # Update estimate totals
-            estimate.materials_cost = materials_total
-            estimate.machinery_cost = machinery_total
-            estimate.calculate_totals()
+            # Add material and machinery items in bulk
+            build_estimate_items(
+                estimate,
+                materials=data.get('materials', []),
+                machinery=data.get('machinery', []),
+                location=data.get('location')
+            )
             
             # Generate substitution suggestions
             generate_substitutions.delay(estimate.id, data.get('location'))
@@ -235,35 +187,33 @@ def apply_substitution(request, estimate_id, substitution_id):
     
     try:
         with transaction.atomic():
-            # Apply the substitution
-            if substitution.original_material and substitution.alternative_material:
-                # Replace material item
-                material_item = EstimateMaterialItem.objects.get(
-                    estimate=estimate,
-                    material=substitution.original_material
-                )
-                material_item.material = substitution.alternative_material
-                material_item.unit_price = substitution.alternative_price
-                material_item.save()
-            
-            elif substitution.original_machinery and substitution.alternative_machinery:
-                # Replace machinery item
-                machinery_item = EstimateMachineryItem.objects.get(
-                    estimate=estimate,
-                    machinery=substitution.original_machinery
-                )
-                machinery_item.machinery = substitution.alternative_machinery
-                machinery_item.unit_price = substitution.alternative_price
-                machinery_item.save()
-            
-            # Mark substitution as applied
-            substitution.is_applied = True
-            substitution.applied_at = timezone.now()
-            substitution.save()
-            
-            # Recalculate estimate totals
-            estimate.update_material_costs()
-            estimate.update_machinery_costs()
+            # Totals are recalculated once when the scope exits
+            with estimate.deferred_totals():
+                # Apply the substitution
+                if substitution.original_material and substitution.alternative_material:
+                    # Replace material item
+                    material_item = EstimateMaterialItem.objects.get(
+                        estimate=estimate,
+                        material=substitution.original_material
+                    )
+                    material_item.material = substitution.alternative_material
+                    material_item.unit_price = substitution.alternative_price
+                    material_item.save()
+                
+                elif substitution.original_machinery and substitution.alternative_machinery:
+                    # Replace machinery item
+                    machinery_item = EstimateMachineryItem.objects.get(
+                        estimate=estimate,
+                        machinery=substitution.original_machinery
+                    )
+                    machinery_item.machinery = substitution.alternative_machinery
+                    machinery_item.unit_price = substitution.alternative_price
+                    machinery_item.save()
+                
+                # Mark substitution as applied
+                substitution.is_applied = True
+                substitution.applied_at = timezone.now()
+                substitution.save()
             
             return Response({
                 'message': 'Substitution applied successfully',
@@ -281,13 +231,15 @@ def apply_substitution(request, estimate_id, substitution_id):
 def generate_estimate_substitutions(estimate, location, optimization_type='cost', max_substitutions=5):
     """Generate substitution suggestions for an estimate"""
     substitutions = []
+    resolver = PriceResolver(location)
     
     # Generate material substitutions
-    for material_item in estimate.material_items.all():
+    for material_item in estimate.material_items.select_related('material'):
         alternatives = find_material_alternatives(
             material_item.material,
             location,
-            optimization_type
+            optimization_type,
+            resolver
         )
         
         for alternative in alternatives[:2]:  # Top 2 alternatives per item
@@ -307,14 +259,15 @@ def generate_estimate_substitutions(estimate, location, optimization_type='cost'
             substitutions.append(substitution)
     
     # Generate machinery substitutions
-    for machinery_item in estimate.machinery_items.all():
+    for machinery_item in estimate.machinery_items.select_related('machinery'):
         if len(substitutions) >= max_substitutions:
             break
         
         alternatives = find_machinery_alternatives(
             machinery_item.machinery,
             location,
-            optimization_type
+            optimization_type,
+            resolver
         )
         
         for alternative in alternatives[:2]:  # Top 2 alternatives per item
@@ -336,18 +289,20 @@ def generate_estimate_substitutions(estimate, location, optimization_type='cost'
     return substitutions
 
 
-def find_material_alternatives(material, location, optimization_type):
+def find_material_alternatives(material, location, optimization_type, resolver=None):
     """Find alternative materials"""
     alternatives = []
+    resolver = resolver or PriceResolver(location)
     
     # Find materials in the same category
-    similar_materials = Material.objects.filter(
+    similar_materials = list(Material.objects.filter(
         category=material.category,
         is_active=True
-    ).exclude(id=material.id)
+    ).exclude(id=material.id).select_related('category'))
+    resolver.load_materials(similar_materials)
     
     for alt_material in similar_materials:
-        current_price = alt_material.get_current_price(location)
+        current_price = resolver.material_price(alt_material)
         if current_price:
             alternatives.append({
                 'material': alt_material,
@@ -363,18 +318,20 @@ def find_material_alternatives(material, location, optimization_type):
     return alternatives
 
 
-def find_machinery_alternatives(machinery, location, optimization_type):
+def find_machinery_alternatives(machinery, location, optimization_type, resolver=None):
     """Find alternative machinery"""
     alternatives = []
+    resolver = resolver or PriceResolver(location)
     
     # Find machinery in the same category
-    similar_machinery = Machinery.objects.filter(
+    similar_machinery = list(Machinery.objects.filter(
         category=machinery.category,
         is_active=True
-    ).exclude(id=machinery.id)
+    ).exclude(id=machinery.id).select_related('category'))
+    resolver.load_machinery(similar_machinery)
     
     for alt_machinery in similar_machinery:
-        current_price = alt_machinery.get_current_rental_price(location, 'daily')
+        current_price = resolver.machinery_rental_price(alt_machinery, 'daily')
         if current_price:
             alternatives.append({
                 'machinery': alt_machinery,
@@ -0,0 +1,49 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+from toplorgical.search import search_vector
+
+# Must match the weights in machinery/search.py for the index to be used
+SEARCH_WEIGHTS = {
+    'name': 'A',
+    'sku': 'A',
+    'brand': 'B',
+    'model': 'B',
+    'description': 'C',
+}
+
+
+def search_indexes():
+    return [
+        GinIndex(search_vector(SEARCH_WEIGHTS), name='machinery_search_idx'),
+        GinIndex(fields=['name'], name='machinery_name_trgm_idx', opclasses=['gin_trgm_ops']),
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    # Full-text and trigram indexes only exist on PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    model = apps.get_model('machinery', 'Machinery')
+    for index in search_indexes():
+        schema_editor.add_index(model, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    model = apps.get_model('machinery', 'Machinery')
+    for index in search_indexes():
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machinery', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
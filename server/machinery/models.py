@@ -1,5 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from toplorgical.cache import invalidate_tags
+from toplorgical.categories import CategoryTreeManager, CategoryTreeItemMixin
 
 
 class MachineryCategory(models.Model):
@@ -15,15 +17,26 @@ class MachineryCategory(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = CategoryTreeManager(items='machinery', count_field='machinery_count')
+    
     class Meta:
         verbose_name_plural = 'Machinery Categories'
         ordering = ['name']
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        MachineryCategory.objects.invalidate_tree()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        MachineryCategory.objects.invalidate_tree()
+        return result
 
 
-class Machinery(models.Model):
+class Machinery(CategoryTreeItemMixin, models.Model):
     """Machinery model for construction equipment"""
     
     FUEL_TYPES = [
@@ -109,46 +122,41 @@ class Machinery(models.Model):
     def __str__(self):
         return f"{self.name} - {self.brand} {self.model}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_tags('machinery', f'machinery:{self.pk}')
+    
+    def delete(self, *args, **kwargs):
+        tags = ('machinery', f'machinery:{self.pk}')
+        result = super().delete(*args, **kwargs)
+        invalidate_tags(*tags)
+        return result
+    
     def get_current_rental_price(self, location=None, rental_type='daily'):
         """Get current rental price for this machinery"""
-        from pricing.models import PriceData
-        
-        filters = {'machinery': self, 'is_active': True}
-        if location:
-            filters['location__icontains'] = location
-        
-        try:
-            price_data = PriceData.objects.filter(**filters).latest('created_at')
-            
-            if rental_type == 'daily':
-                return price_data.rental_price_daily
-            elif rental_type == 'weekly':
-                return price_data.rental_price_weekly
-            else:
-                return price_data.price
-        except PriceData.DoesNotExist:
-            return None
+        from pricing.resolver import PriceResolver
+        return PriceResolver(location).machinery_rental_price(self, rental_type)
     
     def get_purchase_price(self, location=None):
         """Get current purchase price for this machinery"""
-        from pricing.models import PriceData
-        
-        filters = {'machinery': self, 'is_active': True}
-        if location:
-            filters['location__icontains'] = location
-        
-        try:
-            price_data = PriceData.objects.filter(**filters).latest('created_at')
-            return price_data.price
-        except PriceData.DoesNotExist:
-            return None
+        from pricing.resolver import PriceResolver
+        return PriceResolver(location).machinery_prices(self)['purchase']
     
     def get_availability(self, location=None):
         """Check availability in specified location"""
+        from pricing.resolver import PriceResolver
+        return PriceResolver(location).machinery_prices(self)['available']
+    
+    def get_price_history(self, days=30):
+        """Get price history for this machinery"""
         from pricing.models import PriceData
+        from django.utils import timezone
+        from datetime import timedelta
         
-        filters = {'machinery': self, 'is_active': True, 'in_stock': True}
-        if location:
-            filters['location__icontains'] = location
+        end_date = timezone.now()
+        start_date = end_date - timedelta(days=days)
         
-        return PriceData.objects.filter(**filters).exists()
\ No newline at end of file
+        return PriceData.objects.filter(
+            machinery=self,
+            created_at__range=[start_date, end_date]
+        ).select_related('supplier').order_by('-created_at')
\ No newline at end of file
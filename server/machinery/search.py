@@ -0,0 +1,11 @@
+from toplorgical.search import SearchIndex
+from .models import Machinery
+
+# Field weights for ranking; migration 0002 indexes the same expression
+machinery_search_index = SearchIndex(Machinery, {
+    'name': 'A',
+    'sku': 'A',
+    'brand': 'B',
+    'model': 'B',
+    'description': 'C',
+})
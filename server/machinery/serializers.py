@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from django.db import models
+from pricing.resolver import PriceResolver
 from .models import Machinery, MachineryCategory
 
 
@@ -14,12 +16,20 @@ class MachineryCategorySerializer(serializers.ModelSerializer):
         ]
     
     def get_subcategories(self, obj):
-        if obj.subcategories.exists():
-            return MachineryCategorySerializer(obj.subcategories.all(), many=True).data
-        return []
+        # Nested categories and counts come from the cached category tree
+        return MachineryCategory.objects.tree_nodes()[obj.pk]['subcategories']
     
     def get_machinery_count(self, obj):
-        return obj.machinery.filter(is_active=True).count()
+        return MachineryCategory.objects.tree_nodes()[obj.pk]['machinery_count']
+
+
+class MachineryListSerializer(serializers.ListSerializer):
+    """Load current prices for the whole list before serializing each machine"""
+    
+    def to_representation(self, data):
+        machinery = list(data.all() if isinstance(data, models.Manager) else data)
+        PriceResolver.from_context(self.context).load_machinery(machinery)
+        return super().to_representation(machinery)
 
 
 class MachinerySerializer(serializers.ModelSerializer):
@@ -39,25 +49,25 @@ class MachinerySerializer(serializers.ModelSerializer):
             'current_purchase_price', 'availability',
             'is_active', 'created_at', 'updated_at'
         ]
+        list_serializer_class = MachineryListSerializer
+    
+    def resolve_prices(self, obj):
+        return PriceResolver.from_context(self.context).machinery_prices(obj)
     
     def get_current_rental_price_daily(self, obj):
-        location = self.context.get('location')
-        price = obj.get_current_rental_price(location, 'daily')
+        price = self.resolve_prices(obj)['daily']
         return float(price) if price else None
     
     def get_current_rental_price_weekly(self, obj):
-        location = self.context.get('location')
-        price = obj.get_current_rental_price(location, 'weekly')
+        price = self.resolve_prices(obj)['weekly']
         return float(price) if price else None
     
     def get_current_purchase_price(self, obj):
-        location = self.context.get('location')
-        price = obj.get_purchase_price(location)
+        price = self.resolve_prices(obj)['purchase']
         return float(price) if price else None
     
     def get_availability(self, obj):
-        location = self.context.get('location')
-        return obj.get_availability(location)
+        return self.resolve_prices(obj)['available']
 
 
 class MachineryDetailSerializer(MachinerySerializer):
@@ -79,6 +89,7 @@ class MachineryDetailSerializer(MachinerySerializer):
 
 class MachinerySearchSerializer(serializers.Serializer):
     query = serializers.CharField(required=False, allow_blank=True)
+    prefix = serializers.BooleanField(default=False, help_text="Match query words as prefixes for type-ahead")
     category = serializers.IntegerField(required=False)
     brand = serializers.CharField(required=False, allow_blank=True)
     fuel_type = serializers.ChoiceField(choices=Machinery.FUEL_TYPES, required=False)
@@ -92,9 +103,9 @@ class MachinerySearchSerializer(serializers.Serializer):
     )
     ordering = serializers.ChoiceField(
         choices=[
-            'name', '-name', 'brand', '-brand',
+            'relevance', 'name', '-name', 'brand', '-brand',
             'created_at', '-created_at'
         ],
         required=False,
-        default='name'
+        help_text="Defaults to relevance when searching and name otherwise"
     )
\ No newline at end of file
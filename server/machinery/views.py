@@ -1,10 +1,12 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from toplorgical.cache import ReadThroughCacheMixin
+from toplorgical.pagination import KeysetPagination
 from .models import Machinery, MachineryCategory
+from .search import machinery_search_index
 from .serializers import (
     MachinerySerializer,
     MachineryDetailSerializer,
@@ -18,30 +20,47 @@ class MachineryCategoryListView(generics.ListAPIView):
     queryset = MachineryCategory.objects.filter(parent=None)
     serializer_class = MachineryCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request, *args, **kwargs):
+        # The cached tree is already serialized, so no per-node queries are needed
+        tree = MachineryCategory.objects.tree()
+        page = self.paginate_queryset(tree)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(tree)
 
 
-class MachineryListView(generics.ListAPIView):
+class MachineryListView(ReadThroughCacheMixin, generics.ListAPIView):
     """List all machinery with filtering and search"""
     queryset = Machinery.objects.filter(is_active=True).select_related('category')
     serializer_class = MachinerySerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_family = 'machinery-list'
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['category', 'brand', 'fuel_type']
     search_fields = ['name', 'description', 'model', 'brand']
     ordering_fields = ['name', 'brand', 'created_at']
     ordering = ['name']
     
+    def get_cache_tags(self):
+        return ['machinery', 'prices', 'machinery-prices', MachineryCategory.objects.cache_tag]
+    
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['location'] = self.request.query_params.get('location')
         return context
 
 
-class MachineryDetailView(generics.RetrieveAPIView):
+class MachineryDetailView(ReadThroughCacheMixin, generics.RetrieveAPIView):
     """Retrieve machinery details with price history"""
     queryset = Machinery.objects.filter(is_active=True).select_related('category')
     serializer_class = MachineryDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_family = 'machinery-detail'
+    
+    def get_cache_tags(self):
+        pk = self.kwargs['pk']
+        return [f'machinery:{pk}', 'prices', f'machinery-prices:{pk}', MachineryCategory.objects.cache_tag]
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -63,13 +82,8 @@ def machinery_search(request):
     
     # Apply filters
     if data.get('query'):
-        queryset = queryset.filter(
-            Q(name__icontains=data['query']) |
-            Q(description__icontains=data['query']) |
-            Q(brand__icontains=data['query']) |
-            Q(model__icontains=data['query']) |
-            Q(sku__icontains=data['query'])
-        )
+        # Ranked full-text search, annotating each match with search_rank
+        queryset = machinery_search_index.search(queryset, data['query'], prefix=data['prefix'])
     
     if data.get('category'):
         queryset = queryset.filter(category_id=data['category'])
@@ -80,28 +94,22 @@ def machinery_search(request):
     if data.get('fuel_type'):
         queryset = queryset.filter(fuel_type=data['fuel_type'])
     
-    # Apply ordering
-    ordering = data.get('ordering', 'name')
-    queryset = queryset.order_by(ordering)
-    
-    # Paginate results
-    page = request.query_params.get('page', 1)
-    page_size = min(int(request.query_params.get('page_size', 20)), 100)
-    
-    start = (int(page) - 1) * page_size
-    end = start + page_size
+    # Apply ordering; every ordering ends in id so cursor positions are unique
+    ordering = data.get('ordering') or ('relevance' if data.get('query') else 'name')
+    if ordering == 'relevance':
+        # Without a query there is nothing to rank by
+        keyset = ['-search_rank', 'id'] if data.get('query') else ['name', 'id']
+    else:
+        keyset = [ordering, 'id']
     
-    machinery = queryset[start:end]
+    # Cursor pagination: one seek query per page, counted only on request
+    paginator = KeysetPagination(keyset)
+    machinery = paginator.paginate_queryset(queryset, request)
     
     context = {'location': data.get('location')}
     serializer = MachinerySerializer(machinery, many=True, context=context)
     
-    return Response({
-        'results': serializer.data,
-        'count': queryset.count(),
-        'page': int(page),
-        'page_size': page_size,
-    })
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
@@ -171,7 +179,7 @@ def machinery_availability(request):
             machinery = Machinery.objects.get(id=int(machinery_id), is_active=True)
             
             # Get availability from price data
-            from pricing.models import PriceData
+            from pricing.models import PriceData, filter_by_location
             
             availability_query = PriceData.objects.filter(
                 machinery=machinery,
@@ -180,7 +188,7 @@ def machinery_availability(request):
             )
             
             if location:
-                availability_query = availability_query.filter(location__icontains=location)
+                availability_query = filter_by_location(availability_query, location)
             
             available_locations = list(availability_query.values_list('location', flat=True).distinct())
             
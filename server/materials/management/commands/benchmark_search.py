@@ -0,0 +1,141 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from materials.models import Material, MaterialCategory
+from materials.search import material_search_index
+from toplorgical.search import InvertedIndex
+
+ADJECTIVES = [
+    'heavy', 'duty', 'galvanised', 'treated', 'premium', 'standard', 'trade', 'fire',
+    'rated', 'acoustic', 'moisture', 'resistant', 'rapid', 'set', 'flexible', 'outdoor',
+]
+NOUNS = [
+    'cement', 'plaster', 'brick', 'block', 'timber', 'plywood', 'plasterboard', 'screw',
+    'nail', 'bolt', 'cable', 'pipe', 'fitting', 'insulation', 'membrane', 'adhesive',
+    'sealant', 'paint', 'primer', 'tile', 'grout', 'sand', 'gravel', 'ballast', 'lintel',
+]
+SIZES = ['10mm', '12.5mm', '25mm', '50mm', '100mm', '2.4m', '3.6m', '5kg', '25kg', '1l', '5l']
+BRANDS = ['Hanson', 'Tarmac', 'British Gypsum', 'Knauf', 'Marley', 'Celotex', 'Wavin', 'Ronseal', 'Dulux']
+
+QUERIES = [
+    ('word', 'cement 25kg', False),
+    ('two words', 'treated timber', False),
+    ('brand', 'knauf insulation', False),
+    ('prefix', 'plast', True),
+    ('prefix pair', 'galv scr', True),
+    ('misspelt', 'plasterbord', False),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ranked material search over a synthetic catalog. On PostgreSQL the rows are "
+        "inserted in a transaction that is rolled back; other databases benchmark the in-process "
+        "inverted index directly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000000,
+            help='Number of synthetic catalog rows (default: 1000000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Times each query is run (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError('--rows must be positive')
+
+        random.seed(42)
+        self.stdout.write(f"Generating {options['rows']} synthetic catalog rows...")
+        rows = [self.synthetic_row(i) for i in range(options['rows'])]
+
+        if connection.vendor == 'postgresql':
+            self.benchmark_postgres(rows, options['repeat'])
+        else:
+            self.benchmark_inverted(rows, options['repeat'])
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
+
+    def synthetic_row(self, i):
+        noun = random.choice(NOUNS)
+        return {
+            'name': f"{random.choice(ADJECTIVES)} {random.choice(ADJECTIVES)} {noun} {random.choice(SIZES)}",
+            'sku': f'BENCH-{i:07d}',
+            'brand': random.choice(BRANDS),
+            'description': f"{random.choice(ADJECTIVES)} {noun} for {random.choice(NOUNS)} work",
+        }
+
+    def report(self, label, query, elapsed, repeat, matches):
+        self.stdout.write(
+            f"  {label:<12} {query!r:<20} {elapsed / repeat * 1000:8.2f}ms per query, {matches} matches"
+        )
+
+    def benchmark_inverted(self, rows, repeat):
+        index = InvertedIndex(material_search_index.weights)
+        start = time.perf_counter()
+        for doc_id, row in enumerate(rows, 1):
+            index.add(doc_id, row)
+        self.stdout.write(
+            f"Indexed {len(rows)} rows ({len(index.postings)} tokens) in {time.perf_counter() - start:.1f}s"
+        )
+
+        self.stdout.write('Inverted index:')
+        for label, query, prefix in QUERIES:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results = index.search(query, prefix)
+            self.report(label, query, time.perf_counter() - start, repeat, len(results))
+
+        # Baseline: what the old icontains filter does, a substring scan of every row
+        self.stdout.write('Substring scan:')
+        for label, query, _ in QUERIES:
+            start = time.perf_counter()
+            matches = sum(
+                1 for row in rows
+                if any(query in (row[field] or '').lower() for field in ('name', 'description', 'brand', 'sku'))
+            )
+            self.report(label, query, time.perf_counter() - start, 1, matches)
+
+    def benchmark_postgres(self, rows, repeat):
+        with transaction.atomic():
+            category = MaterialCategory.objects.create(name='Benchmark Search')
+            start = time.perf_counter()
+            Material.objects.bulk_create(
+                [Material(category=category, unit='piece', **row) for row in rows],
+                batch_size=10000
+            )
+            self.stdout.write(f"Inserted {len(rows)} rows in {time.perf_counter() - start:.1f}s")
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE materials_material')
+
+            queryset = Material.objects.filter(is_active=True)
+            self.stdout.write('Full-text search:')
+            for label, query, prefix in QUERIES:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    results = list(
+                        material_search_index.search(queryset, query, prefix).order_by('-search_rank')[:20]
+                    )
+                self.report(label, query, time.perf_counter() - start, repeat, len(results))
+
+            self.stdout.write('icontains:')
+            for label, query, _ in QUERIES:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    results = list(queryset.filter(
+                        Q(name__icontains=query) |
+                        Q(description__icontains=query) |
+                        Q(brand__icontains=query) |
+                        Q(sku__icontains=query)
+                    ).order_by('name')[:20])
+                self.report(label, query, time.perf_counter() - start, repeat, len(results))
+
+            transaction.set_rollback(True)
@@ -1,5 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from toplorgical.cache import invalidate_tags
+from toplorgical.categories import CategoryTreeManager, CategoryTreeItemMixin
 
 
 class MaterialCategory(models.Model):
@@ -15,15 +17,26 @@ class MaterialCategory(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = CategoryTreeManager(items='materials', count_field='materials_count')
+    
     class Meta:
         verbose_name_plural = 'Material Categories'
         ordering = ['name']
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        MaterialCategory.objects.invalidate_tree()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        MaterialCategory.objects.invalidate_tree()
+        return result
 
 
-class Material(models.Model):
+class Material(CategoryTreeItemMixin, models.Model):
     """Material model for construction materials"""
     
     UNIT_CHOICES = [
@@ -99,19 +112,20 @@ class Material(models.Model):
     def __str__(self):
         return f"{self.name} ({self.unit})"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_tags('materials', f'material:{self.pk}')
+    
+    def delete(self, *args, **kwargs):
+        tags = ('materials', f'material:{self.pk}')
+        result = super().delete(*args, **kwargs)
+        invalidate_tags(*tags)
+        return result
+    
     def get_current_price(self, location=None):
         """Get current price for this material"""
-        from pricing.models import PriceData
-        
-        filters = {'material': self, 'is_active': True}
-        if location:
-            filters['location__icontains'] = location
-        
-        try:
-            price_data = PriceData.objects.filter(**filters).latest('created_at')
-            return price_data.price
-        except PriceData.DoesNotExist:
-            return None
+        from pricing.resolver import PriceResolver
+        return PriceResolver(location).material_price(self)
     
     def get_price_history(self, days=30):
         """Get price history for this material"""
@@ -125,7 +139,7 @@ class Material(models.Model):
         return PriceData.objects.filter(
             material=self,
             created_at__range=[start_date, end_date]
-        ).order_by('-created_at')
+        ).select_related('supplier').order_by('-created_at')
     
     @property
     def volume(self):
@@ -0,0 +1,10 @@
+from toplorgical.search import SearchIndex
+from .models import Material
+
+# Field weights for ranking; migration 0002 indexes the same expression
+material_search_index = SearchIndex(Material, {
+    'name': 'A',
+    'sku': 'A',
+    'brand': 'B',
+    'description': 'C',
+})
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from django.db import models
+from pricing.resolver import PriceResolver
 from .models import Material, MaterialCategory
 
 
@@ -14,12 +16,20 @@ class MaterialCategorySerializer(serializers.ModelSerializer):
         ]
     
     def get_subcategories(self, obj):
-        if obj.subcategories.exists():
-            return MaterialCategorySerializer(obj.subcategories.all(), many=True).data
-        return []
+        # Nested categories and counts come from the cached category tree
+        return MaterialCategory.objects.tree_nodes()[obj.pk]['subcategories']
     
     def get_materials_count(self, obj):
-        return obj.materials.filter(is_active=True).count()
+        return MaterialCategory.objects.tree_nodes()[obj.pk]['materials_count']
+
+
+class MaterialListSerializer(serializers.ListSerializer):
+    """Load current prices for the whole list before serializing each material"""
+    
+    def to_representation(self, data):
+        materials = list(data.all() if isinstance(data, models.Manager) else data)
+        PriceResolver.from_context(self.context).load_materials(materials)
+        return super().to_representation(materials)
 
 
 class MaterialSerializer(serializers.ModelSerializer):
@@ -35,10 +45,10 @@ class MaterialSerializer(serializers.ModelSerializer):
             'length', 'width', 'height', 'weight', 'volume',
             'current_price', 'is_active', 'created_at', 'updated_at'
         ]
+        list_serializer_class = MaterialListSerializer
     
     def get_current_price(self, obj):
-        location = self.context.get('location')
-        price = obj.get_current_price(location)
+        price = PriceResolver.from_context(self.context).material_price(obj)
         return float(price) if price else None
 
 
@@ -57,8 +67,17 @@ class MaterialDetailSerializer(MaterialSerializer):
         } for item in history[:10]]  # Last 10 price points
 
 
+class MaterialSearchResultSerializer(MaterialSerializer):
+    """Material search result with the lowest current price used for filtering and ordering"""
+    lowest_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    
+    class Meta(MaterialSerializer.Meta):
+        fields = MaterialSerializer.Meta.fields + ['lowest_price']
+
+
 class MaterialSearchSerializer(serializers.Serializer):
     query = serializers.CharField(required=False, allow_blank=True)
+    prefix = serializers.BooleanField(default=False, help_text="Match query words as prefixes for type-ahead")
     category = serializers.IntegerField(required=False)
     brand = serializers.CharField(required=False, allow_blank=True)
     location = serializers.CharField(required=False, allow_blank=True)
@@ -67,9 +86,9 @@ class MaterialSearchSerializer(serializers.Serializer):
     unit = serializers.ChoiceField(choices=Material.UNIT_CHOICES, required=False)
     ordering = serializers.ChoiceField(
         choices=[
-            'name', '-name', 'price', '-price',
+            'relevance', 'name', '-name', 'price', '-price',
             'brand', '-brand', 'created_at', '-created_at'
         ],
         required=False,
-        default='name'
+        help_text="Defaults to relevance when searching and name otherwise"
     )
\ No newline at end of file
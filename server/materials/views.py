@@ -1,15 +1,19 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from pricing.resolver import lowest_price
+from toplorgical.cache import ReadThroughCacheMixin
+from toplorgical.pagination import KeysetPagination
 from .models import Material, MaterialCategory
+from .search import material_search_index
 from .serializers import (
     MaterialSerializer,
     MaterialDetailSerializer,
     MaterialCategorySerializer,
-    MaterialSearchSerializer
+    MaterialSearchSerializer,
+    MaterialSearchResultSerializer
 )
 
 
@@ -18,30 +22,47 @@ class MaterialCategoryListView(generics.ListAPIView):
     queryset = MaterialCategory.objects.filter(parent=None)
     serializer_class = MaterialCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request, *args, **kwargs):
+        # The cached tree is already serialized, so no per-node queries are needed
+        tree = MaterialCategory.objects.tree()
+        page = self.paginate_queryset(tree)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(tree)
 
 
-class MaterialListView(generics.ListAPIView):
+class MaterialListView(ReadThroughCacheMixin, generics.ListAPIView):
     """List all materials with filtering and search"""
     queryset = Material.objects.filter(is_active=True).select_related('category')
     serializer_class = MaterialSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_family = 'material-list'
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['category', 'brand', 'unit']
     search_fields = ['name', 'description', 'sku', 'brand']
     ordering_fields = ['name', 'brand', 'created_at']
     ordering = ['name']
     
+    def get_cache_tags(self):
+        return ['materials', 'prices', 'material-prices', MaterialCategory.objects.cache_tag]
+    
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['location'] = self.request.query_params.get('location')
         return context
 
 
-class MaterialDetailView(generics.RetrieveAPIView):
+class MaterialDetailView(ReadThroughCacheMixin, generics.RetrieveAPIView):
     """Retrieve material details with price history"""
     queryset = Material.objects.filter(is_active=True).select_related('category')
     serializer_class = MaterialDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_family = 'material-detail'
+    
+    def get_cache_tags(self):
+        pk = self.kwargs['pk']
+        return [f'material:{pk}', 'prices', f'material-prices:{pk}', MaterialCategory.objects.cache_tag]
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -63,12 +84,8 @@ def material_search(request):
     
     # Apply filters
     if data.get('query'):
-        queryset = queryset.filter(
-            Q(name__icontains=data['query']) |
-            Q(description__icontains=data['query']) |
-            Q(brand__icontains=data['query']) |
-            Q(sku__icontains=data['query'])
-        )
+        # Ranked full-text search, annotating each match with search_rank
+        queryset = material_search_index.search(queryset, data['query'], prefix=data['prefix'])
     
     if data.get('category'):
         queryset = queryset.filter(category_id=data['category'])
@@ -79,35 +96,34 @@ def material_search(request):
     if data.get('unit'):
         queryset = queryset.filter(unit=data['unit'])
     
-    # Price filtering would require joining with pricing data
-    # This is a simplified version
+    # Lowest current price in the requested location, computed in the database
+    queryset = queryset.annotate(lowest_price=lowest_price('material', data.get('location')))
     
-    # Apply ordering
-    ordering = data.get('ordering', 'name')
-    if ordering == 'price':
-        # Would need to order by current price from pricing table
-        pass
-    else:
-        queryset = queryset.order_by(ordering)
+    if data.get('min_price') is not None:
+        queryset = queryset.filter(lowest_price__gte=data['min_price'])
     
-    # Paginate results
-    page = request.query_params.get('page', 1)
-    page_size = min(int(request.query_params.get('page_size', 20)), 100)
+    if data.get('max_price') is not None:
+        queryset = queryset.filter(lowest_price__lte=data['max_price'])
     
-    start = (int(page) - 1) * page_size
-    end = start + page_size
+    # Apply ordering; every ordering ends in id so cursor positions are unique
+    ordering = data.get('ordering') or ('relevance' if data.get('query') else 'name')
+    if ordering == 'relevance':
+        # Without a query there is nothing to rank by
+        keyset = ['-search_rank', 'id'] if data.get('query') else ['name', 'id']
+    elif ordering in ('price', '-price'):
+        # Unpriced materials come last in both directions
+        keyset = [ordering.replace('price', 'lowest_price'), 'id']
+    else:
+        keyset = [ordering, 'id']
     
-    materials = queryset[start:end]
+    # Cursor pagination: one seek query per page, counted only on request
+    paginator = KeysetPagination(keyset, nullable=('lowest_price',))
+    materials = paginator.paginate_queryset(queryset, request)
     
     context = {'location': data.get('location')}
-    serializer = MaterialSerializer(materials, many=True, context=context)
-    
-    return Response({
-        'results': serializer.data,
-        'count': queryset.count(),
-        'page': int(page),
-        'page_size': page_size,
-    })
+    serializer = MaterialSearchResultSerializer(materials, many=True, context=context)
+    
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from toplorgical.cache import invalidate_tags, read_through
 import stripe
 
 User = get_user_model()
@@ -9,6 +10,19 @@ User = get_user_model()
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
+class SubscriptionPlanManager(models.Manager):
+    """Subscription plans served from the two-tier reference data cache"""
+    
+    def active_plans(self):
+        """Active plans by ID, read through the cache"""
+        return read_through(
+            'subscription-plans:active',
+            lambda: {plan.pk: plan for plan in self.filter(is_active=True)},
+            tags=['subscription-plans'],
+            timeout=60 * 60
+        )
+
+
 class SubscriptionPlan(models.Model):
     """Subscription plans available"""
     
@@ -35,11 +49,22 @@ class SubscriptionPlan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = SubscriptionPlanManager()
+    
     class Meta:
         ordering = ['price']
     
     def __str__(self):
         return f"{self.name} - £{self.price}/{self.interval}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_tags('subscription-plans')
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_tags('subscription-plans')
+        return result
 
 
 class UserSubscription(models.Model):
@@ -63,11 +63,9 @@ class CreateSubscriptionSerializer(serializers.Serializer):
     payment_method_id = serializers.CharField()
     
     def validate_plan_id(self, value):
-        try:
-            plan = SubscriptionPlan.objects.get(id=value, is_active=True)
-            return value
-        except SubscriptionPlan.DoesNotExist:
+        if value not in SubscriptionPlan.objects.active_plans():
             raise serializers.ValidationError("Invalid or inactive subscription plan")
+        return value
 
 
 class UpdateSubscriptionSerializer(serializers.Serializer):
@@ -76,11 +74,9 @@ class UpdateSubscriptionSerializer(serializers.Serializer):
     prorate = serializers.BooleanField(default=True)
     
     def validate_plan_id(self, value):
-        try:
-            plan = SubscriptionPlan.objects.get(id=value, is_active=True)
-            return value
-        except SubscriptionPlan.DoesNotExist:
+        if value not in SubscriptionPlan.objects.active_plans():
             raise serializers.ValidationError("Invalid or inactive subscription plan")
+        return value
 
 
 class CancelSubscriptionSerializer(serializers.Serializer):
@@ -5,6 +5,7 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.utils import timezone
+from toplorgical.cache import ReadThroughCacheMixin
 from .models import (
     SubscriptionPlan, UserSubscription, PaymentMethod, Invoice, WebhookEvent
 )
@@ -29,11 +30,16 @@ User = get_user_model()
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
-class SubscriptionPlanListView(generics.ListAPIView):
+class SubscriptionPlanListView(ReadThroughCacheMixin, generics.ListAPIView):
     """List available subscription plans"""
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [permissions.AllowAny]
+    cache_family = 'subscription-plan-list'
+    cache_timeout = 60 * 60
+    
+    def get_cache_tags(self):
+        return ['subscription-plans']
 
 
 class UserSubscriptionView(generics.RetrieveAPIView):
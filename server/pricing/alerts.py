@@ -0,0 +1,233 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Min, Max, Count
+from django.utils import timezone
+from .models import PriceAlert, CurrentPrice, Location, filter_by_location, normalize_location
+
+ALERT_FIELDS = ['id', 'material_id', 'machinery_id', 'region_id', 'location', 'alert_type', 'threshold_price']
+
+
+def item_key(material_id, machinery_id):
+    """Key identifying the item an alert or price row refers to"""
+    return ('material', material_id) if material_id else ('machinery', machinery_id)
+
+
+def empty_stats():
+    return {'min_price': None, 'max_price': None, 'count': 0, 'in_stock': 0}
+
+
+def merge_stats(stats, row):
+    """Fold one grouped price row into running min/max/stock statistics"""
+    if row['min_price'] is not None and (stats['min_price'] is None or row['min_price'] < stats['min_price']):
+        stats['min_price'] = row['min_price']
+    if row['max_price'] is not None and (stats['max_price'] is None or row['max_price'] > stats['max_price']):
+        stats['max_price'] = row['max_price']
+    stats['count'] += row['count']
+    stats['in_stock'] += row['in_stock']
+    return stats
+
+
+def grouped_price_stats(queryset):
+    """Min/max price, row count and in-stock count per item and region in one query"""
+    return queryset.values('material_id', 'machinery_id', 'region_id').annotate(
+        min_price=Min('price'),
+        max_price=Max('price'),
+        count=Count('id'),
+        in_stock=Count('id', filter=Q(in_stock=True))
+    ).order_by()
+
+
+def is_triggered(alert_type, threshold_price, stats):
+    """Whether an alert condition holds for the given price statistics"""
+    if not stats['count']:
+        return False
+    if alert_type == 'price_drop':
+        return bool(threshold_price and stats['min_price'] and stats['min_price'] <= threshold_price)
+    if alert_type == 'price_increase':
+        return bool(threshold_price and stats['max_price'] and stats['max_price'] >= threshold_price)
+    if alert_type == 'back_in_stock':
+        return stats['in_stock'] > 0
+    if alert_type == 'out_of_stock':
+        return stats['in_stock'] == 0
+    return False
+
+
+class AlertEngine:
+    """
+    Evaluate many price alerts against the current price table at once.
+    
+    Alerts are grouped by item and location, price statistics for every
+    watched item are read with one grouped query and combined per region
+    subtree in memory, so each distinct (item, location) pair is evaluated
+    once no matter how many alerts watch it.
+    """
+    
+    def __init__(self, alerts=None):
+        self.alerts = alerts if alerts is not None else PriceAlert.objects.filter(is_active=True)
+    
+    def group_alerts(self):
+        """Active alerts grouped by (item, region) or (item, unresolved location text)"""
+        groups = {}
+        for alert in self.alerts.values(*ALERT_FIELDS).iterator(chunk_size=5000):
+            if not (alert['material_id'] or alert['machinery_id']):
+                continue
+            if alert['region_id']:
+                scope = ('region', alert['region_id'])
+            elif alert['location']:
+                scope = ('text', normalize_location(alert['location']))
+            else:
+                scope = None
+            key = (item_key(alert['material_id'], alert['machinery_id']), scope)
+            groups.setdefault(key, []).append(alert)
+        return groups
+    
+    def load_stats(self):
+        """Grouped price statistics per item, keyed by region ID"""
+        stats = {}
+        queryset = CurrentPrice.objects.filter(
+            Q(material_id__in=self.alerts.filter(material__isnull=False).values('material_id'))
+            | Q(machinery_id__in=self.alerts.filter(machinery__isnull=False).values('machinery_id'))
+        )
+        for row in grouped_price_stats(queryset):
+            key = item_key(row['material_id'], row['machinery_id'])
+            stats.setdefault(key, {})[row['region_id']] = row
+        return stats
+    
+    def scope_stats(self, key, scope, item_stats):
+        """Combine an item's per-region statistics for an alert scope"""
+        stats = empty_stats()
+        if scope is None:
+            for row in item_stats.values():
+                merge_stats(stats, row)
+        elif scope[0] == 'region':
+            for region_id in Location.objects.subtree_ids(scope[1]):
+                if region_id in item_stats:
+                    merge_stats(stats, item_stats[region_id])
+        else:
+            # Locations that do not resolve to a region fall back to a text match
+            item_type, item_id = key
+            queryset = filter_by_location(
+                CurrentPrice.objects.filter(**{f'{item_type}_id': item_id}), scope[1]
+            )
+            for row in grouped_price_stats(queryset):
+                merge_stats(stats, row)
+        return stats
+    
+    def evaluate(self):
+        """IDs of alerts whose conditions currently hold"""
+        stats = self.load_stats()
+        triggered = []
+        for (key, scope), alerts in self.group_alerts().items():
+            if key not in stats:
+                continue
+            scoped = self.scope_stats(key, scope, stats[key])
+            triggered.extend(
+                alert['id'] for alert in alerts
+                if is_triggered(alert['alert_type'], alert['threshold_price'], scoped)
+            )
+        return triggered
+    
+    def trigger(self, alert_ids, batch_size=5000):
+        """Mark alerts as triggered in bulk and enqueue one notification task"""
+        if not alert_ids:
+            return 0
+        
+        from .tasks import send_price_alert_notifications
+        
+        alert_ids = list(alert_ids)
+        now = timezone.now()
+        count = 0
+        with transaction.atomic():
+            # Batched only to stay below database parameter limits
+            for start in range(0, len(alert_ids), batch_size):
+                count += PriceAlert.objects.filter(id__in=alert_ids[start:start + batch_size]).update(
+                    last_triggered=now,
+                    updated_at=now
+                )
+            transaction.on_commit(lambda: send_price_alert_notifications.delay(alert_ids))
+        return count
+    
+    def run(self):
+        """Evaluate all alerts and trigger those whose conditions hold"""
+        triggered = self.evaluate()
+        self.trigger(triggered)
+        return triggered
+
+
+def crossed(alert, change):
+    """Whether a price change moves an alert's condition from false to true"""
+    threshold = alert['threshold_price']
+    old_price = Decimal(change['old_price']) if change['old_price'] is not None else None
+    new_price = Decimal(change['new_price'])
+    
+    if alert['alert_type'] == 'price_drop':
+        return bool(threshold and new_price and new_price <= threshold
+                    and (old_price is None or old_price > threshold))
+    if alert['alert_type'] == 'price_increase':
+        return bool(threshold and new_price >= threshold
+                    and (old_price is None or old_price < threshold))
+    if alert['alert_type'] == 'back_in_stock':
+        return bool(change['new_in_stock'] and not change['old_in_stock'])
+    if alert['alert_type'] == 'out_of_stock':
+        return bool(change['old_in_stock'] and not change['new_in_stock'])
+    return False
+
+
+def in_scope(alert, change):
+    """Whether a price change falls inside an alert's location"""
+    if alert['region_id']:
+        return change['region_id'] in Location.objects.subtree_ids(alert['region_id'])
+    if alert['location']:
+        return normalize_location(alert['location']) in normalize_location(change['location'])
+    return True
+
+
+def match_price_changes(changes, debounce_seconds=None):
+    """
+    Trigger alerts affected by a batch of price changed events.
+    
+    Only active alerts on the changed items are read, alerts triggered within
+    the debounce window are skipped, and alerts whose threshold or stock
+    state was crossed by an event are confirmed against the current prices
+    of their whole location before being triggered.
+    """
+    if debounce_seconds is None:
+        debounce_seconds = getattr(settings, 'PRICE_ALERT_DEBOUNCE_SECONDS', 3600)
+    
+    changes_by_item = {}
+    for change in changes:
+        changes_by_item.setdefault(item_key(change['material_id'], change['machinery_id']), []).append(change)
+    
+    material_ids = [item_id for item_type, item_id in changes_by_item if item_type == 'material']
+    machinery_ids = [item_id for item_type, item_id in changes_by_item if item_type == 'machinery']
+    alerts = PriceAlert.objects.filter(
+        Q(material_id__in=material_ids) | Q(machinery_id__in=machinery_ids),
+        is_active=True
+    ).exclude(
+        last_triggered__gte=timezone.now() - timedelta(seconds=debounce_seconds)
+    )
+    
+    candidates = [
+        alert['id'] for alert in alerts.values(*ALERT_FIELDS)
+        if any(
+            in_scope(alert, change) and crossed(alert, change)
+            for change in changes_by_item[item_key(alert['material_id'], alert['machinery_id'])]
+        )
+    ]
+    if not candidates:
+        return []
+    
+    engine = AlertEngine(PriceAlert.objects.filter(id__in=candidates))
+    return engine.run()
+
+
+def publish_price_changes(changes):
+    """Queue price changed events for the alert matcher once the transaction commits"""
+    if not changes:
+        return
+    
+    from .tasks import process_price_changes
+    
+    transaction.on_commit(lambda: process_price_changes.delay(changes))
@@ -0,0 +1,455 @@
+"""
+Columnar store of the daily price history.
+
+Every month of history per item type is one segment directory holding each
+rollup column as a NumPy array, sorted by item, date and row ID. Segments are
+rewritten after every rollup and keep history the database has since pruned,
+so range, resample, rolling and percentile queries over any number of years
+run vectorized over memory-mapped files instead of the database.
+
+NumPy is an optional dependency; the store is used when PRICE_HISTORY_STORE
+is enabled and NumPy is installed.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from datetime import date
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Min
+from toplorgical.cache import CACHE_ERRORS
+from .models import Location, PriceHistory
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ITEM_TYPES = ['material', 'machinery']
+
+# Column name and NumPy dtype of every array in a segment. location holds
+# codes into the segment's locations array; a region_id of -1 means no region.
+COLUMNS = {
+    'id': 'int64',
+    'item_id': 'int64',
+    'date': 'datetime64[D]',
+    'region_id': 'int64',
+    'location': 'int32',
+    'avg_price': 'float64',
+    'min_price': 'float64',
+    'max_price': 'float64',
+    'data_points': 'int64',
+}
+
+# Latest date any host synced the store through, shared so a host can tell its copy is stale
+SYNCED_THROUGH_KEY = 'price-history-store:synced-through'
+
+RESAMPLE_FREQUENCIES = ['week', 'month']
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def history_store_enabled():
+    """Whether the columnar store is configured and NumPy is available"""
+    return bool(getattr(settings, 'PRICE_HISTORY_STORE', False)) and np is not None
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def month_starts(start_date, end_date):
+    """First day of every month from the month of start_date to the month of end_date"""
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        yield month
+        month = next_month(month)
+
+
+def group_bounds(*keys):
+    """Start and end indexes of the runs of equal keys in arrays sorted by those keys"""
+    size = len(keys[0])
+    if not size:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    changed = np.zeros(size, dtype=bool)
+    changed[0] = True
+    for key in keys:
+        changed[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(changed)
+    return starts, np.append(starts[1:], size)
+
+
+def empty_columns(columns):
+    """Empty arrays for the columns of a range query, with location decoded to strings"""
+    return {column: np.empty(0, dtype=str if column == 'location' else COLUMNS[column]) for column in columns}
+
+
+def aggregate_daily(columns, starts):
+    """
+    Combine the rows of each group into one: data point weighted average
+    price, lowest minimum, highest maximum and total data points.
+    """
+    points = np.add.reduceat(columns['data_points'], starts)
+    counts = np.diff(np.append(starts, len(columns['avg_price'])))
+    # Rows without data points count with equal weight
+    weighted = np.add.reduceat(columns['avg_price'] * columns['data_points'], starts)
+    plain = np.add.reduceat(columns['avg_price'], starts) / counts
+    return {
+        'avg_price': np.divide(weighted, points, out=plain, where=points > 0),
+        'min_price': np.minimum.reduceat(columns['min_price'], starts),
+        'max_price': np.maximum.reduceat(columns['max_price'], starts),
+        'data_points': points,
+    }
+
+
+def window_reduce(ufunc, values, bounds):
+    """Reduce values over the windows given as pairs of start and end bounds"""
+    return ufunc.reduceat(np.append(values, values[-1]), bounds)[0::2]
+
+
+class PriceHistoryStore:
+    """Month-partitioned columnar copy of PriceHistory with vectorized queries"""
+    
+    def __init__(self, root=None):
+        if np is None:
+            raise ImproperlyConfigured('The price history store requires NumPy')
+        self.root = Path(root or settings.PRICE_HISTORY_STORE_DIR)
+    
+    def segment_path(self, item_type, month):
+        return self.root / item_type / f'{month:%Y-%m}'
+    
+    def segments(self, item_type):
+        """Months with a segment for an item type, oldest first"""
+        directory = self.root / item_type
+        if not directory.exists():
+            return []
+        return sorted(
+            date.fromisoformat(f'{path.name}-01')
+            for path in directory.iterdir()
+            if path.is_dir() and len(path.name) == 7
+        )
+    
+    def sync(self, start_date, end_date):
+        """Rewrite the segments of every month touched by a rollup of start_date to end_date"""
+        written = {'segments': 0, 'rows': 0}
+        for item_type in ITEM_TYPES:
+            retained_from = PriceHistory.objects.filter(
+                **{f'{item_type}__isnull': False}
+            ).aggregate(first=Min('date'))['first']
+            for month in month_starts(start_date, end_date):
+                written['segments'] += 1
+                written['rows'] += self.write_month(item_type, month, retained_from)
+        self.mark_synced(end_date)
+        return written
+    
+    def synced_through(self):
+        """Latest date this copy of the store has been synced through, or None"""
+        try:
+            return date.fromisoformat((self.root / 'synced_through').read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def mark_synced(self, end_date):
+        """Record the sync locally and in the shared cache"""
+        through = max(end_date, self.synced_through() or end_date)
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f'.synced_through-{os.getpid()}'
+        staging.write_text(through.isoformat())
+        os.replace(staging, self.root / 'synced_through')
+        try:
+            cache.set(SYNCED_THROUGH_KEY, through.isoformat(), None)
+        except CACHE_ERRORS as e:
+            logger.warning(f"Could not share price history store sync date: {e}")
+    
+    def covers(self, item_type, start_date, end_date):
+        """
+        Whether this copy of the store can answer for a date range: every
+        month in it has a segment and no host has synced past this copy.
+        False when the shared cache cannot be asked.
+        """
+        synced_through = self.synced_through()
+        if synced_through is None:
+            return False
+        try:
+            shared = cache.get(SYNCED_THROUGH_KEY)
+        except CACHE_ERRORS as e:
+            logger.warning(f"Could not check price history store sync date: {e}")
+            return False
+        if shared is not None and synced_through < date.fromisoformat(shared):
+            return False
+        return all(
+            self.segment_path(item_type, month).exists()
+            for month in month_starts(start_date, end_date)
+        )
+    
+    def write_month(self, item_type, month, retained_from=None):
+        """
+        Rewrite one month of an item type from the database.
+        
+        Rows of the existing segment dated before retained_from, the first
+        date still in the database, are kept. Months without history get an
+        empty segment, which records that they have been synced. Returns the
+        number of rows written.
+        """
+        columns = self.read_database_month(item_type, month)
+        path = self.segment_path(item_type, month)
+        if path.exists() and retained_from is not None and retained_from > month:
+            columns = self.merge_retained(path, columns, retained_from)
+        
+        order = np.lexsort((columns['id'], columns['date'], columns['item_id']))
+        self.write_segment(path, {
+            column: values if column == 'locations' else values[order]
+            for column, values in columns.items()
+        })
+        return len(order)
+    
+    def read_database_month(self, item_type, month):
+        """One month of an item type's history as segment columns"""
+        rows = PriceHistory.objects.filter(
+            **{f'{item_type}__isnull': False},
+            date__gte=month,
+            date__lt=next_month(month)
+        ).order_by().values_list(
+            'id', f'{item_type}_id', 'date', 'region_id', 'location',
+            'avg_price', 'min_price', 'max_price', 'data_points'
+        )
+        
+        values = {column: [] for column in COLUMNS}
+        for row in rows.iterator(chunk_size=10000):
+            for column, value in zip(COLUMNS, row):
+                values[column].append(value)
+        values['region_id'] = [-1 if region_id is None else region_id for region_id in values['region_id']]
+        
+        locations, codes = np.unique(np.array(values.pop('location'), dtype=str), return_inverse=True)
+        columns = {column: np.array(values[column], dtype=COLUMNS[column]) for column in values}
+        columns['location'] = codes.astype(COLUMNS['location']).reshape(-1)
+        columns['locations'] = locations
+        return columns
+    
+    def merge_retained(self, path, columns, retained_from):
+        """Add the rows of an existing segment that the database no longer has"""
+        existing = self.read_segment(path, list(COLUMNS) + ['locations'])
+        keep = existing['date'] < np.datetime64(retained_from, 'D')
+        merged = {
+            column: np.concatenate([existing[column][keep], columns[column]])
+            for column in COLUMNS if column != 'location'
+        }
+        names = np.concatenate([existing['locations'][existing['location'][keep]], columns['locations'][columns['location']]])
+        merged['locations'], codes = np.unique(names, return_inverse=True)
+        merged['location'] = codes.astype(COLUMNS['location']).reshape(-1)
+        return merged
+    
+    def write_segment(self, path, columns):
+        """Write a segment to a temporary directory and swap it into place"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f'.{path.name}-', dir=path.parent))
+        for column, values in columns.items():
+            np.save(staging / f'{column}.npy', values, allow_pickle=False)
+        
+        retired = None
+        if path.exists():
+            retired = path.with_name(f'.{path.name}-retired-{os.getpid()}')
+            os.replace(path, retired)
+        os.replace(staging, path)
+        if retired is not None:
+            shutil.rmtree(retired, ignore_errors=True)
+    
+    def read_segment(self, path, columns):
+        return {
+            column: np.load(path / f'{column}.npy', mmap_mode='r', allow_pickle=False)
+            for column in columns
+        }
+    
+    def range(self, item_type, start_date, end_date, item_ids=None, location=None, columns=None):
+        """
+        History rows of an item type from start_date to end_date as arrays.
+        
+        Returns a dict of column arrays sorted by item, date and row ID, with
+        location decoded to strings. location narrows rows the same way as
+        filter_by_location(): a known region and everything below it plus
+        unresolved rows containing the text, or else the text alone.
+        """
+        columns = list(columns or COLUMNS)
+        start, end = np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D')
+        region_ids = None
+        text = location.lower() if location else None
+        if location:
+            region = Location.objects.resolve(location)
+            if region is not None:
+                region_ids = np.array(Location.objects.subtree_ids(region))
+        
+        needed = set(columns) | {'item_id', 'date'}
+        if region_ids is not None:
+            needed.add('region_id')
+        if text is not None or 'location' in needed:
+            needed |= {'location', 'locations'}
+        
+        parts = []
+        for month in month_starts(start_date, end_date):
+            path = self.segment_path(item_type, month)
+            if not path.exists():
+                continue
+            segment = self.read_segment(path, needed)
+            mask = (segment['date'] >= start) & (segment['date'] <= end)
+            if item_ids is not None:
+                mask &= np.isin(segment['item_id'], np.asarray(list(item_ids)))
+            if text is not None:
+                matched = (np.char.find(np.char.lower(segment['locations']), text) >= 0)[segment['location']]
+                if region_ids is not None:
+                    matched = np.isin(segment['region_id'], region_ids) | (matched & (segment['region_id'] == -1))
+                mask &= matched
+            
+            part = {column: np.asarray(segment[column][mask]) for column in needed if column != 'locations'}
+            if 'location' in part:
+                part['location'] = np.asarray(segment['locations'])[part['location']]
+            parts.append(part)
+        
+        if not parts:
+            return empty_columns(columns)
+        
+        result = {column: np.concatenate([part[column] for part in parts]) for column in needed if column != 'locations'}
+        if len(parts) == 1:
+            return {column: result[column] for column in columns}
+        # Parts are sorted and in date order, so a stable sort by item keeps date and ID order
+        order = np.argsort(result['item_id'], kind='stable')
+        return {column: result[column][order] for column in columns}
+    
+    def daily(self, item_type, start_date, end_date, item_ids=None, location=None):
+        """Daily prices per item across locations, sorted by item and date"""
+        rows = self.range(
+            item_type, start_date, end_date, item_ids, location,
+            columns=['item_id', 'date', 'avg_price', 'min_price', 'max_price', 'data_points']
+        )
+        if not len(rows['item_id']):
+            return rows
+        
+        starts, _ = group_bounds(rows['item_id'], rows['date'])
+        return {'item_id': rows['item_id'][starts], 'date': rows['date'][starts], **aggregate_daily(rows, starts)}
+    
+    def resample(self, item_type, start_date, end_date, frequency='week', item_ids=None, location=None):
+        """
+        Prices per item and calendar week (starting Monday) or month.
+        
+        Each period carries the data point weighted average price, the
+        lowest and highest price and the number of data points.
+        """
+        if frequency not in RESAMPLE_FREQUENCIES:
+            raise ValueError(f"frequency must be one of {', '.join(RESAMPLE_FREQUENCIES)}")
+        daily = self.daily(item_type, start_date, end_date, item_ids, location)
+        if not len(daily['item_id']):
+            daily['period'] = daily.pop('date')
+            return daily
+        
+        if frequency == 'month':
+            periods = daily['date'].astype('datetime64[M]').astype('datetime64[D]')
+        else:
+            # Day 0 of datetime64, 1970-01-01, is a Thursday
+            periods = daily['date'] - (daily['date'].astype('int64') + 3) % 7
+        
+        starts, _ = group_bounds(daily['item_id'], periods)
+        return {'item_id': daily['item_id'][starts], 'period': periods[starts], **aggregate_daily(daily, starts)}
+    
+    def rolling(self, item_type, start_date, end_date, window=7, item_ids=None, location=None):
+        """
+        Rolling mean, standard deviation, minimum and maximum of the daily
+        average price per item, over the last window daily observations.
+        """
+        if window < 1:
+            raise ValueError('window must be at least 1')
+        daily = self.daily(item_type, start_date, end_date, item_ids, location)
+        prices = daily['avg_price']
+        size = len(prices)
+        result = {'item_id': daily['item_id'], 'date': daily['date'], 'avg_price': prices}
+        if not size:
+            empty = np.empty(0)
+            return {**result, 'observations': np.empty(0, dtype=np.int64), 'mean': empty, 'std': empty, 'min': empty, 'max': empty}
+        
+        starts, ends = group_bounds(daily['item_id'])
+        lengths = ends - starts
+        index = np.arange(size)
+        first = np.maximum(index - window + 1, np.repeat(starts, lengths))
+        observations = index - first + 1
+        
+        # Every window is [first, index]; reduceat reduces from each bound to
+        # the next, so each window is a pair of bounds and odd slots are dropped
+        bounds = np.empty(2 * size, dtype=np.int64)
+        bounds[0::2] = first
+        bounds[1::2] = index + 1
+        
+        # Centre each item on its mean to keep the sums of squares precise
+        item_means = np.repeat(np.add.reduceat(prices, starts) / lengths, lengths)
+        centred = prices - item_means
+        mean = window_reduce(np.add, centred, bounds) / observations
+        variance = window_reduce(np.add, centred ** 2, bounds) / observations - mean ** 2
+        return {
+            **result,
+            'observations': observations,
+            'mean': mean + item_means,
+            'std': np.sqrt(np.maximum(variance, 0)),
+            'min': window_reduce(np.minimum, prices, bounds),
+            'max': window_reduce(np.maximum, prices, bounds),
+        }
+    
+    def percentiles(self, item_type, start_date, end_date, percentiles=DEFAULT_PERCENTILES, item_ids=None, location=None):
+        """
+        Percentiles of the daily average price per item, linearly
+        interpolated, keyed by percentile.
+        """
+        daily = self.daily(item_type, start_date, end_date, item_ids, location)
+        starts, ends = group_bounds(daily['item_id'])
+        counts = ends - starts
+        prices = daily['avg_price']
+        if len(prices):
+            # Days are grouped by item, so shifting each item's prices past the
+            # previous item's sorts prices within items with a single argsort
+            span = prices.max() - prices.min() + 1
+            prices = prices[np.argsort(np.repeat(np.arange(len(starts)), counts) * span + prices)]
+        
+        result = {'item_id': daily['item_id'][starts], 'observations': counts}
+        for percentile in percentiles:
+            if not 0 <= percentile <= 100:
+                raise ValueError('percentiles must be between 0 and 100')
+            position = starts + (counts - 1) * (percentile / 100)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            result[percentile] = prices[lower] + (prices[upper] - prices[lower]) * (position - lower)
+        return result
+    
+    def trends(self, item_type, start_date, end_date, location=None, order='percent', limit=10, min_change=5):
+        """
+        Price change of every item of one type over a date range.
+        
+        Same rows and ordering as PriceHistory.objects.trends(), computed from
+        the first and last history row of each item in the store.
+        """
+        rows = self.range(item_type, start_date, end_date, location=location, columns=['item_id', 'avg_price'])
+        starts, ends = group_bounds(rows['item_id'])
+        item_ids = rows['item_id'][starts]
+        first_prices = rows['avg_price'][starts]
+        last_prices = rows['avg_price'][ends - 1]
+        points = ends - starts
+        
+        valid = (points >= 2) & (first_prices > 0) & (last_prices > 0)
+        changes = last_prices - first_prices
+        percents = np.divide(changes * 100, first_prices, out=np.zeros_like(changes), where=valid)
+        if min_change is not None:
+            valid &= np.abs(percents) > min_change
+        
+        selected = np.flatnonzero(valid)
+        magnitudes = np.abs(changes if order == 'absolute' else percents)[selected]
+        selected = selected[np.lexsort((item_ids[selected], -magnitudes))][:limit]
+        return [
+            {
+                'item_id': int(item_ids[i]),
+                'first_price': float(first_prices[i]),
+                'last_price': float(last_prices[i]),
+                'absolute_change': round(float(changes[i]), 2),
+                'change_percent': float(percents[i]),
+                'points': int(points[i]),
+            }
+            for i in selected
+        ]
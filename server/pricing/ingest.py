@@ -0,0 +1,285 @@
+import json
+import zlib
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from toplorgical.cache import invalidate_tags
+from .models import Supplier, PriceData, PriceChange, CurrentPrice, bulk_update_by_pk, price_cache_tags
+from .serializers import ScrapedDataSerializer
+from .alerts import publish_price_changes
+from .matching import catalog_index, spec_ean
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Largest number of items accepted in one batch request
+MAX_BATCH_ITEMS = 20000
+# Largest batch request body accepted, before and after decompression
+MAX_BATCH_BYTES = 32 * 1024 * 1024
+
+PRICE_DATA_UPDATE_FIELDS = [
+    'price', 'unit', 'rental_price_daily', 'rental_price_weekly', 'in_stock',
+    'stock_quantity', 'location', 'region', 'source_url', 'scraped_at', 'is_active',
+    'updated_at'
+]
+
+
+class IngestError(ValueError):
+    """Raised when a batch request body cannot be decoded"""
+
+
+class BatchTooLarge(IngestError):
+    """Raised when a batch request body is larger than MAX_BATCH_BYTES"""
+
+
+def decompress_gzip(body, max_bytes=MAX_BATCH_BYTES):
+    """
+    Decompress a gzip body of one or more members.
+    
+    Output is produced at most max_bytes at a time, so a small body that
+    expands enormously is rejected without being held in memory.
+    """
+    chunks = []
+    size = 0
+    while body:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            chunk = decompressor.decompress(body, max_bytes - size + 1)
+        except zlib.error as e:
+            raise IngestError(f'Invalid gzip body: {e}')
+        size += len(chunk)
+        if size > max_bytes:
+            raise BatchTooLarge(f'Batch too large: more than {max_bytes} bytes decompressed')
+        if not decompressor.eof:
+            raise IngestError('Invalid gzip body: unexpected end of data')
+        chunks.append(chunk)
+        body = decompressor.unused_data
+    return b''.join(chunks)
+
+
+def parse_batch(body, content_type='', content_encoding=''):
+    """
+    Decode a batch of scraped items from a request body.
+    
+    Accepts a JSON array, an object with an "items" array or JSON lines,
+    optionally gzip compressed. Returns a list with one entry per item;
+    JSON lines that fail to parse are returned as IngestError instances so
+    they can be reported per item. Raises BatchTooLarge when the body
+    decompresses to more than MAX_BATCH_BYTES.
+    """
+    if 'gzip' in content_encoding or 'gzip' in content_type or body[:2] == GZIP_MAGIC:
+        body = decompress_gzip(body)
+    
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise IngestError(f'Body is not UTF-8: {e}')
+    
+    stripped = text.lstrip()
+    if stripped[:1] in ('[', '{') and 'ndjson' not in content_type and 'jsonl' not in content_type:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            # Several objects on separate lines are JSON lines, anything else is invalid
+            if not stripped.startswith('{'):
+                raise IngestError(f'Invalid JSON: {e}')
+        else:
+            if isinstance(data, dict):
+                data = data.get('items', [data])
+            if not isinstance(data, list):
+                raise IngestError('Expected a list of items')
+            return data
+    
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(IngestError(f'Invalid JSON: {e}'))
+    return items
+
+
+def resolve_suppliers(items):
+    """Get or create suppliers for a batch by name and mark them as scraped"""
+    websites = {}
+    for data in items:
+        websites.setdefault(data['supplier'], data.get('supplier_url', ''))
+    
+    suppliers = {supplier.name: supplier for supplier in Supplier.objects.filter(name__in=websites)}
+    missing = [
+        Supplier(name=name, website=website, is_active=True)
+        for name, website in websites.items() if name not in suppliers
+    ]
+    if missing:
+        Supplier.objects.bulk_create(missing, ignore_conflicts=True)
+        suppliers = {supplier.name: supplier for supplier in Supplier.objects.filter(name__in=websites)}
+    
+    now = timezone.now()
+    Supplier.objects.filter(name__in=websites).update(last_scraped=now, updated_at=now)
+    invalidate_tags('suppliers')
+    return suppliers
+
+
+def ingest_scraped_items(raw_items, batch_size=1000):
+    """
+    Validate and write a batch of scraped items.
+    
+    Returns one status dict per input item, in input order: created,
+    changed, unchanged, duplicate (superseded by a later item in the batch)
+    or error.
+    """
+    results = [{'index': index} for index in range(len(raw_items))]
+    valid = []
+    # One serializer instance validates every item, so its fields are built once
+    serializer = ScrapedDataSerializer()
+    for index, raw in enumerate(raw_items):
+        if isinstance(raw, IngestError):
+            results[index].update({'status': 'error', 'errors': {'non_field_errors': [str(raw)]}})
+            continue
+        try:
+            valid.append((index, serializer.run_validation(raw)))
+        except serializers.ValidationError as e:
+            results[index].update({'status': 'error', 'errors': e.detail})
+    
+    write_scraped_items(valid, results, batch_size)
+    return results
+
+
+def write_scraped_items(valid, results, batch_size=1000):
+    """
+    Write validated (index, data) items and fill in their results.
+    
+    Suppliers are resolved for the whole batch, items are matched against
+    the in-process catalog index, existing price data rows are looked up by
+    (supplier, material, machinery, sku) with one query per chunk, and rows
+    are written with bulk_create (new rows) and an upsert on the primary key
+    (existing rows).
+    """
+    if not valid:
+        return results
+    
+    suppliers = resolve_suppliers([data for _, data in valid])
+    catalog = catalog_index()
+    
+    for start in range(0, len(valid), batch_size):
+        write_chunk(valid[start:start + batch_size], suppliers, catalog, results)
+    return results
+
+
+def price_data_values(data):
+    """PriceData field values for a validated scraped item"""
+    return {
+        'price': data.get('price', 0),
+        'unit': data.get('unit', ''),
+        'rental_price_daily': data.get('rental_price_daily'),
+        'rental_price_weekly': data.get('rental_price_weekly'),
+        'in_stock': data.get('in_stock', True),
+        'stock_quantity': data.get('stock_quantity'),
+        'location': data.get('location', ''),
+        'source_url': data.get('product_url', ''),
+        'is_active': True,
+    }
+
+
+def match_item(index, data):
+    """Best catalog match for a validated scraped item, or None"""
+    return index.match(
+        data['name'],
+        data.get('category', ''),
+        data.get('sku', ''),
+        data.get('ean') or spec_ean(data.get('specifications'))
+    )
+
+
+def write_chunk(chunk, suppliers, catalog, results):
+    """
+    Upsert price data for a chunk of validated items.
+    
+    Items whose values match the stored row are not written at all; new and
+    changed rows are written in bulk and get a PriceChange history point.
+    """
+    now = timezone.now()
+    
+    # The last item for a key wins; earlier duplicates in the batch are reported
+    latest = {}
+    for index, data in chunk:
+        match = match_item(catalog, data)
+        results[index]['match'] = match.as_dict() if match else None
+        key = (
+            suppliers[data['supplier']].pk,
+            match.material_id if match else None,
+            match.machinery_id if match else None,
+            data.get('sku', '')
+        )
+        if key in latest:
+            results[latest[key][0]]['status'] = 'duplicate'
+        latest[key] = (index, data)
+    
+    existing = {}
+    rows = PriceData.objects.filter(
+        supplier_id__in={key[0] for key in latest},
+        sku__in={key[3] for key in latest}
+    ).order_by('created_at', 'id')
+    for row in rows:
+        # Rows are ordered by creation, so the most recent row per key is updated
+        existing[(row.supplier_id, row.material_id, row.machinery_id, row.sku)] = row
+    
+    to_create = []
+    to_update = []
+    written = []
+    for key, (index, data) in latest.items():
+        values = price_data_values(data)
+        row = existing.get(key)
+        if row is None:
+            row = PriceData(supplier_id=key[0], material_id=key[1], machinery_id=key[2], sku=key[3])
+            to_create.append(row)
+            results[index]['status'] = 'created'
+            old_price, old_in_stock = None, None
+        elif any(getattr(row, field) != value for field, value in values.items()):
+            to_update.append(row)
+            results[index]['status'] = 'changed'
+            old_price, old_in_stock = row.price, row.in_stock
+        else:
+            # Nothing changed, so skip the write entirely
+            results[index].update({'status': 'unchanged', 'price_data_id': row.pk})
+            continue
+        
+        for field, value in values.items():
+            setattr(row, field, value)
+        row.scraped_at = now
+        row.updated_at = now
+        # bulk writes bypass save(), so resolve the region here
+        row.resolve_region()
+        written.append((index, row, old_price, old_in_stock))
+    
+    if not written:
+        return
+    
+    with transaction.atomic():
+        PriceData.objects.bulk_create(to_create)
+        bulk_update_by_pk(PriceData, to_update, PRICE_DATA_UPDATE_FIELDS)
+        PriceChange.objects.bulk_create([
+            PriceChange(
+                price_data=row,
+                old_price=old_price,
+                new_price=row.price,
+                old_in_stock=old_in_stock,
+                new_in_stock=row.in_stock
+            )
+            for _, row, old_price, old_in_stock in written
+            if old_price != row.price or old_in_stock != row.in_stock
+        ])
+        
+        # Keep the current price table in step with the raw data and
+        # notify the alert matcher of price and stock changes
+        publish_price_changes(CurrentPrice.objects.upsert_from_price_data([row for _, row, _, _ in written]))
+    
+    # bulk writes bypass PriceData.save(), so invalidate the cached prices here
+    invalidate_tags(*{
+        tag for _, row, _, _ in written
+        for tag in price_cache_tags(row.material_id, row.machinery_id)
+    })
+    
+    for index, row, _, _ in written:
+        results[index]['price_data_id'] = row.pk
@@ -0,0 +1,168 @@
+import re
+
+# UK regions with their postcode areas as (area code, post town) pairs
+UK_REGIONS = [
+    ('gb-lon', 'London', [
+        ('E', 'London E'), ('EC', 'London EC'), ('N', 'London N'), ('NW', 'London NW'),
+        ('SE', 'London SE'), ('SW', 'London SW'), ('W', 'London W'), ('WC', 'London WC'),
+        ('BR', 'Bromley'), ('CR', 'Croydon'), ('EN', 'Enfield'), ('HA', 'Harrow'),
+        ('IG', 'Ilford'), ('KT', 'Kingston upon Thames'), ('RM', 'Romford'), ('SM', 'Sutton'),
+        ('TW', 'Twickenham'), ('UB', 'Southall'),
+    ]),
+    ('gb-se', 'South East', [
+        ('BN', 'Brighton'), ('CT', 'Canterbury'), ('DA', 'Dartford'), ('GU', 'Guildford'),
+        ('HP', 'Hemel Hempstead'), ('ME', 'Rochester'), ('MK', 'Milton Keynes'), ('OX', 'Oxford'),
+        ('PO', 'Portsmouth'), ('RG', 'Reading'), ('RH', 'Redhill'), ('SL', 'Slough'),
+        ('SO', 'Southampton'), ('TN', 'Tonbridge'),
+    ]),
+    ('gb-sw', 'South West', [
+        ('BA', 'Bath'), ('BH', 'Bournemouth'), ('BS', 'Bristol'), ('DT', 'Dorchester'),
+        ('EX', 'Exeter'), ('GL', 'Gloucester'), ('PL', 'Plymouth'), ('SN', 'Swindon'),
+        ('SP', 'Salisbury'), ('TA', 'Taunton'), ('TQ', 'Torquay'), ('TR', 'Truro'),
+    ]),
+    ('gb-ee', 'East of England', [
+        ('AL', 'St Albans'), ('CB', 'Cambridge'), ('CM', 'Chelmsford'), ('CO', 'Colchester'),
+        ('IP', 'Ipswich'), ('LU', 'Luton'), ('NR', 'Norwich'), ('PE', 'Peterborough'),
+        ('SG', 'Stevenage'), ('SS', 'Southend-on-Sea'), ('WD', 'Watford'),
+    ]),
+    ('gb-em', 'East Midlands', [
+        ('DE', 'Derby'), ('LE', 'Leicester'), ('LN', 'Lincoln'), ('NG', 'Nottingham'),
+        ('NN', 'Northampton'),
+    ]),
+    ('gb-wm', 'West Midlands', [
+        ('B', 'Birmingham'), ('CV', 'Coventry'), ('DY', 'Dudley'), ('HR', 'Hereford'),
+        ('ST', 'Stoke-on-Trent'), ('SY', 'Shrewsbury'), ('TF', 'Telford'), ('WR', 'Worcester'),
+        ('WS', 'Walsall'), ('WV', 'Wolverhampton'),
+    ]),
+    ('gb-yh', 'Yorkshire and the Humber', [
+        ('BD', 'Bradford'), ('DN', 'Doncaster'), ('HD', 'Huddersfield'), ('HG', 'Harrogate'),
+        ('HU', 'Hull'), ('HX', 'Halifax'), ('LS', 'Leeds'), ('S', 'Sheffield'),
+        ('WF', 'Wakefield'), ('YO', 'York'),
+    ]),
+    ('gb-nw', 'North West', [
+        ('BB', 'Blackburn'), ('BL', 'Bolton'), ('CA', 'Carlisle'), ('CH', 'Chester'),
+        ('CW', 'Crewe'), ('FY', 'Blackpool'), ('L', 'Liverpool'), ('LA', 'Lancaster'),
+        ('M', 'Manchester'), ('OL', 'Oldham'), ('PR', 'Preston'), ('SK', 'Stockport'),
+        ('WA', 'Warrington'), ('WN', 'Wigan'),
+    ]),
+    ('gb-ne', 'North East', [
+        ('DH', 'Durham'), ('DL', 'Darlington'), ('NE', 'Newcastle upon Tyne'), ('SR', 'Sunderland'),
+        ('TS', 'Middlesbrough'),
+    ]),
+    ('gb-wls', 'Wales', [
+        ('CF', 'Cardiff'), ('LD', 'Llandrindod Wells'), ('LL', 'Llandudno'), ('NP', 'Newport'),
+        ('SA', 'Swansea'),
+    ]),
+    ('gb-sct', 'Scotland', [
+        ('AB', 'Aberdeen'), ('DD', 'Dundee'), ('DG', 'Dumfries'), ('EH', 'Edinburgh'),
+        ('FK', 'Falkirk'), ('G', 'Glasgow'), ('HS', 'Outer Hebrides'), ('IV', 'Inverness'),
+        ('KA', 'Kilmarnock'), ('KW', 'Kirkwall'), ('KY', 'Kirkcaldy'), ('ML', 'Motherwell'),
+        ('PA', 'Paisley'), ('PH', 'Perth'), ('TD', 'Galashiels'), ('ZE', 'Lerwick'),
+    ]),
+    ('gb-nir', 'Northern Ireland', [
+        ('BT', 'Belfast'),
+    ]),
+]
+
+# Additional names that resolve to a location code
+EXTRA_ALIASES = {
+    'gb': ['uk', 'united kingdom', 'great britain', 'britain'],
+    'gb-lon': ['greater london', 'central london'],
+    'gb-ne': ['north east england'],
+    'gb-nw': ['north west england'],
+    'gb-yh': ['yorkshire'],
+    'gb-wls': ['cymru'],
+    'M': ['greater manchester', 'salford'],
+    'NE': ['newcastle', 'gateshead'],
+    'HU': ['kingston upon hull'],
+    'ST': ['stoke'],
+    'SS': ['southend'],
+    'ME': ['medway', 'chatham'],
+    'BN': ['brighton and hove', 'hove'],
+    'NP': ['newport wales'],
+    'G': ['glasgow city'],
+    'TS': ['teesside', 'stockton-on-tees'],
+}
+
+POSTCODE_RE = re.compile(r'^([a-z]{1,2})[0-9][0-9a-z]?(?:\s*[0-9][a-z]{2})?$')
+FULL_POSTCODE_RE = re.compile(r'\b([a-z]{1,2})[0-9][0-9a-z]?\s*[0-9][a-z]{2}\b')
+
+
+def normalize_location(location):
+    """Normalize a free-text location for equality comparisons"""
+    return ' '.join((location or '').split()).lower()
+
+
+def match_location(text, aliases):
+    """
+    Match free-text location to a location ID using an alias map.
+
+    Tries the whole text, then each comma separated part, then a UK postcode
+    or outward code (e.g. "M1" or "LS1 4AP") by its postcode area.
+    """
+    text = normalize_location(text)
+    if not text:
+        return None
+
+    candidates = [text] + [part.strip() for part in text.split(',') if part.strip()]
+    for candidate in candidates:
+        if candidate in aliases:
+            return aliases[candidate]
+
+    for candidate in candidates:
+        match = POSTCODE_RE.match(candidate)
+        if match and match.group(1) in aliases:
+            return aliases[match.group(1)]
+
+    match = FULL_POSTCODE_RE.search(text)
+    if match and match.group(1) in aliases:
+        return aliases[match.group(1)]
+
+    return None
+
+
+def load_locations(Location, LocationAlias):
+    """Create or update the built-in UK locations and aliases (idempotent)"""
+    country, _ = Location.objects.update_or_create(
+        code='gb',
+        defaults={'name': 'United Kingdom', 'kind': 'country', 'parent': None}
+    )
+    locations = {'gb': country}
+
+    for region_code, region_name, areas in UK_REGIONS:
+        region, _ = Location.objects.update_or_create(
+            code=region_code,
+            defaults={'name': region_name, 'kind': 'region', 'parent': country}
+        )
+        locations[region_code] = region
+
+        for area_code, post_town in areas:
+            locations[area_code] = Location.objects.update_or_create(
+                code=area_code.lower(),
+                defaults={'name': post_town, 'kind': 'postcode_area', 'parent': region}
+            )[0]
+
+    aliases = {}
+    for code, location in locations.items():
+        aliases[normalize_location(location.name)] = location
+        aliases[code.lower()] = location
+    for code, names in EXTRA_ALIASES.items():
+        for name in names:
+            aliases[normalize_location(name)] = locations[code]
+
+    for alias, location in aliases.items():
+        LocationAlias.objects.update_or_create(alias=alias, defaults={'location': location})
+
+    return len(locations)
+
+
+def backfill_regions(models, LocationAlias):
+    """Resolve the region of existing rows from their free-text location"""
+    aliases = dict(LocationAlias.objects.values_list('alias', 'location_id'))
+    updated = 0
+    for model in models:
+        for location in model.objects.values_list('location', flat=True).distinct():
+            region_id = match_location(location, aliases)
+            if region_id:
+                updated += model.objects.filter(location=location).update(region_id=region_id)
+    return updated
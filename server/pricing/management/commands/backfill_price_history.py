@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from pricing.tasks import refresh_price_trends, update_price_history
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily price history from raw price data for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First date to recompute (YYYY-MM-DD, default: 30 days ago)',
+        )
+        parser.add_argument(
+            '--end',
+            help='Last date to recompute (YYYY-MM-DD, default: today)',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        try:
+            start_date = date.fromisoformat(options['start']) if options['start'] else today - timedelta(days=30)
+            end_date = date.fromisoformat(options['end']) if options['end'] else today
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        if start_date > end_date:
+            raise CommandError('--start must not be after --end')
+
+        self.stdout.write(f'Recomputing price history from {start_date} to {end_date}...')
+        result = update_price_history(start_date.isoformat(), end_date.isoformat())
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {result['created']} created, {result['updated']} updated "
+            f"in {result['runtime_seconds']}s"
+        ))
+
+        if end_date >= today:
+            result = refresh_price_trends()
+            self.stdout.write(self.style.SUCCESS(f"✓ {result['trends']} price trends refreshed in {result['runtime_seconds']}s"))
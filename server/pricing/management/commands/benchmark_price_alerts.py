@@ -0,0 +1,74 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from pricing.alerts import AlertEngine
+from pricing.models import PriceAlert, CurrentPrice, Location
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark price alert evaluation over synthetic alerts for items with current prices. "
+        "All data is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alerts',
+            type=int,
+            default=100000,
+            help='Number of synthetic alerts to evaluate (default: 100000)',
+        )
+
+    def handle(self, *args, **options):
+        material_ids = list(CurrentPrice.objects.filter(material__isnull=False).values_list('material_id', flat=True).distinct())
+        machinery_ids = list(CurrentPrice.objects.filter(machinery__isnull=False).values_list('machinery_id', flat=True).distinct())
+        if not material_ids and not machinery_ids:
+            raise CommandError('No current prices found; run populate_sample_data first')
+
+        with transaction.atomic():
+            self.create_alerts(options['alerts'], material_ids, machinery_ids)
+
+            engine = AlertEngine()
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                triggered = engine.evaluate()
+            evaluated = time.perf_counter() - start
+
+            start = time.perf_counter()
+            engine.trigger(triggered)
+            marked = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Evaluated {options['alerts']} alerts in {evaluated:.3f}s with {len(queries)} queries")
+        self.stdout.write(f"Marked {len(triggered)} triggered alerts in {marked:.3f}s")
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete (fixtures rolled back)'))
+
+    def create_alerts(self, count, material_ids, machinery_ids):
+        user = User.objects.create(
+            email='benchmark-alerts@toplorgical.local',
+            username='benchmark-alerts',
+            first_name='Benchmark',
+            last_name='User',
+        )
+        region_ids = list(Location.objects.values_list('id', flat=True)) + [None] * 5
+        alert_types = [choice[0] for choice in PriceAlert.ALERT_TYPES]
+
+        alerts = []
+        for i in range(count):
+            material_id = random.choice(material_ids) if material_ids and (i % 2 or not machinery_ids) else None
+            alerts.append(PriceAlert(
+                user=user,
+                material_id=material_id,
+                machinery_id=None if material_id else random.choice(machinery_ids),
+                alert_type=random.choice(alert_types),
+                threshold_price=Decimal(random.randint(1, 500)),
+                region_id=random.choice(region_ids),
+            ))
+        PriceAlert.objects.bulk_create(alerts, batch_size=5000)
@@ -0,0 +1,86 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from materials.models import Material
+from pricing.models import PriceHistory, PriceTrend
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark top-k price trend lookups over synthetic precomputed trends, and the live "
+        "windowed trend query over the current price history. All data is created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=50000,
+            help='Number of synthetic tracked items per period (default: 50000)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Trends returned per lookup (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        material_ids = list(Material.objects.values_list('id', flat=True))
+        if not material_ids:
+            raise CommandError('No materials found; run populate_sample_data first')
+
+        end_date = timezone.now().date()
+        with transaction.atomic():
+            self.create_trends(options['items'], material_ids, end_date)
+
+            for days in PriceTrend.PERIODS:
+                for order in ['percent', 'absolute']:
+                    start = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        trends = list(PriceTrend.objects.top('material', days, end_date, order, options['limit']))
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"Top {len(trends)} of {options['items']} by {order} change over {days} days "
+                        f"in {elapsed * 1000:.1f}ms with {len(queries)} queries"
+                    )
+
+            transaction.set_rollback(True)
+
+        history = PriceHistory.objects.filter(date__gte=end_date - timedelta(days=30)).count()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            trends = list(PriceHistory.objects.trends('material', end_date - timedelta(days=30), end_date, limit=options['limit']))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Live top {len(trends)} over {history} history rows in {elapsed * 1000:.1f}ms "
+            f"with {len(queries)} queries"
+        )
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete (fixtures rolled back)'))
+
+    def create_trends(self, count, material_ids, end_date):
+        PriceTrend.objects.all().delete()
+        trends = []
+        for days in PriceTrend.PERIODS:
+            for i in range(count):
+                first_price = Decimal(random.randint(100, 50000)) / 100
+                last_price = Decimal(random.randint(100, 50000)) / 100
+                trends.append(PriceTrend(
+                    material_id=material_ids[i % len(material_ids)],
+                    period_days=days,
+                    end_date=end_date,
+                    first_price=first_price,
+                    last_price=last_price,
+                    absolute_change=last_price - first_price,
+                    change_percent=float((last_price - first_price) / first_price * 100),
+                    change_magnitude=abs(last_price - first_price),
+                    percent_magnitude=abs(float((last_price - first_price) / first_price * 100)),
+                    data_points=days,
+                ))
+        PriceTrend.objects.bulk_create(trends, batch_size=5000)
@@ -0,0 +1,55 @@
+import time
+from datetime import date
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from pricing.history_store import PriceHistoryStore
+from pricing.models import PriceHistory
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the columnar price history store from the price history table for a date range. '
+        'Months are rewritten whole; history the table no longer has is kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First date to write (YYYY-MM-DD, default: the earliest price history)',
+        )
+        parser.add_argument(
+            '--end',
+            help='Last date to write (YYYY-MM-DD, default: today)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            store = PriceHistoryStore()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        today = timezone.now().date()
+        try:
+            start_date = date.fromisoformat(options['start']) if options['start'] else PriceHistory.objects.aggregate(first=Min('date'))['first']
+            end_date = date.fromisoformat(options['end']) if options['end'] else today
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        if start_date is None:
+            self.stdout.write('No price history to write')
+            return
+        if start_date > end_date:
+            raise CommandError('--start must not be after --end')
+
+        self.stdout.write(f'Writing price history store in {store.root} from {start_date} to {end_date}...')
+        started = time.perf_counter()
+        result = store.sync(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {result['segments']} month segments with {result['rows']} rows written "
+            f"in {time.perf_counter() - started:.3f}s"
+        ))
+        if not settings.PRICE_HISTORY_STORE:
+            self.stdout.write('PRICE_HISTORY_STORE is disabled; the store is not read or kept up to date')
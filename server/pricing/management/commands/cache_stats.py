@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from toplorgical.cache import cache_metrics, flush_metrics, local_cache_metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = 'Show hit and miss counts of the read-through cache per cache family, and local tier sizes per process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the shared counters after printing them',
+        )
+
+    def handle(self, *args, **options):
+        flush_metrics()
+        metrics = cache_metrics()
+        if not metrics:
+            self.stdout.write('No cache reads recorded yet')
+            return
+
+        self.stdout.write(
+            f"{'family':<24} {'local':>9} {'hits':>9} {'stale':>7} {'waits':>7} "
+            f"{'misses':>8} {'refreshes':>9} {'hit ratio':>9}"
+        )
+        for family, events in metrics.items():
+            ratio = f"{events['hit_ratio']:.1%}" if events['hit_ratio'] is not None else '-'
+            self.stdout.write(
+                f"{family:<24} {events['local_hits']:>9} {events['hits']:>9} {events['stale']:>7} "
+                f"{events['waits']:>7} {events['misses']:>8} {events['refreshes']:>9} {ratio:>9}"
+            )
+
+        processes = local_cache_metrics()
+        if processes:
+            self.stdout.write('')
+            self.stdout.write(f"{'process':<32} {'family':<24} {'entries':>7} {'kB':>9} {'hits':>9} {'misses':>8} {'evictions':>9}")
+            for process, families in processes.items():
+                for family, stats in families.items():
+                    self.stdout.write(
+                        f"{process:<32} {family:<24} {stats['entries']:>7} {stats['bytes'] / 1024:>9.1f} "
+                        f"{stats.get('hits', 0):>9} {stats.get('misses', 0):>8} {stats.get('evictions', 0):>9}"
+                    )
+
+        if options['reset']:
+            reset_metrics()
+            self.stdout.write(self.style.SUCCESS('✓ Cache metrics reset'))
@@ -0,0 +1,176 @@
+import io
+from decimal import Decimal
+from django.core.management import call_command
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from collaboration.models import ActivityLog, ProjectNotification
+from estimates.models import Estimate, EstimateMaterialItem, EstimateMachineryItem
+from machinery.models import Machinery
+from materials.models import Material
+from pricing.models import PriceAlert
+from projects.models import Project, ProjectCollaborator
+from toplorgical.querycount import QueryRecorder, load_budgets
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every endpoint in the query budget file against a seeded dataset and fail if "
+        "any endpoint runs more SQL queries than its budget. All data is created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budgets',
+            help='Budget file to check (default: settings.QUERY_BUDGETS_FILE)',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=25,
+            help='Projects, estimates and other list rows to seed per list (default: 25)',
+        )
+        parser.add_argument(
+            '--verbose-queries',
+            action='store_true',
+            help='Print repeated query signatures for every endpoint',
+        )
+
+    def handle(self, *args, **options):
+        budgets = load_budgets(options['budgets'])
+        failures = []
+
+        # Measure the database work behind every endpoint, not what the read-through cache serves.
+        # APIClient requests come from the 'testserver' host.
+        test_settings = override_settings(
+            READ_THROUGH_CACHE=False,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        )
+        with test_settings, transaction.atomic():
+            if not Material.objects.exists() or not Machinery.objects.exists():
+                call_command('populate_sample_data', stdout=io.StringIO())
+            user, objects = self.seed(options['rows'])
+            client = APIClient()
+            client.force_authenticate(user)
+
+            self.stdout.write(f"{'endpoint':<32} {'method':<6} {'queries':>7} {'budget':>6} {'dupes':>5} {'ms':>8}")
+            for budget in budgets:
+                path = budget['path'].format(**objects)
+                with QueryRecorder() as recorder:
+                    response = getattr(client, budget['method'].lower())(
+                        path, budget.get('data', {}), format='json'
+                    )
+
+                over = recorder.count > budget['max_queries']
+                style = self.style.ERROR if over or response.status_code >= 400 else self.style.SUCCESS
+                self.stdout.write(style(
+                    f"{budget['name']:<32} {budget['method']:<6} {recorder.count:>7} "
+                    f"{budget['max_queries']:>6} {recorder.duplicates:>5} {recorder.duration * 1000:>8.1f}"
+                ))
+                if response.status_code >= 400:
+                    failures.append(f"{budget['method']} {path} returned {response.status_code}")
+                elif over:
+                    failures.append(f"{budget['method']} {path} ran {recorder.count} queries, budget is {budget['max_queries']}")
+                if over or options['verbose_queries']:
+                    for sql, count in recorder.repeated():
+                        self.stdout.write(f"    {count}x {sql[:160]}")
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('Query budgets exceeded:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(budgets)} endpoints within their query budgets'))
+
+    def seed(self, rows):
+        """A user with rows projects, estimates, alerts, activity and notifications"""
+        user = User.objects.create(
+            email='query-budgets@toplorgical.local',
+            username='query-budgets',
+            first_name='Budget',
+            last_name='User',
+        )
+        collaborators = [
+            User.objects.create(
+                email=f'query-budgets-{i}@toplorgical.local',
+                username=f'query-budgets-{i}',
+                first_name='Collaborator',
+                last_name=str(i),
+            )
+            for i in range(3)
+        ]
+        materials = list(Material.objects.filter(is_active=True)[:5])
+        machinery = list(Machinery.objects.filter(is_active=True)[:3])
+
+        projects = []
+        for i in range(rows):
+            project = Project.objects.create(
+                name=f'Budget Project {i}',
+                project_type='residential',
+                address=f'{i} Budget Street',
+                city='London',
+                postcode='EC1A 1BB',
+                total_area=100,
+                owner=user,
+            )
+            ProjectCollaborator.objects.bulk_create([
+                ProjectCollaborator(project=project, user=collaborator, role='viewer')
+                for collaborator in collaborators
+            ])
+            projects.append(project)
+
+        estimates = []
+        for i, project in enumerate(projects):
+            estimate = Estimate.objects.create(project=project, name=f'Budget Estimate {i}', created_by=user)
+            items = [
+                EstimateMaterialItem(
+                    estimate=estimate, material=material, quantity=Decimal('10'),
+                    unit_price=Decimal('5'), waste_factor=Decimal('0.05')
+                )
+                for material in materials
+            ]
+            machinery_items = [
+                EstimateMachineryItem(
+                    estimate=estimate, machinery=machine,
+                    duration=Decimal('2'), rental_type='daily', unit_price=Decimal('100')
+                )
+                for machine in machinery
+            ]
+            for item in items + machinery_items:
+                item.calculate_total_cost()
+            EstimateMaterialItem.objects.bulk_create(items)
+            EstimateMachineryItem.objects.bulk_create(machinery_items)
+            estimate.recalculate_totals()
+            estimates.append(estimate)
+
+        project = projects[0]
+        ActivityLog.objects.bulk_create([
+            ActivityLog(project=project, user=user, action_type='project_updated', description=f'Update {i}')
+            for i in range(rows)
+        ])
+        ProjectNotification.objects.bulk_create([
+            ProjectNotification(
+                user=user, project=project, notification_type='invitation',
+                title=f'Notification {i}', message='Budget check'
+            )
+            for i in range(rows)
+        ])
+        PriceAlert.objects.bulk_create([
+            PriceAlert(
+                user=user, material=materials[i % len(materials)],
+                alert_type='price_drop', threshold_price=Decimal('10'), location='London'
+            )
+            for i in range(rows)
+        ])
+
+        return user, {
+            'project': project.pk,
+            'estimate': estimates[0].pk,
+            'material': materials[0].pk,
+            'machinery': machinery[0].pk,
+        }
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from pricing.locations import load_locations, backfill_regions
+from pricing.models import Location, LocationAlias, PriceData, PriceAlert, PriceHistory, CurrentPrice
+
+
+class Command(BaseCommand):
+    help = 'Load UK regions, postcode areas and city aliases, and resolve regions of existing rows'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Loading locations...')
+        count = load_locations(Location, LocationAlias)
+        Location.objects.clear_index()
+        self.stdout.write(self.style.SUCCESS(f'✓ Loaded {count} locations'))
+
+        self.stdout.write('Resolving regions of existing price data...')
+        updated = backfill_regions([PriceData, CurrentPrice, PriceAlert, PriceHistory], LocationAlias)
+        self.stdout.write(self.style.SUCCESS(f'✓ Updated {updated} rows'))
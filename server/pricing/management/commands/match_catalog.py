@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from pricing.matching import catalog_index
+
+
+class Command(BaseCommand):
+    help = 'Match a scraped item name against the in-process catalog index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Scraped item name')
+        parser.add_argument('--category', default='', help='Scraped category name')
+        parser.add_argument('--sku', default='', help='Scraped SKU')
+        parser.add_argument('--ean', default='', help='Scraped EAN/GTIN barcode')
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            default=0,
+            help='Repeat the match this many times and report the time per match',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        index = catalog_index(force_refresh=True)
+        built = time.perf_counter() - start
+        self.stdout.write(f'Indexed {len(index.entries)} catalog items in {built:.3f}s')
+
+        match = index.match(options['name'], options['category'], options['sku'], options['ean'])
+        if match is None:
+            self.stdout.write(self.style.WARNING('No match above the confidence threshold'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {match.item_type} #{match.item_id} by {match.method} '
+                f'(confidence {match.confidence:.3f})'
+            ))
+
+        if options['benchmark']:
+            start = time.perf_counter()
+            for _ in range(options['benchmark']):
+                index.match(options['name'], options['category'], options['sku'], options['ean'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{options['benchmark']} matches in {elapsed:.3f}s "
+                f"({elapsed / options['benchmark'] * 1e6:.1f}µs per match)"
+            )
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from decimal import Decimal
-from pricing.models import Supplier, PriceData
+from pricing.models import Supplier, PriceData, CurrentPrice
 from materials.models import Material, MaterialCategory
 from machinery.models import Machinery, MachineryCategory
 import random
@@ -60,6 +60,10 @@ class Command(BaseCommand):
         price_count = self.create_pricing_data(suppliers, materials, machinery)
         self.stdout.write(self.style.SUCCESS(f'✓ Created {price_count} price records'))
 
+        # Build current prices from the new pricing data
+        current_count = CurrentPrice.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ Built {current_count} current prices'))
+
         self.stdout.write(self.style.SUCCESS('\n✅ Sample data population complete!'))
         self.stdout.write(self.style.SUCCESS(f'   - {len(suppliers)} suppliers'))
         self.stdout.write(self.style.SUCCESS(f'   - {len(materials)} materials'))
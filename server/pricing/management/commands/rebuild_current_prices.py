@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from pricing.models import CurrentPrice
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the current price table from raw price data and verify it matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Only compare the current price table with the raw data, without rebuilding',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            self.stdout.write('Rebuilding current prices...')
+            count = CurrentPrice.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {count} current prices'))
+
+        self.stdout.write('Verifying current prices against price data...')
+        differences = CurrentPrice.objects.verify()
+
+        for kind, keys in differences.items():
+            if keys:
+                self.stdout.write(self.style.WARNING(f'  {len(keys)} {kind} rows, e.g. {keys[:5]}'))
+
+        if any(differences.values()):
+            raise CommandError('Current price table does not match raw price data')
+
+        self.stdout.write(self.style.SUCCESS('✓ Current prices match raw price data'))
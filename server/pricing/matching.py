@@ -0,0 +1,219 @@
+import re
+import threading
+import time
+from collections import Counter
+from django.db.models import Count, Max
+from materials.models import Material
+from machinery.models import Machinery
+from toplorgical.search import tokenize, trigrams, similarity
+
+# Specification keys that may hold a barcode
+EAN_KEYS = ('ean', 'gtin', 'barcode', 'upc')
+
+# Matches scoring below this are treated as no match
+MIN_CONFIDENCE = 0.5
+
+# How often the shared index checks the catalog for changes, in seconds
+REFRESH_INTERVAL = 30
+
+CATALOG_MODELS = {
+    'material': Material,
+    'machinery': Machinery,
+}
+
+
+def normalize_text(text):
+    """Lowercase alphanumeric tokens joined by single spaces"""
+    return ' '.join(tokenize(text))
+
+
+def normalize_code(code):
+    """Normalize a SKU or barcode for exact lookups"""
+    return re.sub(r'[^a-z0-9]', '', (code or '').lower())
+
+
+def spec_ean(specifications):
+    if not isinstance(specifications, dict):
+        return ''
+    for key in EAN_KEYS:
+        if specifications.get(key):
+            return normalize_code(str(specifications[key]))
+    return ''
+
+
+class CatalogMatch:
+    """Best catalog match for a scraped item"""
+    
+    __slots__ = ('item_type', 'item_id', 'confidence', 'method')
+    
+    def __init__(self, item_type, item_id, confidence, method):
+        self.item_type = item_type
+        self.item_id = item_id
+        self.confidence = confidence
+        self.method = method
+    
+    @property
+    def material_id(self):
+        return self.item_id if self.item_type == 'material' else None
+    
+    @property
+    def machinery_id(self):
+        return self.item_id if self.item_type == 'machinery' else None
+    
+    def as_dict(self):
+        return {
+            'item_type': self.item_type,
+            'item_id': self.item_id,
+            'confidence': round(self.confidence, 3),
+            'method': self.method,
+        }
+
+
+class CatalogIndex:
+    """
+    In-process matching index over active materials and machinery.
+    
+    Holds exact maps for catalog SKUs and barcodes, an inverted index from
+    normalized name tokens to items, and trigram sets for similarity
+    scoring. refresh() reloads only rows updated since the last refresh and
+    drops deleted or deactivated rows, so keeping the index current costs a
+    couple of small queries. Lookups and refreshes are serialized by a lock
+    as they share the same maps.
+    """
+    
+    def __init__(self):
+        self.entries = {}
+        self.tokens = {}
+        self.trigram_postings = {}
+        self.skus = {}
+        self.eans = {}
+        self.watermarks = {}
+        self.lock = threading.Lock()
+    
+    def add(self, key, name, category, sku, specifications):
+        self.remove(key)
+        text = normalize_text(name)
+        tokens = frozenset(text.split())
+        entry = {
+            'tokens': tokens,
+            'trigrams': trigrams(text),
+            'category': trigrams(normalize_text(category)),
+            'sku': normalize_code(sku),
+            'ean': spec_ean(specifications),
+        }
+        self.entries[key] = entry
+        for token in tokens:
+            self.tokens.setdefault(token, set()).add(key)
+        for trigram in entry['trigrams']:
+            self.trigram_postings.setdefault(trigram, set()).add(key)
+        if entry['sku']:
+            self.skus[entry['sku']] = key
+        if entry['ean']:
+            self.eans[entry['ean']] = key
+    
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for token in entry['tokens']:
+            self.tokens[token].discard(key)
+        for trigram in entry['trigrams']:
+            self.trigram_postings[trigram].discard(key)
+        if self.skus.get(entry['sku']) == key:
+            del self.skus[entry['sku']]
+        if self.eans.get(entry['ean']) == key:
+            del self.eans[entry['ean']]
+    
+    def refresh(self):
+        """Index catalog rows changed since the last refresh and drop removed ones"""
+        with self.lock:
+            for item_type, model in CATALOG_MODELS.items():
+                self.refresh_model(item_type, model)
+    
+    def refresh_model(self, item_type, model):
+        queryset = model.objects.filter(is_active=True)
+        state = queryset.aggregate(count=Count('id'), updated=Max('updated_at'))
+        indexed = {key for key in self.entries if key[0] == item_type}
+        watermark = self.watermarks.get(item_type)
+        
+        if state['updated'] is not None and (watermark is None or state['updated'] > watermark):
+            changed = queryset if watermark is None else queryset.filter(updated_at__gte=watermark)
+            indexed |= self.load(item_type, changed)
+            self.watermarks[item_type] = state['updated']
+        
+        # Deleted or deactivated rows leave no trace in updated_at, so compare IDs
+        if len(indexed) != state['count']:
+            active = {(item_type, item_id) for item_id in queryset.values_list('id', flat=True)}
+            for key in indexed - active:
+                self.remove(key)
+            missing = [item_id for _, item_id in active - indexed]
+            if missing:
+                self.load(item_type, queryset.filter(id__in=missing))
+    
+    def load(self, item_type, queryset):
+        keys = set()
+        rows = queryset.values_list('id', 'name', 'category__name', 'sku', 'specifications')
+        for item_id, name, category, sku, specifications in rows:
+            key = (item_type, item_id)
+            self.add(key, name, category, sku, specifications)
+            keys.add(key)
+        return keys
+    
+    def candidates(self, tokens, query_trigrams, limit=50):
+        """Items sharing the most name tokens, or trigrams when no token matches"""
+        counts = Counter()
+        for token in tokens:
+            counts.update(self.tokens.get(token, ()))
+        if not counts:
+            for trigram in query_trigrams:
+                counts.update(self.trigram_postings.get(trigram, ()))
+        return [key for key, _ in counts.most_common(limit)]
+    
+    def match(self, name, category='', sku='', ean=''):
+        """Best match for a scraped item with a confidence between 0 and 1, or None"""
+        with self.lock:
+            return self.match_unlocked(name, category, sku, ean)
+    
+    def match_unlocked(self, name, category, sku, ean):
+        """match() for callers already holding self.lock, which refresh() takes while it mutates the maps"""
+        ean = normalize_code(ean)
+        if ean and ean in self.eans:
+            return CatalogMatch(*self.eans[ean], 1.0, 'ean')
+        sku = normalize_code(sku)
+        if sku and sku in self.skus:
+            return CatalogMatch(*self.skus[sku], 0.98, 'sku')
+        
+        text = normalize_text(name)
+        if not text:
+            return None
+        query_trigrams = trigrams(text)
+        category_trigrams = trigrams(normalize_text(category)) if category else None
+        
+        best_key, best_score = None, 0.0
+        for key in self.candidates(text.split(), query_trigrams):
+            entry = self.entries[key]
+            score = similarity(query_trigrams, entry['trigrams'])
+            if category_trigrams:
+                # Agreeing categories confirm a match; conflicting ones weaken it
+                score = 0.8 * score + 0.2 * similarity(category_trigrams, entry['category'])
+            # Materials win ties, as in the original lookup order
+            if best_key is None or (score, key[0] == 'material') > (best_score, best_key[0] == 'material'):
+                best_key, best_score = key, score
+        
+        if best_key is None or best_score < MIN_CONFIDENCE:
+            return None
+        return CatalogMatch(*best_key, best_score, 'name')
+
+
+_index = CatalogIndex()
+_last_refresh = 0.0
+
+
+def catalog_index(force_refresh=False):
+    """Shared catalog index, refreshed at most every REFRESH_INTERVAL seconds"""
+    global _last_refresh
+    now = time.monotonic()
+    if force_refresh or now - _last_refresh >= REFRESH_INTERVAL:
+        _index.refresh()
+        _last_refresh = now
+    return _index
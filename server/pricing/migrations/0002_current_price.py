@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0001_initial'),
+        ('machinery', '0001_initial'),
+        ('pricing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('rental_price_daily', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('rental_price_weekly', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('in_stock', models.BooleanField(default=True)),
+                ('as_of', models.DateTimeField()),
+                ('machinery', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='machinery.machinery')),
+                ('material', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='materials.material')),
+                ('price_data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pricing.pricedata')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='pricing.supplier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['material', 'location', 'as_of'], name='pricing_cur_materia_b1c054_idx'), models.Index(fields=['machinery', 'location', 'as_of'], name='pricing_cur_machine_776fb8_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='currentprice',
+            constraint=models.UniqueConstraint(condition=models.Q(('material__isnull', False)), fields=('material', 'supplier', 'location'), name='unique_current_material_price'),
+        ),
+        migrations.AddConstraint(
+            model_name='currentprice',
+            constraint=models.UniqueConstraint(condition=models.Q(('machinery__isnull', False)), fields=('machinery', 'supplier', 'location'), name='unique_current_machinery_price'),
+        ),
+    ]
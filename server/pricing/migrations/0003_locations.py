@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0002_current_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('country', 'Country'), ('region', 'Region'), ('postcode_area', 'Postcode Area')], max_length=20)),
+            ],
+            options={
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Location Aliases',
+                'ordering': ['alias'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='currentprice',
+            name='pricing_cur_materia_b1c054_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='currentprice',
+            name='pricing_cur_machine_776fb8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pricedata',
+            name='pricing_pri_locatio_235c8f_idx',
+        ),
+        migrations.AddField(
+            model_name='locationalias',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='pricing.location'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='pricing.location'),
+        ),
+        migrations.AddField(
+            model_name='currentprice',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='current_prices', to='pricing.location'),
+        ),
+        migrations.AddField(
+            model_name='pricealert',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_alerts', to='pricing.location'),
+        ),
+        migrations.AddField(
+            model_name='pricedata',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_data', to='pricing.location'),
+        ),
+        migrations.AddField(
+            model_name='pricehistory',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_history', to='pricing.location'),
+        ),
+        migrations.AddIndex(
+            model_name='currentprice',
+            index=models.Index(fields=['material', 'region'], name='pricing_cur_materia_fcecad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='currentprice',
+            index=models.Index(fields=['machinery', 'region'], name='pricing_cur_machine_dc3261_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricedata',
+            index=models.Index(fields=['region', 'is_active'], name='pricing_pri_region__c103be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricehistory',
+            index=models.Index(fields=['region', 'date'], name='pricing_pri_region__054f6e_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from pricing.locations import load_locations, backfill_regions
+
+
+def seed_locations(apps, schema_editor):
+    Location = apps.get_model('pricing', 'Location')
+    LocationAlias = apps.get_model('pricing', 'LocationAlias')
+    load_locations(Location, LocationAlias)
+    backfill_regions(
+        [apps.get_model('pricing', name) for name in ('PriceData', 'CurrentPrice', 'PriceAlert', 'PriceHistory')],
+        LocationAlias
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0003_locations'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_locations, migrations.RunPython.noop),
+    ]
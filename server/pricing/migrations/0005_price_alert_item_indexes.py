@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0004_load_locations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['material', 'is_active'], name='pricing_pri_materia_6c3463_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['machinery', 'is_active'], name='pricing_pri_machine_c887a6_idx'),
+        ),
+    ]
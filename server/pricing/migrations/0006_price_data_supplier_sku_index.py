@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0005_price_alert_item_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pricedata',
+            index=models.Index(fields=['supplier', 'sku'], name='pricing_pri_supplie_8c86b9_idx'),
+        ),
+    ]
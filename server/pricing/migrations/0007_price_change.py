@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0006_price_data_supplier_sku_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('old_in_stock', models.BooleanField(blank=True, null=True)),
+                ('new_in_stock', models.BooleanField()),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('price_data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='pricing.pricedata')),
+            ],
+            options={
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['price_data', 'changed_at'], name='pricing_pri_price_d_374c98_idx')],
+            },
+        ),
+    ]
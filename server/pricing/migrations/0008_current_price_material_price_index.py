@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0007_price_change'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='currentprice',
+            index=models.Index(fields=['material', 'price'], name='pricing_cur_materia_79fa0f_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0008_current_price_material_price_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pricedata',
+            index=models.Index(fields=['created_at', 'id'], name='pricing_pri_created_b93880_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0002_search_indexes'),
+        ('machinery', '0002_search_indexes'),
+        ('pricing', '0009_price_data_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_days', models.PositiveIntegerField()),
+                ('end_date', models.DateField()),
+                ('first_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('absolute_change', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('change_percent', models.FloatField()),
+                ('data_points', models.IntegerField(default=0)),
+                ('change_magnitude', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('percent_magnitude', models.FloatField()),
+                ('machinery', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_trends', to='machinery.machinery')),
+                ('material', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_trends', to='materials.material')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period_days', 'end_date', '-percent_magnitude'], name='pricing_pri_period__72f129_idx'), models.Index(fields=['period_days', 'end_date', '-change_magnitude'], name='pricing_pri_period__0e06e9_idx')],
+            },
+        ),
+    ]
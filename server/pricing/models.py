@@ -1,7 +1,171 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q, F, Avg, Min, Max, Count, FloatField, Window, RowRange
+from django.db.models.functions import Abs, Cast, FirstValue, LastValue, RowNumber, TruncDate
 from django.core.validators import MinValueValidator
+from datetime import timedelta
 from materials.models import Material
 from machinery.models import Machinery
+from toplorgical.cache import invalidate_tags
+from .locations import match_location, normalize_location
+
+
+class LocationManager(models.Manager):
+    """Resolves free-text locations through an in-process alias index"""
+    
+    _index = None
+    
+    def get_index(self):
+        """Load locations, aliases and the location tree once per process"""
+        if LocationManager._index is None:
+            locations = {location.pk: location for location in self.all()}
+            children = {}
+            for location in locations.values():
+                children.setdefault(location.parent_id, []).append(location.pk)
+            aliases = dict(LocationAlias.objects.values_list('alias', 'location_id'))
+            LocationManager._index = {
+                'locations': locations,
+                'children': children,
+                'aliases': aliases,
+            }
+        return LocationManager._index
+    
+    def clear_index(self):
+        LocationManager._index = None
+    
+    def resolve(self, text):
+        """Resolve a city, region, alias or UK postcode to a Location, or None"""
+        index = self.get_index()
+        location_id = match_location(text, index['aliases'])
+        return index['locations'].get(location_id)
+    
+    def subtree_ids(self, location):
+        """IDs of a location and all locations below it"""
+        children = self.get_index()['children']
+        ids = []
+        pending = [getattr(location, 'pk', location)]
+        while pending:
+            location_id = pending.pop()
+            ids.append(location_id)
+            pending.extend(children.get(location_id, []))
+        return ids
+
+
+class Location(models.Model):
+    """Normalized location hierarchy (country, region, postcode area)"""
+    
+    KIND_CHOICES = [
+        ('country', 'Country'),
+        ('region', 'Region'),
+        ('postcode_area', 'Postcode Area'),
+    ]
+    
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='children'
+    )
+    
+    objects = LocationManager()
+    
+    class Meta:
+        ordering = ['code']
+    
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Location.objects.clear_index()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Location.objects.clear_index()
+        return result
+
+
+class LocationAlias(models.Model):
+    """Normalized names (cities, postcode areas, regions) that resolve to a location"""
+    
+    alias = models.CharField(max_length=100, unique=True)
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='aliases'
+    )
+    
+    class Meta:
+        verbose_name_plural = 'Location Aliases'
+        ordering = ['alias']
+    
+    def __str__(self):
+        return f"{self.alias} -> {self.location.code}"
+    
+    def save(self, *args, **kwargs):
+        self.alias = normalize_location(self.alias)
+        super().save(*args, **kwargs)
+        Location.objects.clear_index()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Location.objects.clear_index()
+        return result
+
+
+def filter_by_location(queryset, location, text_field='location'):
+    """
+    Narrow a queryset to a location.
+    
+    Locations that resolve to a known region match the region and everything
+    below it, plus rows whose own location never resolved to a region but
+    contains the text; anything else falls back to matching the free-text
+    location field.
+    """
+    if not location:
+        return queryset
+    text_match = Q(**{f'{text_field}__icontains': location})
+    region = Location.objects.resolve(location)
+    if region is not None:
+        return queryset.filter(
+            Q(region_id__in=Location.objects.subtree_ids(region)) | Q(text_match, region__isnull=True)
+        )
+    return queryset.filter(text_match)
+
+
+def price_cache_tags(material_id=None, machinery_id=None):
+    """Cache tags of the cached prices for an item, invalidated when its price data changes"""
+    if material_id:
+        return ['material-prices', f'material-prices:{material_id}']
+    if machinery_id:
+        return ['machinery-prices', f'machinery-prices:{machinery_id}']
+    return []
+
+
+def bulk_update_by_pk(model, objs, fields, batch_size=1000):
+    """
+    Write changed fields of existing rows with INSERT ... ON CONFLICT (id) DO UPDATE.
+    
+    Much cheaper than bulk_update's CASE expressions for large batches. The
+    creation timestamps that bulk_create's pre_save overwrites on the
+    instances are restored afterwards; the stored values are not touched.
+    """
+    if not objs:
+        return
+    created = [getattr(obj, 'created_at', None) for obj in objs]
+    model.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=fields
+    )
+    for obj, created_at in zip(objs, created):
+        if created_at is not None:
+            obj.created_at = created_at
 
 
 class Supplier(models.Model):
@@ -29,6 +193,38 @@ class Supplier(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_tags('suppliers')
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_tags('suppliers')
+        return result
+
+
+class PriceDataQuerySet(models.QuerySet):
+    """Keeps the current price table in step with bulk updates and deletes"""
+    
+    def update(self, **kwargs):
+        ids = list(self.values_list('pk', flat=True))
+        keys = CurrentPrice.objects.keys_for(ids)
+        with transaction.atomic():
+            rows = super().update(**kwargs)
+            rows_after = PriceData.objects.filter(pk__in=ids).only('material_id', 'machinery_id', 'supplier_id', 'location')
+            keys |= {CurrentPrice.key_for(row) for row in rows_after}
+            CurrentPrice.objects.refresh(keys, price_data_ids=ids)
+        invalidate_tags(*{tag for key in keys for tag in price_cache_tags(key[0], key[1])})
+        return rows
+    
+    def delete(self):
+        keys = CurrentPrice.objects.keys_for(self.values_list('pk', flat=True))
+        with transaction.atomic():
+            result = super().delete()
+            CurrentPrice.objects.refresh(keys)
+        invalidate_tags(*{tag for key in keys for tag in price_cache_tags(key[0], key[1])})
+        return result
 
 
 class PriceData(models.Model):
@@ -88,6 +284,13 @@ class PriceData(models.Model):
     # Location
     location = models.CharField(max_length=200, blank=True)
     postcode = models.CharField(max_length=20, blank=True)
+    region = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='price_data'
+    )
     
     # Source information
     source_url = models.URLField(blank=True)
@@ -99,24 +302,342 @@ class PriceData(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceDataQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['material', 'supplier', 'is_active']),
             models.Index(fields=['machinery', 'supplier', 'is_active']),
-            models.Index(fields=['location', 'is_active']),
+            models.Index(fields=['region', 'is_active']),
             models.Index(fields=['price', 'created_at']),
+            models.Index(fields=['supplier', 'sku']),
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
         item = self.material or self.machinery
         return f"{item.name} - {self.supplier.name} - £{self.price}"
     
+    def save(self, *args, **kwargs):
+        self.resolve_region()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Also refreshes the key this row was current for, in case it moved or was deactivated
+            CurrentPrice.objects.refresh([CurrentPrice.key_for(self)], price_data_ids=[self.pk])
+        invalidate_tags(*price_cache_tags(self.material_id, self.machinery_id))
+    
+    def delete(self, *args, **kwargs):
+        tags = price_cache_tags(self.material_id, self.machinery_id)
+        keys = CurrentPrice.objects.keys_for([self.pk]) | {CurrentPrice.key_for(self)}
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            CurrentPrice.objects.refresh(keys)
+        invalidate_tags(*tags)
+        return result
+    
+    def resolve_region(self):
+        """Resolve the free-text location to a region for indexed lookups"""
+        self.region = Location.objects.resolve(self.location or self.postcode)
+    
     def get_item(self):
         """Get the associated material or machinery"""
         return self.material or self.machinery
 
 
+class PriceChange(models.Model):
+    """A change in the price or stock state of a price data row, recorded at ingest"""
+    
+    price_data = models.ForeignKey(
+        PriceData,
+        on_delete=models.CASCADE,
+        related_name='changes'
+    )
+    old_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    old_in_stock = models.BooleanField(null=True, blank=True)
+    new_in_stock = models.BooleanField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['price_data', 'changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.price_data_id}: {self.old_price} -> {self.new_price}"
+
+
+class CurrentPriceManager(models.Manager):
+    """Maintains the current price table from raw price data"""
+    
+    UPDATE_FIELDS = [
+        'price_data', 'region', 'price', 'rental_price_daily', 'rental_price_weekly',
+        'in_stock', 'as_of'
+    ]
+    
+    PRICE_DATA_FIELDS = [
+        'id', 'material_id', 'machinery_id', 'supplier_id', 'location', 'region_id', 'price',
+        'rental_price_daily', 'rental_price_weekly', 'in_stock', 'is_active', 'updated_at'
+    ]
+    
+    def latest_from_price_data(self, rows):
+        """Pick the most recently changed active price data row for each current price key"""
+        latest = {}
+        for row in rows:
+            if not row.is_active or not (row.material_id or row.machinery_id):
+                continue
+            key = CurrentPrice.key_for(row)
+            if key not in latest or (row.updated_at, row.pk) >= (latest[key].updated_at, latest[key].pk):
+                latest[key] = row
+        return latest
+    
+    def keys_for(self, price_data_ids):
+        """Keys of the current prices sourced from the given price data rows"""
+        return {
+            current.key
+            for current in self.filter(price_data_id__in=price_data_ids).only(
+                'material_id', 'machinery_id', 'supplier_id', 'location'
+            )
+        }
+    
+    def upsert_from_price_data(self, rows):
+        """
+        Bring current prices up to date with newly written price data rows.
+        
+        Returns a price change event for every current price that is new or
+        whose price or stock state changed.
+        """
+        rows = list(rows)
+        return self.refresh(
+            {CurrentPrice.key_for(row) for row in rows},
+            price_data_ids=[row.pk for row in rows]
+        )
+    
+    def refresh(self, keys, price_data_ids=()):
+        """
+        Recompute the current prices of keys from the active price data rows.
+        
+        The keys that price_data_ids are currently the source of are
+        refreshed as well, so rows that moved to another key or were
+        deactivated hand over to the next latest row. Keys left without an
+        active row lose their current price. Uses one query for the current
+        prices, one for the candidate price data, and bulk writes. Returns
+        a price change event for every current price that is new or whose
+        price or stock state changed.
+        """
+        keys = {key for key in keys if key[0] or key[1]}
+        price_data_ids = set(price_data_ids)
+        existing = {}
+        if keys or price_data_ids:
+            for current in self.filter(self.scope(keys) | Q(price_data_id__in=price_data_ids)):
+                if current.key in keys or current.price_data_id in price_data_ids:
+                    keys.add(current.key)
+                    existing[current.key] = current
+        if not keys:
+            return []
+        
+        candidates = PriceData.objects.filter(self.scope(keys), is_active=True).only(*self.PRICE_DATA_FIELDS)
+        latest = {
+            key: row for key, row in self.latest_from_price_data(candidates).items()
+            if key in keys
+        }
+        
+        to_create = []
+        to_update = []
+        changes = []
+        for key, row in latest.items():
+            current = existing.get(key)
+            if current is None:
+                current = CurrentPrice.from_price_data(row)
+                to_create.append(current)
+                changes.append(current.change_event(None, None))
+                continue
+            before = self.field_values(current)
+            old_price, old_in_stock = current.price, current.in_stock
+            current.copy_from(row)
+            if self.field_values(current) != before:
+                to_update.append(current)
+            if current.price != old_price or current.in_stock != old_in_stock:
+                changes.append(current.change_event(old_price, old_in_stock))
+        
+        with transaction.atomic():
+            self.filter(pk__in=[current.pk for key, current in existing.items() if key not in latest]).delete()
+            self.bulk_create(to_create)
+            bulk_update_by_pk(CurrentPrice, to_update, self.UPDATE_FIELDS)
+        return changes
+    
+    def field_values(self, current):
+        return [getattr(current, self.model._meta.get_field(field).attname) for field in self.UPDATE_FIELDS]
+    
+    @staticmethod
+    def scope(keys):
+        """Filter covering the items and suppliers of keys, which still needs narrowing by location"""
+        if not keys:
+            return Q(pk__in=[])
+        return Q(
+            Q(material_id__in={key[0] for key in keys if key[0]})
+            | Q(machinery_id__in={key[1] for key in keys if key[1]}),
+            supplier_id__in={key[2] for key in keys}
+        )
+    
+    def expected_from_price_data(self):
+        """Compute the current price rows implied by the raw price data table"""
+        rows = PriceData.objects.filter(is_active=True).filter(
+            Q(material__isnull=False) | Q(machinery__isnull=False)
+        ).only(*self.PRICE_DATA_FIELDS)
+        return self.latest_from_price_data(rows.iterator(chunk_size=2000))
+    
+    def rebuild(self, batch_size=1000):
+        """Rebuild the current price table from scratch"""
+        latest = self.expected_from_price_data()
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                [CurrentPrice.from_price_data(row) for row in latest.values()],
+                batch_size=batch_size
+            )
+        invalidate_tags('prices')
+        return len(latest)
+    
+    def verify(self):
+        """Compare the current price table with the raw table and return the differences"""
+        expected = self.expected_from_price_data()
+        actual = {current.key: current for current in self.all().iterator(chunk_size=2000)}
+        
+        missing = [key for key in expected if key not in actual]
+        extra = [key for key in actual if key not in expected]
+        stale = [
+            key for key, row in expected.items()
+            if key in actual and actual[key].price_data_id != row.pk
+        ]
+        return {'missing': missing, 'extra': extra, 'stale': stale}
+
+
+class CurrentPrice(models.Model):
+    """Latest active price per item, supplier and location, maintained on ingest"""
+    
+    material = models.ForeignKey(
+        Material,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='current_prices'
+    )
+    machinery = models.ForeignKey(
+        Machinery,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='current_prices'
+    )
+    supplier = models.ForeignKey(
+        Supplier,
+        on_delete=models.CASCADE,
+        related_name='current_prices'
+    )
+    
+    # Normalized location, see normalize_location()
+    location = models.CharField(max_length=200, blank=True)
+    region = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='current_prices'
+    )
+    
+    # Latest pricing
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    rental_price_daily = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    rental_price_weekly = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    in_stock = models.BooleanField(default=True)
+    
+    # Source row and the time it last changed
+    price_data = models.ForeignKey(
+        PriceData,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    as_of = models.DateTimeField()
+    
+    objects = CurrentPriceManager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['material', 'supplier', 'location'],
+                condition=Q(material__isnull=False),
+                name='unique_current_material_price'
+            ),
+            models.UniqueConstraint(
+                fields=['machinery', 'supplier', 'location'],
+                condition=Q(machinery__isnull=False),
+                name='unique_current_machinery_price'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['material', 'region']),
+            models.Index(fields=['machinery', 'region']),
+            # Lowest price lookups for price filtering and ordering
+            models.Index(fields=['material', 'price']),
+        ]
+    
+    def __str__(self):
+        item = self.material or self.machinery
+        return f"{item.name} - {self.supplier.name} - £{self.price} (current)"
+    
+    @staticmethod
+    def key_for(price_data):
+        return (
+            price_data.material_id,
+            price_data.machinery_id,
+            price_data.supplier_id,
+            normalize_location(price_data.location)
+        )
+    
+    @property
+    def key(self):
+        return (self.material_id, self.machinery_id, self.supplier_id, self.location)
+    
+    @classmethod
+    def from_price_data(cls, price_data):
+        current = cls(
+            material_id=price_data.material_id,
+            machinery_id=price_data.machinery_id,
+            supplier_id=price_data.supplier_id,
+            location=normalize_location(price_data.location),
+            region_id=price_data.region_id
+        )
+        current.copy_from(price_data)
+        return current
+    
+    def copy_from(self, price_data):
+        """Copy pricing fields from a price data row"""
+        self.price_data_id = price_data.pk
+        self.region_id = price_data.region_id
+        self.price = price_data.price
+        self.rental_price_daily = price_data.rental_price_daily
+        self.rental_price_weekly = price_data.rental_price_weekly
+        self.in_stock = price_data.in_stock
+        self.as_of = price_data.updated_at
+    
+    def change_event(self, old_price, old_in_stock):
+        """JSON-serializable price changed event for the alert matcher"""
+        return {
+            'material_id': self.material_id,
+            'machinery_id': self.machinery_id,
+            'supplier_id': self.supplier_id,
+            'location': self.location,
+            'region_id': self.region_id,
+            'old_price': str(old_price) if old_price is not None else None,
+            'new_price': str(self.price),
+            'old_in_stock': old_in_stock,
+            'new_in_stock': self.in_stock,
+        }
+
+
 class PriceAlert(models.Model):
     """Price alerts for users"""
     
@@ -159,6 +680,13 @@ class PriceAlert(models.Model):
         validators=[MinValueValidator(0)]
     )
     location = models.CharField(max_length=200, blank=True)
+    region = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='price_alerts'
+    )
     
     # Status
     is_active = models.BooleanField(default=True)
@@ -172,11 +700,130 @@ class PriceAlert(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_active']),
             models.Index(fields=['alert_type', 'is_active']),
+            models.Index(fields=['material', 'is_active']),
+            models.Index(fields=['machinery', 'is_active']),
         ]
     
     def __str__(self):
         item = self.material or self.machinery
         return f"Alert: {item.name} - {self.alert_type}"
+    
+    def save(self, *args, **kwargs):
+        self.region = Location.objects.resolve(self.location)
+        super().save(*args, **kwargs)
+
+
+class PriceHistoryManager(models.Manager):
+    """Maintains the daily price history rollup from raw price data"""
+    
+    UPDATE_FIELDS = ['region', 'avg_price', 'min_price', 'max_price', 'data_points']
+    
+    def aggregate_price_data(self, start_date, end_date):
+        """Daily price statistics per active item and location, computed in one grouped query"""
+        return PriceData.objects.filter(
+            Q(material__is_active=True) | Q(machinery__is_active=True),
+            is_active=True,
+            created_at__date__gte=start_date,
+            created_at__date__lte=end_date
+        ).exclude(location='').annotate(
+            date=TruncDate('created_at')
+        ).values(
+            'material_id', 'machinery_id', 'location', 'date'
+        ).annotate(
+            avg_price=Avg('price'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+            data_points=Count('id')
+        ).order_by()
+    
+    def rollup(self, start_date, end_date=None, batch_size=1000):
+        """
+        Recompute daily price history for a date range.
+        
+        The statistics come from one grouped aggregate over price data, existing
+        history rows in the range are fetched with one query, and the results
+        are written back with one bulk upsert and one bulk_create.
+        """
+        end_date = end_date or start_date
+        existing = {
+            history.key: history
+            for history in self.filter(date__gte=start_date, date__lte=end_date)
+        }
+        
+        to_create = []
+        to_update = []
+        for row in self.aggregate_price_data(start_date, end_date):
+            key = (row['material_id'], row['machinery_id'], row['location'], row['date'])
+            history = existing.get(key)
+            if history is None:
+                history = PriceHistory(
+                    material_id=row['material_id'],
+                    machinery_id=row['machinery_id'],
+                    location=row['location'],
+                    date=row['date']
+                )
+                to_create.append(history)
+            else:
+                to_update.append(history)
+            
+            # bulk writes bypass save(), so resolve the region here
+            region = Location.objects.resolve(row['location'])
+            history.region_id = region.pk if region else None
+            history.avg_price = row['avg_price'] or 0
+            history.min_price = row['min_price'] or 0
+            history.max_price = row['max_price'] or 0
+            history.data_points = row['data_points']
+        
+        with transaction.atomic():
+            self.bulk_create(to_create, batch_size=batch_size)
+            bulk_update_by_pk(PriceHistory, to_update, self.UPDATE_FIELDS, batch_size=batch_size)
+        return {'created': len(to_create), 'updated': len(to_update)}
+    
+    def trends(self, item_type, start_date, end_date, location=None, order='percent', limit=10, min_change=5):
+        """
+        Price change of every item of one type over a date range, in one query.
+        
+        The first and last daily average price of each item are taken with
+        FIRST_VALUE() and LAST_VALUE() over a window per item, and one row per
+        item is kept with ROW_NUMBER(). Items with fewer than two history rows
+        or a percent change of at most min_change are left out, and the top
+        limit items are returned by absolute value of the percent change or,
+        with order 'absolute', of the price change.
+        """
+        field = f'{item_type}_id'
+        queryset = self.filter(**{f'{item_type}__isnull': False}, date__range=[start_date, end_date])
+        queryset = filter_by_location(queryset, location)
+        
+        partition = [F(field)]
+        ordering = [F('date').asc(), F('id').asc()]
+        queryset = queryset.annotate(
+            item_id=F(field),
+            first_price=Window(FirstValue('avg_price'), partition_by=partition, order_by=ordering),
+            last_price=Window(
+                LastValue('avg_price'), partition_by=partition, order_by=ordering,
+                frame=RowRange(start=None, end=None)
+            ),
+            points=Window(Count('id'), partition_by=partition),
+            item_row=Window(RowNumber(), partition_by=partition, order_by=ordering),
+        ).annotate(
+            absolute_change=F('last_price') - F('first_price'),
+            change_percent=(
+                Cast(F('last_price') - F('first_price'), FloatField()) * 100
+                / Cast(F('first_price'), FloatField())
+            ),
+        ).filter(
+            item_row=1, points__gte=2, first_price__gt=0, last_price__gt=0
+        ).annotate(
+            change_magnitude=Abs('absolute_change'),
+            percent_magnitude=Abs('change_percent'),
+        )
+        if min_change is not None:
+            queryset = queryset.filter(percent_magnitude__gt=min_change)
+        
+        magnitude = 'change_magnitude' if order == 'absolute' else 'percent_magnitude'
+        return queryset.order_by(F(magnitude).desc(), 'item_id').values(
+            'item_id', 'first_price', 'last_price', 'absolute_change', 'change_percent', 'points'
+        )[:limit]
 
 
 class PriceHistory(models.Model):
@@ -217,19 +864,145 @@ class PriceHistory(models.Model):
     
     # Location and time
     location = models.CharField(max_length=200, blank=True)
+    region = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='price_history'
+    )
     date = models.DateField()
     
     # Metadata
     data_points = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = PriceHistoryManager()
+    
     class Meta:
         unique_together = ['material', 'machinery', 'location', 'date']
         indexes = [
             models.Index(fields=['material', 'location', 'date']),
             models.Index(fields=['machinery', 'location', 'date']),
+            models.Index(fields=['region', 'date']),
+        ]
+    
+    def __str__(self):
+        item = self.material or self.machinery
+        return f"{item.name} - {self.location} - {self.date}"
+    
+    @property
+    def key(self):
+        return (self.material_id, self.machinery_id, self.location, self.date)
+    
+    def save(self, *args, **kwargs):
+        self.region = Location.objects.resolve(self.location)
+        super().save(*args, **kwargs)
+
+
+class PriceTrendManager(models.Manager):
+    """Maintains the precomputed price trend table from the price history rollup"""
+    
+    def refresh(self, end_date, periods=None, batch_size=1000):
+        """
+        Recompute the all-location trends of every item for the standard periods.
+        
+        Each period and item type is computed with one windowed query over
+        price history and the table is replaced in one transaction.
+        """
+        periods = periods or PriceTrend.PERIODS
+        trends = []
+        for days in periods:
+            start_date = end_date - timedelta(days=days)
+            for item_type in ['material', 'machinery']:
+                rows = PriceHistory.objects.trends(item_type, start_date, end_date, limit=None, min_change=None)
+                trends.extend(
+                    PriceTrend(
+                        **{f'{item_type}_id': row['item_id']},
+                        period_days=days,
+                        end_date=end_date,
+                        first_price=row['first_price'],
+                        last_price=row['last_price'],
+                        absolute_change=row['absolute_change'],
+                        change_percent=row['change_percent'],
+                        change_magnitude=abs(row['absolute_change']),
+                        percent_magnitude=abs(row['change_percent']),
+                        data_points=row['points'],
+                    )
+                    for row in rows
+                )
+        
+        with transaction.atomic():
+            self.filter(period_days__in=periods).delete()
+            self.bulk_create(trends, batch_size=batch_size)
+        return len(trends)
+    
+    def top(self, item_type, days, end_date, order='percent', limit=10, min_change=5):
+        """
+        Top limit precomputed trends of one item type, or None when the period
+        has not been computed up to end_date.
+        """
+        if days not in PriceTrend.PERIODS or not self.filter(period_days=days, end_date=end_date).exists():
+            return None
+        
+        magnitude = 'change_magnitude' if order == 'absolute' else 'percent_magnitude'
+        queryset = self.annotate(item_id=F(f'{item_type}_id')).filter(
+            Q(change_percent__gt=min_change) | Q(change_percent__lt=-min_change),
+            **{f'{item_type}__isnull': False},
+            period_days=days,
+            end_date=end_date
+        )
+        return queryset.order_by(f'-{magnitude}', 'item_id').values(
+            'item_id', 'first_price', 'last_price', 'absolute_change', 'change_percent', 'data_points'
+        )[:limit]
+
+
+class PriceTrend(models.Model):
+    """Price change of an item across all locations over a standard period, refreshed after the rollup"""
+    
+    # Periods in days precomputed after every rollup
+    PERIODS = [7, 30, 90]
+    
+    # Item being tracked
+    material = models.ForeignKey(
+        Material,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='price_trends'
+    )
+    machinery = models.ForeignKey(
+        Machinery,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='price_trends'
+    )
+    
+    # Period ending on end_date
+    period_days = models.PositiveIntegerField()
+    end_date = models.DateField()
+    
+    # Change between the first and last daily average price in the period
+    first_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_price = models.DecimalField(max_digits=10, decimal_places=2)
+    absolute_change = models.DecimalField(max_digits=10, decimal_places=2)
+    change_percent = models.FloatField()
+    data_points = models.IntegerField(default=0)
+    
+    # Sizes of the change, stored for indexed top-k lookups
+    change_magnitude = models.DecimalField(max_digits=10, decimal_places=2)
+    percent_magnitude = models.FloatField()
+    
+    objects = PriceTrendManager()
+    
+    class Meta:
+        indexes = [
+            # Top-k lookups by size of change
+            models.Index(fields=['period_days', 'end_date', '-percent_magnitude']),
+            models.Index(fields=['period_days', 'end_date', '-change_magnitude']),
         ]
     
     def __str__(self):
         item = self.material or self.machinery
-        return f"{item.name} - {self.location} - {self.date}"
\ No newline at end of file
+        return f"{item.name} - {self.period_days} days - {self.change_percent:+.2f}%"
@@ -0,0 +1,134 @@
+import json
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.utils.encoders import JSONEncoder
+from materials.models import Material
+from machinery.models import Machinery
+from toplorgical.cache import cache_key, read_through_many
+from .models import PriceData, filter_by_location
+
+# Cheapest prices returned per item
+REALTIME_PRICE_LIMIT = 5
+# Cached realtime prices are invalidated on every price data write; this bounds anything missed
+REALTIME_PRICING_TIMEOUT = 60
+# Largest basket answered in one response; larger baskets must be streamed
+MAX_REALTIME_ITEMS = 1000
+MAX_STREAM_ITEMS = 100000
+# Items priced per batch of queries when streaming
+STREAM_CHUNK_SIZE = 500
+
+ITEM_MODELS = {'material': Material, 'machinery': Machinery}
+
+
+def top_prices(item_type, item_ids, location=None, limit=REALTIME_PRICE_LIMIT):
+    """
+    Cheapest active prices of many items, at most limit per item, in one query.
+    
+    Rows are numbered per item in price order with ROW_NUMBER() and only
+    the first limit of each item are returned. Unpriced rows sort last.
+    """
+    queryset = PriceData.objects.filter(**{f'{item_type}_id__in': item_ids}, is_active=True)
+    queryset = filter_by_location(queryset, location)
+    queryset = queryset.annotate(
+        price_rank=Window(
+            RowNumber(),
+            partition_by=[F(f'{item_type}_id')],
+            order_by=[F('price').asc(nulls_last=True), F('id').asc()]
+        )
+    ).filter(price_rank__lte=limit).select_related('supplier').order_by('price_rank')
+    
+    prices = {item_id: [] for item_id in item_ids}
+    for price in queryset:
+        prices[getattr(price, f'{item_type}_id')].append(price)
+    return prices
+
+
+def price_entry(item_type, price):
+    if item_type == 'material':
+        return {
+            'supplier': price.supplier.name,
+            'price': float(price.price),
+            'unit': price.unit,
+            'in_stock': price.in_stock,
+            'location': price.location,
+            'updated_at': price.updated_at
+        }
+    return {
+        'supplier': price.supplier.name,
+        'price': float(price.price) if price.price else None,
+        'rental_price_daily': float(price.rental_price_daily) if price.rental_price_daily else None,
+        'rental_price_weekly': float(price.rental_price_weekly) if price.rental_price_weekly else None,
+        'in_stock': price.in_stock,
+        'location': price.location,
+        'updated_at': price.updated_at
+    }
+
+
+def item_pricing(item_type, item_ids, location=None):
+    """
+    Names and cheapest prices of many items of one type, in two queries.
+    
+    Returns a dict by item ID, with None for IDs that do not exist.
+    """
+    names = dict(ITEM_MODELS[item_type].objects.filter(id__in=item_ids).values_list('id', 'name'))
+    prices = top_prices(item_type, list(names), location) if names else {}
+    return {
+        item_id: {
+            'item_name': names[item_id],
+            'item_type': item_type,
+            'prices': [price_entry(item_type, price) for price in prices[item_id]],
+        } if item_id in names else None
+        for item_id in item_ids
+    }
+
+
+def cached_item_pricing(item_type, item_ids, location=None):
+    """Pricing for many items, read through the cache per item and computed together for the misses"""
+    keys = {
+        cache_key('realtime-pricing', item_type, item_id, location or ''): item_id
+        for item_id in item_ids
+    }
+    tags = {
+        key: [f'{item_type}:{item_id}', 'prices', f'{item_type}-prices:{item_id}']
+        for key, item_id in keys.items()
+    }
+    values = read_through_many(
+        keys,
+        lambda missing: item_pricing(item_type, missing, location),
+        tags,
+        timeout=REALTIME_PRICING_TIMEOUT
+    )
+    return {item_id: values[key] for key, item_id in keys.items()}
+
+
+def realtime_pricing(items, location=None, item_type='both'):
+    """
+    Realtime pricing for a basket of item IDs, in request order.
+    
+    With item_type 'both', an ID is priced as a material first and as
+    machinery when it has no material prices. Costs at most four queries
+    however many items are requested, fewer when they are cached.
+    """
+    item_ids = list(dict.fromkeys(items))
+    results = {item_id: {'item_id': item_id, 'prices': []} for item_id in item_ids}
+    
+    if item_type in ['material', 'both']:
+        for item_id, pricing in cached_item_pricing('material', item_ids, location).items():
+            if pricing is not None:
+                results[item_id].update(pricing)
+    
+    if item_type in ['machinery', 'both']:
+        unpriced = [item_id for item_id in item_ids if not results[item_id]['prices']]
+        if unpriced:
+            for item_id, pricing in cached_item_pricing('machinery', unpriced, location).items():
+                if pricing is not None:
+                    results[item_id].update(pricing)
+    
+    return [dict(results[item_id]) for item_id in items]
+
+
+def stream_realtime_pricing(items, location=None, item_type='both', chunk_size=STREAM_CHUNK_SIZE):
+    """Realtime pricing as newline-delimited JSON, one item per line, priced chunk_size items at a time"""
+    for start in range(0, len(items), chunk_size):
+        for pricing in realtime_pricing(items[start:start + chunk_size], location, item_type):
+            yield json.dumps(pricing, cls=JSONEncoder) + '\n'
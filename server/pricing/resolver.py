@@ -0,0 +1,98 @@
+from django.db.models import OuterRef, Subquery
+from .models import CurrentPrice, filter_by_location
+
+
+def lowest_price(item_type, location=None, price_field='price'):
+    """
+    Subquery for the lowest current price of the outer item in a location.
+
+    For annotating material or machinery querysets so they can be filtered
+    and ordered by price in the database. Each row is a lookup on the
+    (item, price) index of the current price table.
+    """
+    queryset = CurrentPrice.objects.filter(**{item_type: OuterRef('pk'), f'{price_field}__isnull': False})
+    queryset = filter_by_location(queryset, location)
+    return Subquery(queryset.order_by(price_field).values(price_field)[:1])
+
+
+class PriceResolver:
+    """
+    Resolve current prices for many materials and machinery at once.
+
+    Prices for a list of items are read from the current price table with a
+    single query per item type and cached on the resolver, so serializing a
+    page of items costs a constant number of queries instead of one or more
+    per item.
+    """
+
+    def __init__(self, location=None):
+        self.location = location or None
+        self._materials = {}
+        self._machinery = {}
+
+    @classmethod
+    def from_context(cls, context):
+        """Get the resolver shared through a serializer context, creating it if needed"""
+        resolver = context.get('price_resolver')
+        if resolver is None:
+            resolver = cls(context.get('location'))
+            context['price_resolver'] = resolver
+        return resolver
+
+    def _current_prices(self, field, ids):
+        """Current price rows for the given items, narrowed to the resolver location"""
+        queryset = CurrentPrice.objects.filter(**{f'{field}_id__in': ids})
+        queryset = filter_by_location(queryset, self.location)
+        return queryset.order_by('as_of', 'price_data_id')
+
+    def _missing(self, items, cache):
+        ids = {getattr(item, 'pk', item) for item in items}
+        return [item_id for item_id in ids if item_id is not None and item_id not in cache]
+
+    def load_materials(self, materials):
+        """Load current prices for materials (instances or IDs) in one query"""
+        ids = self._missing(materials, self._materials)
+        if not ids:
+            return
+
+        self._materials.update({item_id: None for item_id in ids})
+        # Rows are ordered by as_of, so the latest price per material wins
+        for item_id, price in self._current_prices('material', ids).values_list('material_id', 'price'):
+            self._materials[item_id] = price
+
+    def load_machinery(self, machinery):
+        """Load current rental/purchase prices and availability for machinery in one query"""
+        ids = self._missing(machinery, self._machinery)
+        if not ids:
+            return
+
+        for item_id in ids:
+            self._machinery[item_id] = {'daily': None, 'weekly': None, 'purchase': None, 'available': False}
+
+        rows = self._current_prices('machinery', ids).values_list(
+            'machinery_id', 'rental_price_daily', 'rental_price_weekly', 'price', 'in_stock'
+        )
+        # Rows are ordered by as_of, so the latest prices per machine win
+        for item_id, daily, weekly, purchase, in_stock in rows:
+            prices = self._machinery[item_id]
+            prices.update({'daily': daily, 'weekly': weekly, 'purchase': purchase})
+            prices['available'] = prices['available'] or in_stock
+
+    def material_price(self, material):
+        """Current price for a material, or None if it has no active price data"""
+        item_id = getattr(material, 'pk', material)
+        self.load_materials([item_id])
+        return self._materials[item_id]
+
+    def machinery_prices(self, machinery):
+        """Current daily, weekly and purchase prices plus availability for machinery"""
+        item_id = getattr(machinery, 'pk', machinery)
+        self.load_machinery([item_id])
+        return self._machinery[item_id]
+
+    def machinery_rental_price(self, machinery, rental_type='daily'):
+        """Current price for machinery for the given rental type"""
+        prices = self.machinery_prices(machinery)
+        if rental_type in ('daily', 'weekly'):
+            return prices[rental_type]
+        return prices['purchase']
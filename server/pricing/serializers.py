@@ -1,8 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Supplier, PriceData, PriceAlert, PriceHistory
-from materials.models import Material
-from machinery.models import Machinery
+from .realtime import MAX_REALTIME_ITEMS, MAX_STREAM_ITEMS
 
 User = get_user_model()
 
@@ -20,11 +19,14 @@ class SupplierSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('id', 'last_scraped', 'created_at', 'updated_at')
     
+    # SupplierListView annotates both counts
     def get_materials_count(self, obj):
-        return obj.price_data.filter(material__isnull=False).count()
+        count = getattr(obj, 'materials_count', None)
+        return obj.price_data.filter(material__isnull=False).count() if count is None else count
     
     def get_machinery_count(self, obj):
-        return obj.price_data.filter(machinery__isnull=False).count()
+        count = getattr(obj, 'machinery_count', None)
+        return obj.price_data.filter(machinery__isnull=False).count() if count is None else count
 
 
 class PriceDataSerializer(serializers.ModelSerializer):
@@ -37,11 +39,11 @@ class PriceDataSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'material', 'machinery', 'supplier', 'supplier_name',
             'price', 'unit', 'rental_price_daily', 'rental_price_weekly',
-            'in_stock', 'stock_quantity', 'location', 'postcode',
+            'in_stock', 'stock_quantity', 'location', 'postcode', 'region',
             'source_url', 'sku', 'item_name', 'item_type',
             'is_active', 'scraped_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ('id', 'scraped_at', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'region', 'scraped_at', 'created_at', 'updated_at')
     
     def get_item_name(self, obj):
         item = obj.get_item()
@@ -63,10 +65,10 @@ class PriceAlertSerializer(serializers.ModelSerializer):
         model = PriceAlert
         fields = [
             'id', 'user', 'material', 'machinery', 'alert_type',
-            'threshold_price', 'location', 'is_active', 'last_triggered',
+            'threshold_price', 'location', 'region', 'is_active', 'last_triggered',
             'item_name', 'item_type', 'created_at', 'updated_at'
         ]
-        read_only_fields = ('id', 'user', 'last_triggered', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'user', 'region', 'last_triggered', 'created_at', 'updated_at')
     
     def get_item_name(self, obj):
         item = obj.material or obj.machinery
@@ -91,10 +93,10 @@ class PriceHistorySerializer(serializers.ModelSerializer):
         model = PriceHistory
         fields = [
             'id', 'material', 'machinery', 'avg_price', 'min_price',
-            'max_price', 'location', 'date', 'data_points',
+            'max_price', 'location', 'region', 'date', 'data_points',
             'item_name', 'created_at'
         ]
-        read_only_fields = ('id', 'created_at')
+        read_only_fields = ('id', 'region', 'created_at')
     
     def get_item_name(self, obj):
         item = obj.material or obj.machinery
@@ -108,6 +110,7 @@ class ScrapedDataSerializer(serializers.Serializer):
     category = serializers.CharField(required=False, allow_blank=True)
     brand = serializers.CharField(required=False, allow_blank=True)
     sku = serializers.CharField(required=False, allow_blank=True)
+    ean = serializers.CharField(required=False, allow_blank=True)
     unit = serializers.CharField(required=False, allow_blank=True)
     price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
     rental_price_daily = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
@@ -135,4 +138,15 @@ class RealtimePricingSerializer(serializers.Serializer):
     item_type = serializers.ChoiceField(
         choices=['material', 'machinery', 'both'],
         default='both'
-    )
\ No newline at end of file
+    )
+    stream = serializers.BooleanField(
+        default=False,
+        help_text="Stream newline-delimited JSON, one item per line, for large baskets"
+    )
+    
+    def validate(self, data):
+        limit = MAX_STREAM_ITEMS if data['stream'] else MAX_REALTIME_ITEMS
+        if len(data['items']) > limit:
+            hint = '' if data['stream'] else '; set stream for larger baskets'
+            raise serializers.ValidationError({'items': f'At most {limit} items per request{hint}'})
+        return data
\ No newline at end of file
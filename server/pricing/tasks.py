@@ -1,11 +1,11 @@
 from celery import shared_task
 from django.utils import timezone
-from django.db.models import Avg, Min, Max
-from datetime import timedelta
-from .models import PriceData, PriceHistory, PriceAlert
-from materials.models import Material
-from machinery.models import Machinery
+from datetime import date, timedelta
+from .models import PriceData, PriceHistory, PriceAlert, PriceTrend
+from .alerts import AlertEngine, match_price_changes
+from .history_store import PriceHistoryStore, history_store_enabled
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +15,9 @@ def update_all_prices():
     """Update price history and check alerts"""
     logger.info("Starting price update task")
     
-    # Update price history
+    # Update price history and the trends computed from it
     update_price_history()
+    refresh_price_trends()
     
     # Check price alerts
     check_price_alerts()
@@ -25,168 +26,95 @@ def update_all_prices():
 
 
 @shared_task
-def update_price_history():
-    """Update daily price history aggregations"""
+def update_price_history(start_date=None, end_date=None):
+    """
+    Update daily price history aggregations.
+    
+    Defaults to today; pass ISO dates to backfill a range. The columnar
+    history store, when enabled, is rewritten for the months touched.
+    Returns the number of history rows written and the runtime of the rollup.
+    """
     today = timezone.now().date()
+    start_date = date.fromisoformat(start_date) if start_date else today
+    end_date = date.fromisoformat(end_date) if end_date else start_date
     
-    # Update material price history
-    materials = Material.objects.filter(is_active=True)
-    for material in materials:
-        locations = PriceData.objects.filter(
-            material=material,
-            is_active=True
-        ).values_list('location', flat=True).distinct()
-        
-        for location in locations:
-            if not location:
-                continue
-                
-            price_data = PriceData.objects.filter(
-                material=material,
-                location=location,
-                is_active=True,
-                created_at__date=today
-            )
-            
-            if price_data.exists():
-                aggregates = price_data.aggregate(
-                    avg_price=Avg('price'),
-                    min_price=Min('price'),
-                    max_price=Max('price')
-                )
-                
-                PriceHistory.objects.update_or_create(
-                    material=material,
-                    location=location,
-                    date=today,
-                    defaults={
-                        'avg_price': aggregates['avg_price'],
-                        'min_price': aggregates['min_price'],
-                        'max_price': aggregates['max_price'],
-                        'data_points': price_data.count()
-                    }
-                )
-    
-    # Update machinery price history
-    machinery_items = Machinery.objects.filter(is_active=True)
-    for machinery in machinery_items:
-        locations = PriceData.objects.filter(
-            machinery=machinery,
-            is_active=True
-        ).values_list('location', flat=True).distinct()
-        
-        for location in locations:
-            if not location:
-                continue
-                
-            price_data = PriceData.objects.filter(
-                machinery=machinery,
-                location=location,
-                is_active=True,
-                created_at__date=today
-            )
-            
-            if price_data.exists():
-                aggregates = price_data.aggregate(
-                    avg_price=Avg('price'),
-                    min_price=Min('price'),
-                    max_price=Max('price')
-                )
-                
-                PriceHistory.objects.update_or_create(
-                    machinery=machinery,
-                    location=location,
-                    date=today,
-                    defaults={
-                        'avg_price': aggregates['avg_price'] or 0,
-                        'min_price': aggregates['min_price'] or 0,
-                        'max_price': aggregates['max_price'] or 0,
-                        'data_points': price_data.count()
-                    }
-                )
-    
-    logger.info(f"Updated price history for {today}")
+    started = time.perf_counter()
+    result = PriceHistory.objects.rollup(start_date, end_date)
+    if history_store_enabled():
+        result['store'] = PriceHistoryStore().sync(start_date, end_date)
+    result.update({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'runtime_seconds': round(time.perf_counter() - started, 3),
+    })
+    
+    logger.info(
+        f"Updated price history for {start_date} to {end_date}: "
+        f"{result['created']} created, {result['updated']} updated in {result['runtime_seconds']}s"
+    )
+    return result
+
+
+@shared_task
+def refresh_price_trends(end_date=None):
+    """Recompute the precomputed price trends up to end_date, default today"""
+    end_date = date.fromisoformat(end_date) if end_date else timezone.now().date()
+    
+    started = time.perf_counter()
+    count = PriceTrend.objects.refresh(end_date)
+    runtime = round(time.perf_counter() - started, 3)
+    
+    logger.info(f"Refreshed {count} price trends up to {end_date} in {runtime}s")
+    return {'trends': count, 'runtime_seconds': runtime}
 
 
 @shared_task
 def check_price_alerts():
     """Check and trigger price alerts"""
-    active_alerts = PriceAlert.objects.filter(is_active=True)
+    started = time.perf_counter()
+    triggered = AlertEngine().run()
+    runtime = round(time.perf_counter() - started, 3)
     
-    for alert in active_alerts:
+    logger.info(f"Checked price alerts: {len(triggered)} triggered in {runtime}s")
+    return {'triggered': len(triggered), 'runtime_seconds': runtime}
+
+
+@shared_task
+def process_price_changes(changes):
+    """Trigger alerts watching the items in a batch of price changed events"""
+    triggered = match_price_changes(changes)
+    if triggered:
+        logger.info(f"Triggered {len(triggered)} alerts from {len(changes)} price changes")
+    return {'changes': len(changes), 'triggered': len(triggered)}
+
+
+@shared_task
+def send_price_alert_notifications(alert_ids):
+    """Send price alert notifications for a batch of triggered alerts"""
+    alerts = PriceAlert.objects.filter(id__in=alert_ids).select_related('user', 'material', 'machinery')
+    
+    found = 0
+    for alert in alerts.iterator(chunk_size=1000):
+        found += 1
         try:
-            # Get current price
-            if alert.material:
-                current_prices = PriceData.objects.filter(
-                    material=alert.material,
-                    is_active=True
-                )
-            elif alert.machinery:
-                current_prices = PriceData.objects.filter(
-                    machinery=alert.machinery,
-                    is_active=True
-                )
-            else:
-                continue
-            
-            # Filter by location if specified
-            if alert.location:
-                current_prices = current_prices.filter(location__icontains=alert.location)
-            
-            if not current_prices.exists():
-                continue
-            
-            # Check alert conditions
-            should_trigger = False
-            
-            if alert.alert_type == 'price_drop' and alert.threshold_price:
-                min_price = current_prices.aggregate(Min('price'))['price__min']
-                if min_price and min_price <= alert.threshold_price:
-                    should_trigger = True
+            # TODO: Implement email notification
+            # For now, just log the notification
+            item = alert.material or alert.machinery
+            logger.info(f"Price alert notification: {alert.alert_type} for {item.name} - User: {alert.user.email}")
             
-            elif alert.alert_type == 'price_increase' and alert.threshold_price:
-                max_price = current_prices.aggregate(Max('price'))['price__max']
-                if max_price and max_price >= alert.threshold_price:
-                    should_trigger = True
-            
-            elif alert.alert_type == 'back_in_stock':
-                if current_prices.filter(in_stock=True).exists():
-                    should_trigger = True
-            
-            elif alert.alert_type == 'out_of_stock':
-                if not current_prices.filter(in_stock=True).exists():
-                    should_trigger = True
-            
-            # Trigger alert if conditions are met
-            if should_trigger:
-                # Update last triggered time
-                alert.last_triggered = timezone.now()
-                alert.save()
-                
-                # Send notification (implement email/push notification here)
-                send_price_alert_notification.delay(alert.id)
-                
-                logger.info(f"Triggered alert {alert.id} for user {alert.user.id}")
+            # Here you would integrate with email service, push notifications, etc.
         
         except Exception as e:
-            logger.error(f"Error checking alert {alert.id}: {str(e)}")
+            logger.error(f"Error sending notification for alert {alert.id}: {str(e)}")
+    
+    if found < len(alert_ids):
+        logger.error(f"{len(alert_ids) - found} price alerts not found")
 
 
 @shared_task
 def send_price_alert_notification(alert_id):
     """Send price alert notification to user"""
-    try:
-        alert = PriceAlert.objects.get(id=alert_id)
-        
-        # TODO: Implement email notification
-        # For now, just log the notification
-        item = alert.material or alert.machinery
-        logger.info(f"Price alert notification: {alert.alert_type} for {item.name} - User: {alert.user.email}")
-        
-        # Here you would integrate with email service, push notifications, etc.
-        
-    except PriceAlert.DoesNotExist:
-        logger.error(f"Price alert {alert_id} not found")
+    send_price_alert_notifications([alert_id])
 
 
 @shared_task
@@ -220,7 +148,7 @@ def cleanup_old_price_data():
     
     logger.info(f"Cleaned up {deleted_count} old price data records")
     
-    # Keep price history for longer (2 years)
+    # Keep price history for longer (2 years); the columnar history store, when enabled, keeps it all
     history_cutoff = timezone.now().date() - timedelta(days=730)
     history_deleted = PriceHistory.objects.filter(
         date__lt=history_cutoff
@@ -1,11 +1,15 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Avg, Min, Max
+from django.db.models import Q, Avg, Min, Max, OuterRef
 from django.utils import timezone
 from datetime import timedelta
-from .models import Supplier, PriceData, PriceAlert, PriceHistory
+from .models import Supplier, PriceData, PriceAlert, PriceHistory, PriceTrend, filter_by_location
+from .ingest import BatchTooLarge, IngestError, MAX_BATCH_BYTES, MAX_BATCH_ITEMS, parse_batch, ingest_scraped_items, write_scraped_items
+from .realtime import realtime_pricing, stream_realtime_pricing
+from .history_store import PriceHistoryStore, history_store_enabled
 from .serializers import (
     SupplierSerializer,
     PriceDataSerializer,
@@ -16,19 +20,45 @@ from .serializers import (
 )
 from materials.models import Material
 from machinery.models import Machinery
+from toplorgical.cache import ReadThroughCacheMixin
+from toplorgical.expressions import SubqueryCount
+from toplorgical.pagination import KeysetPagination
+import logging
+import math
 
+logger = logging.getLogger(__name__)
 
-class SupplierListView(generics.ListAPIView):
+# Largest top-k answered by the price trends endpoint
+MAX_TRENDING_ITEMS = 100
+# Longest period, in days, the price trends endpoint looks back over
+MAX_TREND_DAYS = 3650
+
+
+class SupplierListView(ReadThroughCacheMixin, generics.ListAPIView):
     """List all suppliers"""
-    queryset = Supplier.objects.filter(is_active=True)
+    queryset = Supplier.objects.filter(is_active=True).annotate(
+        materials_count=SubqueryCount(
+            PriceData.objects.filter(supplier=OuterRef('pk'), material__isnull=False).values('pk')
+        ),
+        machinery_count=SubqueryCount(
+            PriceData.objects.filter(supplier=OuterRef('pk'), machinery__isnull=False).values('pk')
+        ),
+    )
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_family = 'supplier-list'
+    
+    def get_cache_tags(self):
+        # The price data counts change with every ingest
+        return ['suppliers', 'prices', 'material-prices', 'machinery-prices']
 
 
 class PriceDataListView(generics.ListAPIView):
     """List price data with filtering"""
     serializer_class = PriceDataSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-created_at', '-id']
     
     def get_queryset(self):
         queryset = PriceData.objects.filter(is_active=True).select_related(
@@ -45,14 +75,14 @@ class PriceDataListView(generics.ListAPIView):
         # Filter by location
         location = self.request.query_params.get('location')
         if location:
-            queryset = queryset.filter(location__icontains=location)
+            queryset = filter_by_location(queryset, location)
         
         # Filter by supplier
         supplier_id = self.request.query_params.get('supplier')
         if supplier_id:
             queryset = queryset.filter(supplier_id=supplier_id)
         
-        return queryset.order_by('-created_at')
+        return queryset
 
 
 class PriceAlertListCreateView(generics.ListCreateAPIView):
@@ -85,73 +115,73 @@ def receive_scraped_data(request):
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    data = serializer.validated_data
-    
     try:
-        # Get or create supplier
-        supplier, created = Supplier.objects.get_or_create(
-            name=data['supplier'],
-            defaults={
-                'website': data.get('supplier_url', ''),
-                'is_active': True
-            }
-        )
-        
-        # Update last scraped time
-        supplier.last_scraped = timezone.now()
-        supplier.save()
-        
-        # Try to match with existing material or machinery
-        material = None
-        machinery = None
-        
-        # Simple matching logic - can be enhanced
-        if data.get('category'):
-            # Try to find material first
-            material = Material.objects.filter(
-                name__icontains=data['name'],
-                category__name__icontains=data['category']
-            ).first()
-            
-            # If not found, try machinery
-            if not material:
-                machinery = Machinery.objects.filter(
-                    name__icontains=data['name'],
-                    category__name__icontains=data['category']
-                ).first()
-        
-        # Create or update price data
-        price_data, created = PriceData.objects.update_or_create(
-            supplier=supplier,
-            material=material,
-            machinery=machinery,
-            sku=data.get('sku', ''),
-            defaults={
-                'price': data.get('price', 0),
-                'unit': data.get('unit', ''),
-                'rental_price_daily': data.get('rental_price_daily'),
-                'rental_price_weekly': data.get('rental_price_weekly'),
-                'in_stock': data.get('in_stock', True),
-                'stock_quantity': data.get('stock_quantity'),
-                'location': data.get('location', ''),
-                'source_url': data.get('product_url', ''),
-                'scraped_at': timezone.now(),
-                'is_active': True
-            }
-        )
+        # Same bulk path as the batch endpoint, so unchanged items are not rewritten
+        result = write_scraped_items([(0, serializer.validated_data)], [{'index': 0}])[0]
+        created = result['status'] == 'created'
         
         return Response({
             'message': 'Data processed successfully',
             'created': created,
-            'price_data_id': price_data.id
+            'status': result['status'],
+            'price_data_id': result['price_data_id'],
+            'match': result['match']
         }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
-        
+    
     except Exception as e:
         return Response({
             'error': f'Failed to process data: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])  # For Scrapy service
+def receive_scraped_data_batch(request):
+    """Receive a batch of scraped data (JSON array or JSON lines, optionally gzipped)"""
+    # Read the raw stream so JSON lines and gzip bodies bypass the parsers. That also
+    # bypasses DATA_UPLOAD_MAX_MEMORY_SIZE, so the body is capped here instead.
+    body = request.read(MAX_BATCH_BYTES + 1)
+    if len(body) > MAX_BATCH_BYTES:
+        return Response({
+            'error': f'Batch too large: more than {MAX_BATCH_BYTES} bytes'
+        }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    try:
+        items = parse_batch(
+            body,
+            content_type=request.content_type or '',
+            content_encoding=request.META.get('HTTP_CONTENT_ENCODING', '')
+        )
+    except BatchTooLarge as e:
+        return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except IngestError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(items) > MAX_BATCH_ITEMS:
+        return Response({
+            'error': f'Batch too large: {len(items)} items (max {MAX_BATCH_ITEMS})'
+        }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    try:
+        results = ingest_scraped_items(items)
+    except Exception as e:
+        logger.error(f"Error processing scraped data batch: {str(e)}")
+        return Response({
+            'error': f'Failed to process data: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    summary = {'created': 0, 'changed': 0, 'unchanged': 0, 'duplicate': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    
+    return Response({
+        'message': 'Batch processed',
+        'total': len(results),
+        **summary,
+        'items': results
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def get_realtime_pricing(request):
@@ -162,78 +192,17 @@ def get_realtime_pricing(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     data = serializer.validated_data
-    items = data['items']
     location = data.get('location')
-    item_type = data.get('item_type', 'both')
-    
-    pricing_data = []
     
-    for item_id in items:
-        item_pricing = {'item_id': item_id, 'prices': []}
-        
-        # Get material pricing
-        if item_type in ['material', 'both']:
-            try:
-                material = Material.objects.get(id=item_id)
-                price_query = PriceData.objects.filter(
-                    material=material,
-                    is_active=True
-                )
-                
-                if location:
-                    price_query = price_query.filter(location__icontains=location)
-                
-                prices = price_query.select_related('supplier').order_by('price')[:5]
-                
-                for price in prices:
-                    item_pricing['prices'].append({
-                        'supplier': price.supplier.name,
-                        'price': float(price.price),
-                        'unit': price.unit,
-                        'in_stock': price.in_stock,
-                        'location': price.location,
-                        'updated_at': price.updated_at
-                    })
-                
-                item_pricing['item_name'] = material.name
-                item_pricing['item_type'] = 'material'
-                
-            except Material.DoesNotExist:
-                pass
-        
-        # Get machinery pricing
-        if item_type in ['machinery', 'both'] and not item_pricing['prices']:
-            try:
-                machinery = Machinery.objects.get(id=item_id)
-                price_query = PriceData.objects.filter(
-                    machinery=machinery,
-                    is_active=True
-                )
-                
-                if location:
-                    price_query = price_query.filter(location__icontains=location)
-                
-                prices = price_query.select_related('supplier').order_by('price')[:5]
-                
-                for price in prices:
-                    item_pricing['prices'].append({
-                        'supplier': price.supplier.name,
-                        'price': float(price.price) if price.price else None,
-                        'rental_price_daily': float(price.rental_price_daily) if price.rental_price_daily else None,
-                        'rental_price_weekly': float(price.rental_price_weekly) if price.rental_price_weekly else None,
-                        'in_stock': price.in_stock,
-                        'location': price.location,
-                        'updated_at': price.updated_at
-                    })
-                
-                item_pricing['item_name'] = machinery.name
-                item_pricing['item_type'] = 'machinery'
-                
-            except Machinery.DoesNotExist:
-                pass
-        
-        pricing_data.append(item_pricing)
+    if data['stream']:
+        # Large baskets are priced and sent a chunk at a time
+        return StreamingHttpResponse(
+            stream_realtime_pricing(data['items'], location, data['item_type']),
+            content_type='application/x-ndjson'
+        )
     
+    # All items and their cheapest prices in a constant number of queries
+    pricing_data = realtime_pricing(data['items'], location, data['item_type'])
     return Response({'pricing': pricing_data})
 
 
@@ -271,7 +240,7 @@ def get_price_history(request, item_type, item_id):
         return Response({'error': 'Invalid item type'}, status=status.HTTP_400_BAD_REQUEST)
     
     if location:
-        history_query = history_query.filter(location__icontains=location)
+        history_query = filter_by_location(history_query, location)
     
     history = history_query.order_by('date')
     serializer = PriceHistorySerializer(history, many=True)
@@ -288,60 +257,61 @@ def get_price_history(request, item_type, item_id):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_price_trends(request):
-    """Get price trends and analytics"""
+    """
+    Get the items with the largest price changes over a period.
+    
+    order_by is 'percent' (default) or 'absolute'; only items whose price
+    moved by more than min_change percent are included. All-location trends
+    for the standard periods come from the precomputed trend table, anything
+    else from the columnar history store when it is enabled and covers the
+    period, or with one windowed query over price history.
+    """
     item_type = request.query_params.get('item_type', 'material')
     location = request.query_params.get('location')
-    days = int(request.query_params.get('days', 30))
+    order = request.query_params.get('order_by', 'percent')
+    if item_type not in ['material', 'machinery']:
+        return Response({'error': 'Invalid item type'}, status=status.HTTP_400_BAD_REQUEST)
+    if order not in ['percent', 'absolute']:
+        return Response({'error': "order_by must be 'percent' or 'absolute'"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        days = int(request.query_params.get('days', 30))
+        limit = max(1, min(int(request.query_params.get('limit', 10)), MAX_TRENDING_ITEMS))
+        min_change = float(request.query_params.get('min_change', 5))
+    except ValueError:
+        return Response({'error': 'days, limit and min_change must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= MAX_TREND_DAYS:
+        return Response({'error': f'days must be between 1 and {MAX_TREND_DAYS}'}, status=status.HTTP_400_BAD_REQUEST)
+    if not math.isfinite(min_change):
+        return Response({'error': 'min_change must be a finite number'}, status=status.HTTP_400_BAD_REQUEST)
     
     end_date = timezone.now().date()
     start_date = end_date - timedelta(days=days)
     
-    # Get trending items (items with significant price changes)
-    if item_type == 'material':
-        trending_query = PriceHistory.objects.filter(
-            material__isnull=False,
-            date__range=[start_date, end_date]
-        )
-    else:
-        trending_query = PriceHistory.objects.filter(
-            machinery__isnull=False,
-            date__range=[start_date, end_date]
-        )
-    
-    if location:
-        trending_query = trending_query.filter(location__icontains=location)
-    
-    # Calculate price changes
-    trending_items = []
-    for item in trending_query.values('material', 'machinery').distinct():
-        if item_type == 'material' and item['material']:
-            item_history = trending_query.filter(material=item['material']).order_by('date')
-        elif item_type == 'machinery' and item['machinery']:
-            item_history = trending_query.filter(machinery=item['machinery']).order_by('date')
-        else:
-            continue
-        
-        if item_history.count() >= 2:
-            first_price = item_history.first().avg_price
-            last_price = item_history.last().avg_price
-            
-            if first_price and last_price and first_price > 0:
-                change_percent = ((last_price - first_price) / first_price) * 100
-                
-                if abs(change_percent) > 5:  # Only include significant changes
-                    trending_items.append({
-                        'item_id': item['material'] or item['machinery'],
-                        'item_type': item_type,
-                        'price_change_percent': round(change_percent, 2),
-                        'first_price': float(first_price),
-                        'last_price': float(last_price)
-                    })
+    trends = None
+    if not location:
+        trends = PriceTrend.objects.top(item_type, days, end_date, order, limit, min_change)
+    if trends is None and history_store_enabled():
+        store = PriceHistoryStore()
+        if store.covers(item_type, start_date, end_date):
+            trends = store.trends(item_type, start_date, end_date, location, order, limit, min_change)
+    if trends is None:
+        trends = PriceHistory.objects.trends(item_type, start_date, end_date, location, order, limit, min_change)
     
-    # Sort by absolute change percentage
-    trending_items.sort(key=lambda x: abs(x['price_change_percent']), reverse=True)
+    trending_items = [
+        {
+            'item_id': trend['item_id'],
+            'item_type': item_type,
+            'price_change_percent': round(trend['change_percent'], 2),
+            'absolute_change': float(trend['absolute_change']),
+            'first_price': float(trend['first_price']),
+            'last_price': float(trend['last_price'])
+        }
+        for trend in trends
+    ]
     
     return Response({
-        'trending_items': trending_items[:10],  # Top 10 trending items
+        'trending_items': trending_items,
         'period_days': days,
+        'order_by': order,
         'location': location
     })
\ No newline at end of file
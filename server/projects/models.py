@@ -1,10 +1,38 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from toplorgical.expressions import SubqueryCount
 
 User = get_user_model()
 
 
+class ProjectManager(models.Manager):
+    """Project queries with list summaries computed in SQL"""
+    
+    def with_summary(self):
+        """
+        Annotate the latest estimate total and the collaborator count.
+        
+        total_estimate matches get_total_estimate() and collaborators_count
+        matches collaborators.count(), as correlated subqueries so a page of
+        projects is summarised in the same query that fetches it.
+        """
+        from estimates.models import Estimate
+        latest_total = Estimate.objects.filter(project=OuterRef('pk')).order_by('-created_at', '-id').values('total_cost')[:1]
+        return self.annotate(
+            total_estimate=Coalesce(
+                Subquery(latest_total),
+                Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+            collaborators_count=SubqueryCount(
+                ProjectCollaborator.objects.filter(project=OuterRef('pk')).values('pk')
+            ),
+        )
+
+
 class Project(models.Model):
     """Project model for construction projects"""
     
@@ -58,6 +86,8 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProjectManager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -7,12 +7,7 @@ User = get_user_model()
 
 class ProjectSerializer(serializers.ModelSerializer):
     owner_name = serializers.CharField(source='owner.full_name', read_only=True)
-    total_estimate = serializers.DecimalField(
-        source='get_total_estimate',
-        max_digits=12,
-        decimal_places=2,
-        read_only=True
-    )
+    total_estimate = serializers.SerializerMethodField()
     collaborators_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -26,8 +21,16 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('id', 'owner', 'created_at', 'updated_at')
     
+    # Querysets from Project.objects.with_summary() carry both values already
+    def get_total_estimate(self, obj):
+        total = getattr(obj, 'total_estimate', None)
+        if total is None:
+            total = obj.get_total_estimate()
+        return serializers.DecimalField(max_digits=12, decimal_places=2).to_representation(total)
+    
     def get_collaborators_count(self, obj):
-        return obj.collaborators.count()
+        count = getattr(obj, 'collaborators_count', None)
+        return obj.collaborators.count() if count is None else count
     
     def create(self, validated_data):
         validated_data['owner'] = self.context['request'].user
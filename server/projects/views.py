@@ -22,9 +22,9 @@ class ProjectListCreateView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        return Project.objects.filter(
+        return Project.objects.with_summary().filter(
             Q(owner=user) | Q(collaborators=user)
-        ).distinct().select_related('owner').prefetch_related('collaborators')
+        ).distinct().select_related('owner')
 
 
 class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -34,9 +34,9 @@ class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        return Project.objects.filter(
+        return Project.objects.with_summary().filter(
             Q(owner=user) | Q(collaborators=user)
-        ).select_related('owner').prefetch_related('collaborators')
+        ).distinct().select_related('owner')
 
 
 class ProjectCollaboratorListView(generics.ListAPIView):
@@ -1,7 +1,18 @@
+import gzip
+import hashlib
+import json
+import sqlite3
+import time
 import pymongo
 import requests
 from datetime import datetime
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem
+from queuelib import FifoDiskQueue
+from twisted.internet import defer, reactor, task, threads
+
+# Sent by APIPipeline with the items the API did not write
+items_not_written = object()
 
 
 class ValidationPipeline:
@@ -35,51 +46,182 @@ class ValidationPipeline:
 
 
 class DuplicationPipeline:
-    """Remove duplicate items"""
+    """
+    Remove duplicate and unchanged items.
+    
+    Every item is recorded in a SQLite table keyed on (supplier, sku) with a
+    hash of its price, stock and specifications. Items seen twice in one
+    crawl are rejected as duplicates, and items whose hash matches the
+    previous run are dropped so only changed products reach the database
+    and the API. Unchanged items are still passed through once their last
+    sent copy is older than DEDUP_MAX_AGE_DAYS, so a lost write is repaired
+    by a later crawl. Items the API rejects are marked as never sent, so the
+    next crawl sends them again.
+    """
+    
+    HASH_FIELDS = [
+        'price', 'unit', 'rental_price_daily', 'rental_price_weekly', 'in_stock',
+        'stock_quantity', 'location', 'specifications'
+    ]
+    
+    def __init__(self, db_path='dedup.sqlite3', max_age_days=7, commit_every=1000, stats=None):
+        self.db_path = db_path
+        self.max_age = max_age_days * 86400
+        self.commit_every = commit_every
+        self.stats = stats
+        self.db = None
+        self.run_id = None
+        self.uncommitted = 0
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(
+            db_path=crawler.settings.get('DEDUP_DB_PATH', 'dedup.sqlite3'),
+            max_age_days=crawler.settings.getfloat('DEDUP_MAX_AGE_DAYS', 7),
+            stats=crawler.stats
+        )
+        crawler.signals.connect(pipeline.forget_items, signal=items_not_written)
+        return pipeline
     
-    def __init__(self):
-        self.seen_items = set()
+    def open_spider(self, spider):
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS seen_items ('
+            ' supplier TEXT NOT NULL,'
+            ' sku TEXT NOT NULL,'
+            ' content_hash TEXT NOT NULL,'
+            ' run_id TEXT NOT NULL,'
+            ' sent_at REAL NOT NULL,'
+            ' PRIMARY KEY (supplier, sku)'
+            ') WITHOUT ROWID'
+        )
+        self.db.commit()
+        self.run_id = f"{spider.name}:{time.time()}"
+    
+    def close_spider(self, spider):
+        if self.db:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+    
+    def item_key(self, adapter):
+        """(supplier, sku) key, falling back to the product name for items without a SKU"""
+        supplier = (adapter.get('supplier') or '').lower()
+        sku = (adapter.get('sku') or '').lower() or f"name:{(adapter.get('name') or '').lower()}"
+        return supplier, sku
+    
+    def content_hash(self, adapter):
+        content = {field: adapter.get(field) for field in self.HASH_FIELDS}
+        encoded = json.dumps(content, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
     
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
         # Create unique identifier
-        identifier = (
-            adapter.get('name', '').lower(),
-            adapter.get('supplier', '').lower(),
-            adapter.get('sku', '').lower()
-        )
+        identifier = self.item_key(adapter)
+        content_hash = self.content_hash(adapter)
+        now = time.time()
         
-        if identifier in self.seen_items:
-            raise ValueError(f"Duplicate item: {identifier}")
+        row = self.db.execute(
+            'SELECT content_hash, run_id, sent_at FROM seen_items WHERE supplier = ? AND sku = ?',
+            identifier
+        ).fetchone()
         
-        self.seen_items.add(identifier)
+        if row is not None:
+            previous_hash, previous_run, sent_at = row
+            if previous_run == self.run_id:
+                raise ValueError(f"Duplicate item: {identifier}")
+            
+            if previous_hash == content_hash and now - sent_at < self.max_age:
+                self.db.execute(
+                    'UPDATE seen_items SET run_id = ? WHERE supplier = ? AND sku = ?',
+                    (self.run_id, *identifier)
+                )
+                self.track_write()
+                if self.stats is not None:
+                    self.stats.inc_value('dedup/unchanged', spider=spider)
+                raise DropItem(f"Unchanged item: {identifier}")
+        
+        self.db.execute(
+            'INSERT OR REPLACE INTO seen_items (supplier, sku, content_hash, run_id, sent_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (*identifier, content_hash, self.run_id, now)
+        )
+        self.track_write()
+        if self.stats is not None:
+            self.stats.inc_value('dedup/new' if row is None else 'dedup/changed', spider=spider)
         return item
+    
+    def track_write(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.db.commit()
+            self.uncommitted = 0
+    
+    def forget_items(self, items, spider):
+        """Mark items as never sent so the next crawl does not skip them as unchanged"""
+        keys = [self.item_key(ItemAdapter(item)) for item in items]
+        # In-flight API batches can finish after this pipeline has closed
+        db = self.db or sqlite3.connect(self.db_path)
+        db.executemany('UPDATE seen_items SET sent_at = 0 WHERE supplier = ? AND sku = ?', keys)
+        db.commit()
+        if db is not self.db:
+            db.close()
+        if self.stats is not None:
+            self.stats.inc_value('dedup/forgotten', len(keys), spider=spider)
 
 
 class MongoPipeline:
-    """Store items in MongoDB"""
+    """
+    Store items in MongoDB in batches.
+    
+    Items are buffered and written with one bulk_write per MONGODB_BATCH_SIZE
+    items. In the default "upsert" mode items are keyed on (supplier, sku,
+    scraped day), so re-scraping a product on the same day replaces its
+    document; "insert" mode appends every item with insert_many. Writes are
+    unordered, so one bad document does not stop the rest of the batch.
+    """
     
-    def __init__(self, mongo_server, mongo_db, mongo_collection):
+    def __init__(self, mongo_server, mongo_db, mongo_collection, batch_size=500, write_mode='upsert'):
         self.mongo_server = mongo_server
         self.mongo_db = mongo_db
         self.mongo_collection = mongo_collection
+        self.batch_size = batch_size
+        self.write_mode = write_mode
         self.client = None
         self.db = None
+        self.collection = None
+        self.buffer = []
     
     @classmethod
     def from_crawler(cls, crawler):
         return cls(
             mongo_server=crawler.settings.get('MONGODB_SERVER'),
             mongo_db=crawler.settings.get('MONGODB_DB'),
-            mongo_collection=crawler.settings.get('MONGODB_COLLECTION')
+            mongo_collection=crawler.settings.get('MONGODB_COLLECTION'),
+            batch_size=crawler.settings.getint('MONGODB_BATCH_SIZE', 500),
+            write_mode=crawler.settings.get('MONGODB_WRITE_MODE', 'upsert')
         )
     
     def open_spider(self, spider):
         self.client = pymongo.MongoClient(self.mongo_server)
         self.db = self.client[self.mongo_db]
+        self.collection = self.db[self.mongo_collection]
+        
+        # Indexes for the upsert key and for reading back a crawl
+        self.collection.create_index([
+            ('supplier', pymongo.ASCENDING),
+            ('sku', pymongo.ASCENDING),
+            ('scraped_day', pymongo.ASCENDING),
+        ])
+        self.collection.create_index([
+            ('spider_name', pymongo.ASCENDING),
+            ('scraped_at', pymongo.DESCENDING),
+        ])
     
     def close_spider(self, spider):
+        self.flush(spider)
         if self.client:
             self.client.close()
     
@@ -90,36 +232,112 @@ class MongoPipeline:
         adapter['scraped_at'] = datetime.now()
         adapter['spider_name'] = spider.name
         
-        # Insert into MongoDB
-        collection = self.db[self.mongo_collection]
-        collection.insert_one(adapter.asdict())
+        document = adapter.asdict()
+        document['scraped_day'] = document['scraped_at'].strftime('%Y-%m-%d')
+        self.buffer.append(document)
+        if len(self.buffer) >= self.batch_size:
+            self.flush(spider)
         
         return item
+    
+    def write_request(self, document):
+        """Bulk write operation for one scraped document"""
+        if self.write_mode != 'upsert' or not document.get('sku'):
+            return pymongo.InsertOne(document)
+        return pymongo.ReplaceOne(
+            {
+                'supplier': document.get('supplier'),
+                'sku': document['sku'],
+                'scraped_day': document['scraped_day'],
+            },
+            document,
+            upsert=True
+        )
+    
+    def flush(self, spider):
+        """Write the buffered items with one unordered bulk write"""
+        if not self.buffer or self.collection is None:
+            return
+        
+        batch, self.buffer = self.buffer, []
+        start = time.perf_counter()
+        try:
+            if self.write_mode == 'upsert':
+                self.collection.bulk_write([self.write_request(document) for document in batch], ordered=False)
+            else:
+                self.collection.insert_many(batch, ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            spider.logger.error(f"MongoDB rejected {len(errors)} of {len(batch)} items: {errors[:3]}")
+        
+        elapsed = time.perf_counter() - start
+        spider.logger.info(
+            f"MongoDB flush: {len(batch)} items in {elapsed:.3f}s "
+            f"({len(batch) / elapsed if elapsed else 0:.0f} items/s)"
+        )
 
 
 class APIPipeline:
-    """Send processed items to Django API"""
+    """
+    Send processed items to Django API in batches.
     
-    def __init__(self, api_base_url):
+    Items are buffered and flushed to the batch ingest endpoint when the
+    buffer reaches API_BATCH_SIZE items or every API_FLUSH_INTERVAL seconds.
+    Requests run in the reactor thread pool so the crawl is never blocked,
+    failed requests are retried with exponential backoff, and batches that
+    still fail are spilled to an on-disk queue that is replayed on the next
+    successful flush or crawl.
+    """
+    
+    def __init__(self, api_base_url, batch_size=500, flush_interval=10, max_retries=5,
+                 retry_backoff=1.0, timeout=30, spool_dir='api_spool', stats=None, signals=None):
         self.api_base_url = api_base_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.spool_dir = spool_dir
+        self.stats = stats
+        self.signals = signals
         self.session = requests.Session()
         self.auth_token = None
+        self.buffer = []
+        self.pending = set()
+        self.spool = None
+        self.flush_loop = None
+        self.spider = None
     
     @classmethod
     def from_crawler(cls, crawler):
+        settings = crawler.settings
         return cls(
-            api_base_url=crawler.settings.get('API_BASE_URL')
+            api_base_url=settings.get('API_BASE_URL'),
+            batch_size=settings.getint('API_BATCH_SIZE', 500),
+            flush_interval=settings.getfloat('API_FLUSH_INTERVAL', 10),
+            max_retries=settings.getint('API_MAX_RETRIES', 5),
+            retry_backoff=settings.getfloat('API_RETRY_BACKOFF', 1.0),
+            timeout=settings.getfloat('API_REQUEST_TIMEOUT', 30),
+            spool_dir=settings.get('API_SPOOL_DIR', 'api_spool'),
+            stats=crawler.stats,
+            signals=crawler.signals
         )
     
+    @defer.inlineCallbacks
     def open_spider(self, spider):
+        self.spider = spider
+        self.spool = FifoDiskQueue(self.spool_dir)
+        
         # Authenticate with API
         try:
-            response = self.session.post(
+            response = yield threads.deferToThread(
+                self.session.post,
                 f"{self.api_base_url}auth/login/",
                 json={
                     'email': 'scraper@toplorgical.com',
                     'password': 'scraper_password'
-                }
+                },
+                timeout=self.timeout
             )
             if response.status_code == 200:
                 self.auth_token = response.json().get('access')
@@ -128,11 +346,37 @@ class APIPipeline:
                 })
         except Exception as e:
             spider.logger.error(f"Failed to authenticate with API: {e}")
+        
+        self.flush_loop = task.LoopingCall(self.flush)
+        self.flush_loop.start(self.flush_interval, now=False)
+        
+        if self.auth_token and len(self.spool):
+            self.replay_spool()
     
-    def process_item(self, item, spider):
-        if not self.auth_token:
-            return item
+    @defer.inlineCallbacks
+    def close_spider(self, spider):
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
+        
+        self.flush()
+        
+        # Wait for every in-flight batch before the spool is closed
+        while self.pending:
+            yield defer.DeferredList(list(self.pending))
         
+        if self.stats is not None:
+            stats = {key: self.stats.get_value(f'api/items_{key}', 0, spider=spider)
+                     for key in ('created', 'changed', 'unchanged', 'failed', 'queued')}
+            spider.logger.info(
+                f"API pipeline: {stats['created']} new, {stats['changed']} changed, "
+                f"{stats['unchanged']} unchanged, {stats['failed']} failed, {stats['queued']} queued"
+            )
+        
+        if self.spool is not None:
+            spider.logger.info(f"API pipeline: {len(self.spool)} batches left in spool")
+            self.spool.close()
+    
+    def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
         # Prepare data for API
@@ -159,18 +403,119 @@ class APIPipeline:
         # Remove None values
         api_data = {k: v for k, v in api_data.items() if v is not None}
         
-        try:
-            # Send to pricing endpoint
-            response = self.session.post(
-                f"{self.api_base_url}pricing/scraped-data/",
-                json=api_data
-            )
+        self.buffer.append(api_data)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        
+        return item
+    
+    def inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(f'api/{key}', count, spider=self.spider)
+    
+    def flush(self):
+        """Send the buffered items as one batch without waiting for the response"""
+        if not self.buffer:
+            return
+        
+        batch, self.buffer = self.buffer, []
+        if not self.auth_token:
+            # The API was unreachable when the crawl started; keep the items for the next run
+            self.spill(batch)
+            return
+        
+        self.track(self.send_batch(batch))
+    
+    def items_failed(self, items):
+        """Count items the API did not write and tell the dedup pipeline to send them again"""
+        self.inc_stat('items_failed', len(items))
+        if self.signals is not None and items:
+            self.signals.send_catch_log(items_not_written, items=items, spider=self.spider)
+    
+    def track(self, deferred):
+        self.pending.add(deferred)
+        deferred.addBoth(self.untrack, deferred)
+        return deferred
+    
+    def untrack(self, result, deferred):
+        self.pending.discard(deferred)
+        return result
+    
+    def post_batch(self, batch):
+        """Blocking POST of a gzipped JSON lines batch; runs in the thread pool"""
+        body = '\n'.join(json.dumps(data, default=str) for data in batch).encode('utf-8')
+        return self.session.post(
+            f"{self.api_base_url}pricing/scraped-data/batch/",
+            data=gzip.compress(body),
+            headers={'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'},
+            timeout=self.timeout
+        )
+    
+    @defer.inlineCallbacks
+    def send_batch(self, batch, replayed=False):
+        """Send a batch, retrying with backoff and spilling to disk when retries run out"""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self.retry_backoff * 2 ** (attempt - 1)
+                yield task.deferLater(reactor, delay, lambda: None)
+                self.inc_stat('retries')
+            
+            try:
+                response = yield threads.deferToThread(self.post_batch, batch)
+            except Exception as e:
+                self.spider.logger.warning(f"Error sending batch to API: {e}")
+                continue
+            
+            if response.status_code >= 500 or response.status_code == 429:
+                self.spider.logger.warning(f"API unavailable: {response.status_code}")
+                continue
             
-            if response.status_code not in [200, 201]:
-                spider.logger.error(
-                    f"Failed to send item to API: {response.status_code} - {response.text}"
+            if response.status_code != 200:
+                # Client errors will not succeed on retry
+                self.spider.logger.error(
+                    f"Failed to send batch to API: {response.status_code} - {response.text[:500]}"
                 )
-        except Exception as e:
-            spider.logger.error(f"Error sending item to API: {e}")
+                self.items_failed(batch)
+                return
+            
+            try:
+                results = response.json().get('items', [])
+            except (ValueError, AttributeError) as e:
+                # Whether the batch was written is unknown; count it as failed rather than lose it silently
+                self.spider.logger.error(f"Invalid response from API for batch of {len(batch)} items: {e}")
+                self.items_failed(batch)
+                return
+            failed = [result for result in results if result.get('status') == 'error']
+            for result in failed[:10]:
+                self.spider.logger.error(f"API rejected item: {result.get('errors')}")
+            self.inc_stat('items_sent', len(batch) - len(failed))
+            self.items_failed([batch[result['index']] for result in failed if 'index' in result])
+            
+            # Per-crawl summary of what the API actually wrote
+            for result in results:
+                if result.get('status') in ('created', 'changed', 'unchanged'):
+                    self.inc_stat(f"items_{result['status']}")
+            
+            # The API is reachable again, so send anything spilled earlier
+            if not replayed and len(self.spool):
+                self.replay_spool()
+            return
+        
+        self.spill(batch)
+    
+    def spill(self, batch):
+        """Store a batch in the on-disk queue for a later attempt"""
+        self.spool.push(json.dumps(batch, default=str).encode('utf-8'))
+        self.inc_stat('items_queued', len(batch))
+        self.spider.logger.warning(f"Queued {len(batch)} items on disk for a later retry")
+    
+    def replay_spool(self):
+        """Resend batches from the on-disk queue"""
+        batches = []
+        while len(self.spool):
+            batches.append(json.loads(self.spool.pop()))
         
-        return item
\ No newline at end of file
+        self.spider.logger.info(f"Replaying {len(batches)} queued batches")
+        for batch in batches:
+            self.inc_stat('items_replayed', len(batch))
+            self.track(self.send_batch(batch, replayed=True))
@@ -0,0 +1,515 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+from collections import Counter, OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import RedisError
+from rest_framework.response import Response
+
+logger = logging.getLogger('toplorgical')
+
+# Fresh values are served for their timeout, then for up to this long while one request recomputes
+STALE_GRACE = 60
+# How long a recompute may hold the single-flight lock
+LOCK_TIMEOUT = 30
+# How long other requests wait for a recompute before computing themselves
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+METRICS_FLUSH_INTERVAL = 10
+METRIC_EVENTS = ('local_hits', 'hits', 'stale', 'waits', 'misses', 'refreshes')
+# Redis pub/sub channel carrying invalidated tags to the local tier of every process
+INVALIDATION_CHANNEL = 'cache-invalidation'
+LISTENER_RETRY = 5
+# Raised by the cache API and the raw client when Redis is unreachable or failing
+CACHE_ERRORS = (ConnectionInterrupted, RedisError)
+
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+_metrics_flushed_at = time.monotonic()
+_metric_families = set()
+
+_MISSING = object()
+
+
+def cache_key(family, *parts):
+    """Cache key for a family of values, with the varying parts hashed into a safe suffix"""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'{family}:{digest}'
+
+
+class LocalCache:
+    """
+    In-process LRU cache with a TTL for one cache family.
+    
+    Entries remember their tags so invalidations published by any process
+    can drop them. Sizes are measured by pickling each value once, when it
+    is stored, and the least recently used entries are evicted to stay
+    within max_entries and max_bytes. Values are shared between requests,
+    so callers must not modify them.
+    """
+    
+    def __init__(self, max_entries=128, timeout=60, max_bytes=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.stats = Counter()
+        self.generation = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.stats['misses'] += 1
+                return _MISSING
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+    
+    def set(self, key, value, tags, generation):
+        """Store a value read while generation was current, unless an invalidation happened since"""
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, frozenset(tags), time.monotonic() + self.timeout, size)
+            self.bytes += size
+            while self.entries and (
+                len(self.entries) > self.max_entries
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self.entries)))
+                self.stats['evictions'] += 1
+    
+    def invalidate(self, tags=None):
+        """Drop entries carrying any of tags, or every entry when tags is None"""
+        with self.lock:
+            self.generation += 1
+            for key, entry in list(self.entries.items()):
+                if tags is None or not entry[1].isdisjoint(tags):
+                    self._remove(key)
+    
+    def _remove(self, key):
+        self.bytes -= self.entries.pop(key)[3]
+    
+    def summary(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes, **self.stats}
+
+
+_local_caches = {}
+_local_lock = threading.Lock()
+_listener_pid = None
+# Set while this process is not hearing invalidations, so local tiers are bypassed
+_listener_down = threading.Event()
+
+
+def local_cache(family):
+    """
+    The in-process tier of a family configured in LOCAL_CACHE_FAMILIES, or None.
+    
+    Also None while the invalidation listener is disconnected, since a local
+    tier would then miss writes made by other processes.
+    """
+    if _listener_down.is_set():
+        return None
+    local = _local_caches.get(family)
+    if local is None:
+        options = getattr(settings, 'LOCAL_CACHE_FAMILIES', {}).get(family)
+        if options is None:
+            return None
+        with _local_lock:
+            local = _local_caches.setdefault(family, LocalCache(**options))
+    if _listener_pid != os.getpid():
+        start_invalidation_listener()
+    return local
+
+
+def invalidate_local(tags=None):
+    for local in list(_local_caches.values()):
+        local.invalidate(tags)
+
+
+def local_cache_stats():
+    """Entries, approximate memory and hit counts of this process's local tiers"""
+    return {family: local.summary() for family, local in sorted(_local_caches.items())}
+
+
+def redis_connection():
+    """Raw Redis client behind the default cache, or None for other cache backends"""
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+def start_invalidation_listener():
+    """
+    Subscribe this process to tag invalidations published by other processes.
+    
+    Runs once per process (again after a fork). Without a Redis cache there
+    is nobody else to hear from, so local tiers rely on their own process's
+    invalidations and TTLs.
+    """
+    global _listener_pid
+    with _local_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+    connection = redis_connection()
+    if connection is not None:
+        threading.Thread(
+            target=_listen_for_invalidations,
+            args=(connection,),
+            name='cache-invalidation',
+            daemon=True
+        ).start()
+
+
+def _listen_for_invalidations(connection):
+    while True:
+        pubsub = connection.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Messages published while not subscribed are lost, so start from empty tiers
+            invalidate_local()
+            _listener_down.clear()
+            for message in pubsub.listen():
+                invalidate_local(set(json.loads(message['data'])))
+        except Exception as e:
+            _listener_down.set()
+            invalidate_local()
+            logger.error(f"Cache invalidation listener failed, retrying in {LISTENER_RETRY}s: {e}")
+            time.sleep(LISTENER_RETRY)
+        finally:
+            pubsub.close()
+
+
+def tag_versions(tags):
+    """Current version of every tag, creating versions for tags never seen before"""
+    if not tags:
+        return {}
+    keys = {f'cache-tag:{tag}': tag for tag in tags}
+    stored = cache.get_many(list(keys))
+    for key in keys:
+        if key not in stored:
+            cache.add(key, time.time_ns(), timeout=None)
+            stored[key] = cache.get(key)
+    return {tag: stored[key] for key, tag in keys.items()}
+
+
+def invalidate_tags(*tags):
+    """
+    Make every cached value tagged with any of tags stale.
+    
+    Each tag gets a new version once the current transaction commits, so a
+    read in between cannot cache data that is about to be replaced. Local
+    tiers are invalidated in this process directly and in every other
+    process over Redis pub/sub. Invalidation is best effort: when Redis is
+    unavailable the error is logged, and shared values written before the
+    outage are served until they expire.
+    """
+    tags = set(tags)
+    if not tags:
+        return
+    transaction.on_commit(lambda: _apply_invalidation(tags))
+
+
+def _apply_invalidation(tags):
+    try:
+        cache.set_many({f'cache-tag:{tag}': time.time_ns() for tag in tags}, timeout=None)
+    except CACHE_ERRORS as e:
+        logger.error(f"Could not invalidate cache tags {sorted(tags)}: {e}")
+    invalidate_local(tags)
+    connection = redis_connection()
+    if connection is not None:
+        _best_effort(connection.publish, INVALIDATION_CHANNEL, json.dumps(sorted(tags)))
+
+
+def _best_effort(operation, *args, **kwargs):
+    """Run a shared cache write, logging instead of raising when Redis is unavailable"""
+    try:
+        operation(*args, **kwargs)
+    except CACHE_ERRORS as e:
+        logger.warning(f"Shared cache write failed: {e}")
+
+
+def read_through(key, compute, tags=(), timeout=300):
+    """
+    Cached value of compute(), recomputed when it expires or a tag is invalidated.
+    
+    Families configured in LOCAL_CACHE_FAMILIES are first looked up in an
+    in-process tier, which costs no network round trip. Shared values are
+    stored with the versions of their tags, so invalidating a tag makes
+    every value carrying it a miss without having to find them. Only one
+    request recomputes a key at a time: while it does, others keep serving
+    the expired value during STALE_GRACE, or wait up to LOCK_WAIT for the
+    new one when there is nothing current to serve. When Redis is
+    unavailable the value is computed from the database.
+    """
+    if not settings.READ_THROUGH_CACHE:
+        return compute()
+    
+    family = key.split(':', 1)[0]
+    local = local_cache(family)
+    if local is not None:
+        generation = local.generation
+        value = local.get(key)
+        if value is not _MISSING:
+            record_metric(family, 'local_hits')
+            return value
+    
+    try:
+        value = _read_shared(family, key, compute, tags, timeout)
+    except CACHE_ERRORS as e:
+        logger.warning(f"Shared cache unavailable, computing {key}: {e}")
+        record_metric(family, 'misses')
+        # Not kept locally either, since invalidations may not be reaching this process
+        return compute()
+    if local is not None:
+        local.set(key, value, tags, generation)
+    return value
+
+
+def read_through_many(keys, compute_missing, tags, timeout=300):
+    """
+    Cached values for many keys at once, computing everything missing in one call.
+    
+    keys maps each cache key to the argument that identifies its value and
+    tags maps each cache key to its tags. compute_missing receives the
+    arguments of the keys not in the cache and returns their values by
+    argument. However many keys are read, the shared cache is asked twice:
+    once for the tag versions and once for the values. Expired values are
+    recomputed without the single-flight guard of read_through(), since
+    whole batches rarely repeat. When Redis is unavailable everything not
+    in a local tier is computed.
+    """
+    if not settings.READ_THROUGH_CACHE:
+        computed = compute_missing(list(keys.values()))
+        return {key: computed[arg] for key, arg in keys.items()}
+    
+    values = {}
+    generations = {}
+    for key in keys:
+        local = local_cache(key.split(':', 1)[0])
+        if local is not None:
+            generation = local.generation
+            value = local.get(key)
+            if value is not _MISSING:
+                values[key] = value
+                record_metric(key.split(':', 1)[0], 'local_hits')
+            else:
+                generations[key] = generation
+    
+    pending = [key for key in keys if key not in values]
+    try:
+        versions = tag_versions({tag for key in pending for tag in tags[key]})
+        entries = cache.get_many([f'cache-entry:{key}' for key in pending])
+    except CACHE_ERRORS as e:
+        logger.warning(f"Shared cache unavailable, computing {len(pending)} values: {e}")
+        computed = compute_missing([keys[key] for key in pending])
+        for key in pending:
+            values[key] = computed[keys[key]]
+            record_metric(key.split(':', 1)[0], 'misses')
+        return values
+    
+    now = time.time()
+    missing = []
+    for key in pending:
+        key_versions = {tag: versions[tag] for tag in tags[key]}
+        entry = entries.get(f'cache-entry:{key}')
+        if entry is not None and entry['tags'] == key_versions and entry['fresh_until'] > now:
+            values[key] = entry['value']
+            record_metric(key.split(':', 1)[0], 'hits')
+        else:
+            missing.append(key)
+    
+    if missing:
+        computed = compute_missing([keys[key] for key in missing])
+        fresh_until = time.time() + timeout
+        _best_effort(cache.set_many, {
+            f'cache-entry:{key}': {
+                'value': computed[keys[key]],
+                'tags': {tag: versions[tag] for tag in tags[key]},
+                'fresh_until': fresh_until,
+            }
+            for key in missing
+        }, timeout=timeout + STALE_GRACE)
+        for key in missing:
+            values[key] = computed[keys[key]]
+            record_metric(key.split(':', 1)[0], 'misses')
+    
+    for key, generation in generations.items():
+        local_cache(key.split(':', 1)[0]).set(key, values[key], tags[key], generation)
+    return values
+
+
+def _read_shared(family, key, compute, tags, timeout):
+    versions = tag_versions(tags)
+    entry_key = f'cache-entry:{key}'
+    entry = cache.get(entry_key)
+    current = entry is not None and entry['tags'] == versions
+    if current and entry['fresh_until'] > time.time():
+        record_metric(family, 'hits')
+        return entry['value']
+    
+    lock_key = f'cache-lock:{key}'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            record_metric(family, 'refreshes' if current else 'misses')
+            value = compute()
+            # Versions read before computing, so an invalidation during compute still wins
+            _best_effort(
+                cache.set,
+                entry_key,
+                {'value': value, 'tags': versions, 'fresh_until': time.time() + timeout},
+                timeout=timeout + STALE_GRACE
+            )
+            return value
+        finally:
+            _best_effort(cache.delete, lock_key)
+    
+    if current:
+        record_metric(family, 'stale')
+        return entry['value']
+    
+    # Another request is computing this value, so wait for it rather than query as well
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(entry_key)
+        if entry is not None and entry['tags'] == versions:
+            record_metric(family, 'waits')
+            return entry['value']
+    
+    record_metric(family, 'misses')
+    return compute()
+
+
+def record_metric(family, event):
+    """Count a cache event, flushing the counts to the shared cache every few seconds"""
+    with _metrics_lock:
+        _metrics[(family, event)] += 1
+        due = time.monotonic() - _metrics_flushed_at >= METRICS_FLUSH_INTERVAL
+    if due:
+        flush_metrics()
+
+
+def flush_metrics():
+    """Add this process's event counts to the shared counters and publish its local tier sizes"""
+    global _metrics_flushed_at
+    with _metrics_lock:
+        pending = dict(_metrics)
+        _metrics.clear()
+        _metrics_flushed_at = time.monotonic()
+    
+    try:
+        for (family, event), count in pending.items():
+            key = f'cache-metrics:{family}:{event}'
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                if not cache.add(key, count, timeout=None):
+                    cache.incr(key, count)
+            _register_metric_key('cache-metrics:families', family)
+        
+        if _local_caches:
+            process = f'{socket.gethostname()}:{os.getpid()}'
+            cache.set(f'cache-metrics:local:{process}', local_cache_stats(), timeout=METRICS_FLUSH_INTERVAL * 6)
+            _register_metric_key('cache-metrics:processes', process)
+    except CACHE_ERRORS as e:
+        logger.warning(f"Could not flush cache metrics: {e}")
+
+
+def _register_metric_key(registry, name):
+    if (registry, name) in _metric_families:
+        return
+    names = cache.get(registry) or set()
+    if name not in names:
+        cache.set(registry, names | {name}, timeout=None)
+    _metric_families.add((registry, name))
+
+
+def cache_metrics():
+    """Shared event counts and hit ratio per cache family"""
+    families = cache.get('cache-metrics:families') or set()
+    keys = [f'cache-metrics:{family}:{event}' for family in families for event in METRIC_EVENTS]
+    counts = cache.get_many(keys)
+    
+    metrics = {}
+    for family in sorted(families):
+        events = {event: counts.get(f'cache-metrics:{family}:{event}', 0) for event in METRIC_EVENTS}
+        served = events['local_hits'] + events['hits'] + events['stale'] + events['waits']
+        total = served + events['misses'] + events['refreshes']
+        events['hit_ratio'] = round(served / total, 4) if total else None
+        metrics[family] = events
+    return metrics
+
+
+def local_cache_metrics():
+    """Local tier sizes and counts most recently published by each live process"""
+    processes = cache.get('cache-metrics:processes') or set()
+    stats = cache.get_many([f'cache-metrics:local:{process}' for process in processes])
+    return {key.split(':', 2)[2]: value for key, value in sorted(stats.items())}
+
+
+def reset_metrics():
+    families = cache.get('cache-metrics:families') or set()
+    processes = cache.get('cache-metrics:processes') or set()
+    cache.delete_many(
+        [f'cache-metrics:{family}:{event}' for family in families for event in METRIC_EVENTS]
+        + [f'cache-metrics:local:{process}' for process in processes]
+        + ['cache-metrics:families', 'cache-metrics:processes']
+    )
+    _metric_families.clear()
+
+
+class ReadThroughCacheMixin:
+    """
+    Serve list and retrieve responses of a generic view from the read-through cache.
+    
+    Views set cache_family and implement get_cache_tags(). Responses are
+    cached per family, URL kwargs and query parameters, so they must not
+    depend on the requesting user.
+    """
+    cache_family = None
+    cache_timeout = 300
+    
+    def get_cache_tags(self):
+        raise NotImplementedError
+    
+    def get_cache_key(self, request):
+        params = sorted((name, sorted(values)) for name, values in request.query_params.lists())
+        return cache_key(self.cache_family, sorted(self.kwargs.items()), params)
+    
+    def cached_response(self, request, render):
+        data = read_through(
+            self.get_cache_key(request),
+            lambda: render().data,
+            tags=self.get_cache_tags(),
+            timeout=self.cache_timeout
+        )
+        return Response(data)
+    
+    def list(self, request, *args, **kwargs):
+        render = super().list
+        return self.cached_response(request, lambda: render(request, *args, **kwargs))
+    
+    def retrieve(self, request, *args, **kwargs):
+        render = super().retrieve
+        return self.cached_response(request, lambda: render(request, *args, **kwargs))
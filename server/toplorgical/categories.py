@@ -0,0 +1,111 @@
+from django.db import models
+from django.db.models import Count
+from rest_framework.fields import DateTimeField
+from .cache import invalidate_tags, read_through
+
+# Cached trees are replaced on every change, so this only bounds stale versions
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+
+
+class CategoryTreeManager(models.Manager):
+    """
+    Manager for self-referencing category models with a cached tree.
+    
+    tree() returns the serialized category tree with active item counts. It
+    is built from one query for the categories and one grouped count of the
+    items, assembled in memory and read through the cache under a tag that
+    invalidate_tree() invalidates whenever a category or an item's active
+    flag or category changes. Views whose responses include category names
+    tag their cached responses with cache_tag as well.
+    """
+    
+    # Defaults let Django derive related managers, which call __init__() without arguments
+    def __init__(self, items=None, count_field=None):
+        super().__init__()
+        self.items = items
+        self.count_field = count_field
+    
+    @property
+    def cache_tag(self):
+        return f'category-tree:{self.model._meta.label_lower}'
+    
+    def invalidate_tree(self):
+        """Make the next tree() call rebuild the tree"""
+        invalidate_tags(self.cache_tag)
+    
+    def build_tree(self):
+        """Serialize every category with its active item count, nested under its parent"""
+        item_model = self.model._meta.get_field(self.items).related_model
+        counts = dict(
+            item_model.objects.filter(is_active=True)
+            .values('category_id')
+            .annotate(count=Count('id'))
+            .order_by()
+            .values_list('category_id', 'count')
+        )
+        created_at = DateTimeField()
+        
+        nodes = {}
+        roots = []
+        for category in self.order_by('name', 'id').values('id', 'name', 'description', 'parent_id', 'created_at'):
+            nodes[category['id']] = {
+                'id': category['id'],
+                'name': category['name'],
+                'description': category['description'],
+                'parent': category['parent_id'],
+                'subcategories': [],
+                self.count_field: counts.get(category['id'], 0),
+                'created_at': created_at.to_representation(category['created_at']),
+            }
+        for node in nodes.values():
+            parent = nodes.get(node['parent'])
+            (parent['subcategories'] if parent else roots).append(node)
+        return roots
+    
+    def tree(self):
+        """Root categories with nested subcategories and counts, from the cache when current"""
+        return read_through(self.cache_tag, self.build_tree, tags=[self.cache_tag], timeout=CATEGORY_TREE_TIMEOUT)
+    
+    def tree_nodes(self):
+        """Every category node of the cached tree by ID"""
+        nodes = {}
+        pending = list(self.tree())
+        while pending:
+            node = pending.pop()
+            nodes[node['id']] = node
+            pending.extend(node['subcategories'])
+        return nodes
+
+
+class CategoryTreeItemMixin:
+    """
+    Invalidate the category tree when an item's active flag or category changes.
+    
+    For item models with a category foreign key to a model managed by
+    CategoryTreeManager. Queryset update() and bulk writes bypass this, so
+    callers using them should call invalidate_tree() themselves.
+    """
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_tree_state = instance.tree_state()
+        return instance
+    
+    def tree_state(self):
+        return (self.__dict__.get('is_active'), self.__dict__.get('category_id'))
+    
+    def invalidate_category_tree(self):
+        self._meta.get_field('category').related_model.objects.invalidate_tree()
+    
+    def save(self, *args, **kwargs):
+        changed = self._state.adding or self.tree_state() != getattr(self, '_loaded_tree_state', None)
+        super().save(*args, **kwargs)
+        if changed:
+            self.invalidate_category_tree()
+            self._loaded_tree_state = self.tree_state()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_category_tree()
+        return result
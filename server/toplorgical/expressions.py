@@ -0,0 +1,13 @@
+from django.db.models import IntegerField, Subquery
+
+
+class SubqueryCount(Subquery):
+    """
+    Row count of a correlated subquery, as an integer annotation.
+    
+    Unlike Count() over a join, several of these can be annotated on one
+    queryset without multiplying each other's rows, and rows without
+    related rows count as 0 instead of NULL.
+    """
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = IntegerField()
@@ -0,0 +1,37 @@
+import logging
+from .querycount import QueryRecorder, budget_index, load_budgets
+
+logger = logging.getLogger('toplorgical')
+
+
+class QueryCountMiddleware:
+    """
+    Report SQL query count, duplicate queries and database time per request.
+
+    Adds X-DB-Queries, X-DB-Duplicate-Queries and X-DB-Time-Ms response
+    headers, and logs a warning with the repeated query signatures when a
+    request exceeds the budget declared for its URL name in the query
+    budget file.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budgets = budget_index(load_budgets())
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response['X-DB-Queries'] = str(recorder.count)
+        response['X-DB-Duplicate-Queries'] = str(recorder.duplicates)
+        response['X-DB-Time-Ms'] = f'{recorder.duration * 1000:.2f}'
+
+        match = getattr(request, 'resolver_match', None)
+        budget = self.budgets.get((match.url_name, request.method)) if match else None
+        if budget is not None and recorder.count > budget:
+            repeated = '; '.join(f'{count}x {sql[:120]}' for sql, count in recorder.repeated()[:5])
+            logger.warning(
+                f"{request.method} {request.path} ran {recorder.count} queries "
+                f"(budget {budget}, {recorder.duplicates} duplicates): {repeated}"
+            )
+        return response
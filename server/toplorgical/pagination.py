@@ -0,0 +1,189 @@
+import base64
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework import serializers
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+# Estimated counts below this are cheap enough to count exactly
+EXACT_COUNT_LIMIT = 10000
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """JSON encoder keeping full datetime precision, which DjangoJSONEncoder rounds to milliseconds"""
+    
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Opaque cursor for the ordering values of the last row on a page"""
+    data = json.dumps(list(values), cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Ordering values from a cursor, raising a validation error for tampered cursors"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise serializers.ValidationError({'cursor': 'Invalid cursor'})
+    if not isinstance(values, list) or len(values) != length:
+        raise serializers.ValidationError({'cursor': 'Invalid cursor'})
+    return values
+
+
+def parse_ordering(ordering):
+    """(field, descending) pairs from Django style ordering names"""
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def keyset_order_by(ordering):
+    """Order expressions for a keyset ordering, with NULLs sorted last in both directions"""
+    return [
+        F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+        for field, descending in parse_ordering(ordering)
+    ]
+
+
+def keyset_filter(ordering, values, nullable=()):
+    """
+    Filter for the rows after a cursor position.
+    
+    Matches rows whose ordering values sort after values in ordering, field
+    by field: equal on every earlier field and after on this one. NULLs of
+    the fields in nullable sort last, so a NULL value is only followed by
+    other NULLs. The last field must be unique for pages not to skip or
+    repeat rows.
+    """
+    after = Q(pk__in=[])
+    equal = Q()
+    for (field, descending), value in zip(parse_ordering(ordering), values):
+        if value is None:
+            equal &= Q(**{f'{field}__isnull': True})
+            continue
+        beyond = Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+        if field in nullable:
+            beyond |= Q(**{f'{field}__isnull': True})
+        after |= equal & beyond
+        equal &= Q(**{field: value})
+    return after
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20, nullable=()):
+    """
+    One page of a queryset in keyset order.
+    
+    Returns (rows, next_cursor). The rows come from a single query that
+    seeks past the cursor instead of using OFFSET, so later pages cost the
+    same as the first. next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(*keyset_order_by(ordering))
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, len(ordering)), nullable))
+    
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, field) for field, _ in parse_ordering(ordering))
+
+
+def approximate_count(queryset):
+    """
+    Row count of a queryset, estimated by the query planner for large results.
+    
+    On PostgreSQL the planner's row estimate is used when it is above
+    EXACT_COUNT_LIMIT; smaller results and other databases are counted
+    exactly. Returns (count, is_approximate).
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate >= EXACT_COUNT_LIMIT:
+            return estimate, True
+    return queryset.count(), False
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique keyset ordering.
+    
+    Views choose the ordering with a keyset_ordering attribute (the last
+    field must be unique) and may list NULL-able ordering fields in
+    keyset_nullable. Each page is one query seeking past the opaque cursor
+    of the previous page. A count is only computed when the count query
+    parameter is set, and is approximate for large results.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    
+    def __init__(self, ordering=None, nullable=()):
+        if ordering is not None:
+            self.ordering = ordering
+        self.nullable = nullable
+    
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'keyset_ordering', self.ordering)
+        nullable = getattr(view, 'keyset_nullable', self.nullable)
+        
+        self.count, self.count_is_approximate = None, False
+        if request.query_params.get(self.count_query_param) in ('1', 'true', 'yes'):
+            self.count, self.count_is_approximate = approximate_count(queryset)
+        
+        rows, self.next_cursor = keyset_page(
+            queryset,
+            list(ordering),
+            cursor=request.query_params.get(self.cursor_query_param),
+            page_size=self.get_page_size(request),
+            nullable=nullable
+        )
+        return rows
+    
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+    
+    def get_paginated_response(self, data):
+        body = {
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+        }
+        if self.count is not None:
+            body['count'] = self.count
+            body['count_is_approximate'] = self.count_is_approximate
+        body['results'] = data
+        return Response(body)
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'count': {'type': 'integer'},
+                'count_is_approximate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
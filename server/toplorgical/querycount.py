@@ -0,0 +1,95 @@
+import json
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def query_signature(sql):
+    """SQL with parameter lists collapsed, so N+1 queries share one signature"""
+    return WHITESPACE_RE.sub(' ', IN_LIST_RE.sub('(...)', sql)).strip()
+
+
+class QueryRecorder:
+    """
+    Record SQL queries executed on every database connection.
+
+    Use as a context manager around a request or any block of code. Counts
+    queries, time spent in the database and how often each query signature
+    and each exact query (SQL plus parameters) ran, which points at N+1
+    patterns without needing DEBUG.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+        self.exact = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.signatures[query_signature(sql)] += 1
+            self.exact[(sql, repr(params))] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    @property
+    def duplicates(self):
+        """Number of queries that repeated an earlier query exactly"""
+        return sum(count - 1 for count in self.exact.values())
+
+    def repeated(self, minimum=2):
+        """Query signatures that ran at least minimum times, most frequent first"""
+        return [(sql, count) for sql, count in self.signatures.most_common() if count >= minimum]
+
+    def summary(self):
+        return {
+            'queries': self.count,
+            'duplicates': self.duplicates,
+            'db_time_ms': round(self.duration * 1000, 2),
+            'repeated': self.repeated(),
+        }
+
+
+@contextmanager
+def assert_max_queries(max_queries, label='block'):
+    """Fail with the repeated query signatures when a block runs more than max_queries queries"""
+    with QueryRecorder() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        repeated = '\n'.join(f'  {count}x {sql[:200]}' for sql, count in recorder.repeated())
+        raise AssertionError(
+            f'{label} ran {recorder.count} queries, budget is {max_queries}'
+            + (f'\nRepeated queries:\n{repeated}' if repeated else '')
+        )
+
+
+def load_budgets(path=None):
+    """Endpoint budgets from the budget file, as a list of dicts"""
+    path = path or settings.QUERY_BUDGETS_FILE
+    with open(path) as budget_file:
+        return json.load(budget_file)['endpoints']
+
+
+def budget_index(budgets):
+    """Query budgets keyed by (URL name, HTTP method)"""
+    return {(budget['name'], budget['method']): budget['max_queries'] for budget in budgets}
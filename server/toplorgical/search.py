@@ -0,0 +1,291 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import BigIntegerField, Case, Count, FloatField, Max, Q, Value, When
+from django.db.models.functions import Cast, Round
+
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+
+# Text search configuration used by the PostgreSQL backend and its indexes
+SEARCH_CONFIG = 'english'
+
+# Score of a token per field weight, matching PostgreSQL's ts_rank defaults
+WEIGHT_SCORES = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+# Largest number of ranked IDs the in-process backend hands to the database
+MAX_RESULTS = 1000
+
+# Most vocabulary tokens a single prefix or fuzzy term expands to
+MAX_EXPANSIONS = 50
+
+# Minimum trigram similarity for a misspelt term to match a token
+FUZZY_THRESHOLD = 0.5
+
+# How often an in-process index checks its table for changes, in seconds
+REFRESH_INTERVAL = 30
+
+# search_rank is the rank times this, rounded to an integer, so that cursors
+# compare it exactly instead of round-tripping a float through JSON
+RANK_SCALE = 10 ** 6
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a text"""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def trigrams(text):
+    """Character trigrams of normalized text, padded at word boundaries"""
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a, b):
+    """Dice coefficient of two trigram sets"""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def fuzzy_token(token):
+    """Whether a token may be matched by spelling; codes and sizes must match exactly"""
+    return token.isalpha()
+
+
+def search_vector(weights, config=SEARCH_CONFIG):
+    """
+    Weighted tsvector expression over model fields.
+    
+    GIN indexes must be built from this exact expression for PostgreSQL to
+    use them, so migrations and queries both call it.
+    """
+    vector = None
+    for field, weight in weights.items():
+        part = SearchVector(field, weight=weight, config=config)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def tsquery(tokens, prefix=False):
+    """Raw tsquery requiring every token, optionally as a prefix"""
+    return ' & '.join(f'{token}:*' if prefix else token for token in tokens)
+
+
+class InvertedIndex:
+    """
+    In-process inverted index used when the database has no full-text search.
+    
+    Maps tokens to the rows containing them with the weight of the best field
+    they appear in. Terms can be expanded to every token they prefix, and
+    terms matching no token fall back to tokens with similar trigrams, so
+    misspelt queries still find results. Scores are weight times inverse
+    document frequency, summed over terms, and every term must match.
+    """
+    
+    def __init__(self, weights):
+        self.weights = weights
+        self.postings = {}
+        self.documents = {}
+        self.token_trigrams = {}
+        self.vocabulary = []
+        self.vocabulary_stale = False
+        self.watermark = None
+        self.lock = threading.Lock()
+    
+    def add(self, doc_id, values):
+        """Index a row from a mapping of field name to text"""
+        self.remove(doc_id)
+        tokens = {}
+        for field, weight in self.weights.items():
+            score = WEIGHT_SCORES[weight]
+            for token in tokenize(values.get(field)):
+                if score > tokens.get(token, 0):
+                    tokens[token] = score
+        
+        for token, score in tokens.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                if fuzzy_token(token):
+                    for trigram in trigrams(token):
+                        self.token_trigrams.setdefault(trigram, set()).add(token)
+                self.vocabulary_stale = True
+            self.postings[token][doc_id] = score
+        self.documents[doc_id] = tuple(tokens)
+    
+    def remove(self, doc_id):
+        for token in self.documents.pop(doc_id, ()):
+            postings = self.postings[token]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[token]
+                if fuzzy_token(token):
+                    for trigram in trigrams(token):
+                        self.token_trigrams[trigram].discard(token)
+                self.vocabulary_stale = True
+    
+    def refresh(self, queryset):
+        """Index rows changed since the last refresh and drop rows no longer in the queryset"""
+        fields = list(self.weights)
+        with self.lock:
+            state = queryset.aggregate(count=Count('pk'), updated=Max('updated_at'))
+            if state['updated'] is not None and (self.watermark is None or state['updated'] > self.watermark):
+                changed = queryset if self.watermark is None else queryset.filter(updated_at__gte=self.watermark)
+                for row in changed.values('pk', *fields).iterator(chunk_size=5000):
+                    self.add(row['pk'], row)
+                self.watermark = state['updated']
+            
+            # Deleted or deactivated rows leave no trace in updated_at, so compare IDs
+            if len(self.documents) != state['count']:
+                active = set(queryset.values_list('pk', flat=True))
+                for doc_id in set(self.documents) - active:
+                    self.remove(doc_id)
+                missing = active - set(self.documents)
+                for row in queryset.filter(pk__in=missing).values('pk', *fields).iterator(chunk_size=5000):
+                    self.add(row['pk'], row)
+    
+    def expand(self, term, prefix=False):
+        """Vocabulary tokens a query term matches, with a factor for how closely"""
+        if prefix:
+            if self.vocabulary_stale:
+                self.vocabulary = sorted(self.postings)
+                self.vocabulary_stale = False
+            expansions = {}
+            position = bisect.bisect_left(self.vocabulary, term)
+            for token in self.vocabulary[position:position + MAX_EXPANSIONS]:
+                if not token.startswith(term):
+                    break
+                expansions[token] = 1.0 if token == term else 0.9
+            if expansions:
+                return expansions
+        elif term in self.postings:
+            return {term: 1.0}
+        
+        # Nothing matched, so look for similarly spelt tokens
+        term_trigrams = trigrams(term)
+        counts = {}
+        for trigram in term_trigrams:
+            for token in self.token_trigrams.get(trigram, ()):
+                counts[token] = counts.get(token, 0) + 1
+        expansions = {}
+        for token, shared in counts.items():
+            # Too few shared trigrams to reach the threshold whatever the token length
+            if 2 * shared < FUZZY_THRESHOLD * len(term_trigrams):
+                continue
+            score = similarity(term_trigrams, trigrams(token))
+            if score >= FUZZY_THRESHOLD:
+                expansions[token] = score
+        return dict(heapq.nlargest(MAX_EXPANSIONS, expansions.items(), key=lambda item: item[1]))
+    
+    def search(self, query, prefix=False, limit=MAX_RESULTS):
+        """Up to limit (doc_id, score) pairs ranked by score"""
+        total = len(self.documents) or 1
+        terms = []
+        for term in dict.fromkeys(tokenize(query)):
+            expansions = [
+                (self.postings[token], factor * math.log(1 + total / len(self.postings[token])))
+                for token, factor in self.expand(term, prefix).items()
+            ]
+            if not expansions:
+                return []
+            terms.append(expansions)
+        
+        # Scan the rarest term's postings, then probe the others for each candidate only
+        terms.sort(key=lambda expansions: sum(len(postings) for postings, _ in expansions))
+        scores = {}
+        for postings, boost in terms[0]:
+            for doc_id, weight in postings.items():
+                score = weight * boost
+                if score > scores.get(doc_id, 0):
+                    scores[doc_id] = score
+        
+        for expansions in terms[1:]:
+            matched = {}
+            for doc_id, score in scores.items():
+                best = 0
+                for postings, boost in expansions:
+                    weight = postings.get(doc_id)
+                    if weight is not None and weight * boost > best:
+                        best = weight * boost
+                if best:
+                    matched[doc_id] = score + best
+            scores = matched
+            if not scores:
+                return []
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+class SearchIndex:
+    """
+    Ranked full-text search over a model's text fields.
+    
+    On PostgreSQL queries match a weighted tsvector (served by a GIN
+    expression index) or a trigram similarity on the name field (served by
+    a trigram index), ranked by ts_rank plus similarity. Other databases
+    use an in-process InvertedIndex over active rows. Either way search()
+    returns the queryset filtered to matches and annotated with search_rank,
+    an integer fixed-point rank (see RANK_SCALE) that ties break exactly.
+    """
+    
+    def __init__(self, model, weights, trigram_field='name'):
+        self.model = model
+        self.weights = weights
+        self.trigram_field = trigram_field
+        self.inverted = None
+        self.last_refresh = 0.0
+    
+    def indexed_queryset(self):
+        return self.model.objects.filter(is_active=True)
+    
+    def inverted_index(self, force_refresh=False):
+        """The in-process index, refreshed at most every REFRESH_INTERVAL seconds"""
+        if self.inverted is None:
+            self.inverted = InvertedIndex(self.weights)
+        now = time.monotonic()
+        if force_refresh or now - self.last_refresh >= REFRESH_INTERVAL:
+            self.inverted.refresh(self.indexed_queryset())
+            self.last_refresh = now
+        return self.inverted
+    
+    def no_results(self, queryset):
+        # Still annotated so callers can order by search_rank
+        return queryset.none().annotate(search_rank=Value(0, output_field=BigIntegerField()))
+    
+    def exact_rank(self, rank):
+        return Cast(Round(rank * RANK_SCALE), BigIntegerField())
+    
+    def search(self, queryset, query, prefix=False):
+        """Filter a queryset to rows matching query, annotated with search_rank"""
+        tokens = tokenize(query)
+        if not tokens:
+            return self.no_results(queryset)
+        if connections[queryset.db].vendor == 'postgresql':
+            return self.search_postgres(queryset, query, tokens, prefix)
+        return self.search_inverted(queryset, query, prefix)
+    
+    def search_postgres(self, queryset, query, tokens, prefix):
+        vector = search_vector(self.weights)
+        search_query = SearchQuery(tsquery(tokens, prefix), search_type='raw', config=SEARCH_CONFIG)
+        return queryset.alias(
+            search_document=vector
+        ).filter(
+            Q(search_document=search_query) | Q(**{f'{self.trigram_field}__trigram_similar': query})
+        ).annotate(
+            search_rank=self.exact_rank(SearchRank(vector, search_query) + TrigramSimilarity(self.trigram_field, query))
+        )
+    
+    def search_inverted(self, queryset, query, prefix):
+        results = self.inverted_index().search(query, prefix)
+        if not results:
+            return self.no_results(queryset)
+        return queryset.filter(pk__in=[doc_id for doc_id, _ in results]).annotate(
+            search_rank=self.exact_rank(Case(
+                *[When(pk=doc_id, then=Value(score)) for doc_id, score in results],
+                default=Value(0.0),
+                output_field=FloatField()
+            ))
+        )
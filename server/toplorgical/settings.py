@@ -26,6 +26,7 @@ DJANGO_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 ]
 
 THIRD_PARTY_APPS = [
@@ -63,6 +64,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Per-request SQL query counts, checked against the declared query budgets
+QUERY_COUNT_MIDDLEWARE = config("QUERY_COUNT_MIDDLEWARE", default=DEBUG, cast=bool)
+QUERY_BUDGETS_FILE = BASE_DIR / "toplorgical" / "query_budgets.json"
+
+if QUERY_COUNT_MIDDLEWARE:
+    MIDDLEWARE.append("toplorgical.middleware.QueryCountMiddleware")
+
 ROOT_URLCONF = "toplorgical.urls"
 
 TEMPLATES = [
@@ -204,6 +212,16 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 
+# Price alerts triggered by ingest are not re-sent within this window
+PRICE_ALERT_DEBOUNCE_SECONDS = config("PRICE_ALERT_DEBOUNCE_SECONDS", default=3600, cast=int)
+
+# Optional columnar copy of the daily price history, one directory per item type and month,
+# written after every rollup and used for long-range analytics. Requires NumPy. The directory
+# is written by the Celery worker, so web hosts only read it when it is shared with the worker
+# and up to date; otherwise they query the database.
+PRICE_HISTORY_STORE = config("PRICE_HISTORY_STORE", default=False, cast=bool)
+PRICE_HISTORY_STORE_DIR = config("PRICE_HISTORY_STORE_DIR", default=str(BASE_DIR / "price_history_store"))
+
 # Cache Configuration
 CACHES = {
     "default": {
@@ -211,10 +229,24 @@ CACHES = {
         "LOCATION": REDIS_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # Fail fast when Redis is unreachable; cache reads then fall back to the database
+            "SOCKET_CONNECT_TIMEOUT": 1,
         },
     }
 }
 
+# Serve catalog, category tree and realtime pricing reads through CACHES
+READ_THROUGH_CACHE = config("READ_THROUGH_CACHE", default=True, cast=bool)
+
+# In-process LRU tier in front of CACHES for hot reference data, per read-through cache family.
+# Entries live for at most timeout seconds and are dropped early by invalidations over Redis pub/sub.
+LOCAL_CACHE_FAMILIES = {
+    "category-tree": {"max_entries": 8, "timeout": 300},
+    "supplier-list": {"max_entries": 64, "timeout": 60, "max_bytes": 4 * 1024 * 1024},
+    "subscription-plans": {"max_entries": 4, "timeout": 300},
+    "subscription-plan-list": {"max_entries": 8, "timeout": 300},
+}
+
 # Stripe Configuration
 STRIPE_PUBLIC_KEY = config("STRIPE_PUBLIC_KEY", default="")
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY", default="")